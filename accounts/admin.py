@@ -2,22 +2,35 @@ from django.contrib import admin
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.urls import reverse, path
-from .models import User, ParentChildLink, SiteSetting, ParentInvite, InviteDelivery, Notification, ParentLinkRequest
+from .models import User, ParentChildLink, SiteSetting, ParentInvite, InviteDelivery, Notification
 from .views import _send_email_with_fallback
-from django.db.models import Count, Q
-from django.db.models.functions import TruncDate, TruncWeek
+from .cleanup import CLEANUP_INLINE_LIMIT, cleanup_user_artifacts, format_cleanup_summary
+from .tasks import cleanup_user_artifacts_task
+from .invite_rollups import (
+    InviteDeliveryRollup,
+    rollups_for_window,
+    rollup_totals,
+    rollup_by_day,
+    rollup_by_week,
+    rollup_by_domain,
+    rollup_by_parent,
+)
+from django.core.cache import cache
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from datetime import timedelta
 from django.shortcuts import render
-from django.http import HttpResponse
-import csv
+from eduvanta.admin_perf import LargeTableAdminMixin
+from eduvanta.exports import CsvExportAdminMixin, iter_rows, streaming_csv_response
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ("username", "email", "role", "is_verified", "is_staff")
     list_filter = ("role", "is_verified", "is_staff")
     search_fields = ("username", "email", "first_name", "last_name")
+    prefix_search_fields = ("username", "email", "first_name", "last_name")
     actions = ["cleanup_user_artifacts"]
 
     def cleanup_user_artifacts(self, request, queryset):
@@ -26,38 +39,24 @@ class UserAdmin(admin.ModelAdmin):
         - ParentLinkRequest (as parent and as student)
         - ParentInvite (and InviteDelivery)
         - Notifications addressed to these users
-        Does NOT delete the users themselves.
+        Does NOT delete the users themselves. Large selections run as a
+        background task and notify the requesting admin when done.
         """
-        emails = list(queryset.values_list('email', flat=True))
-        # Parent-child links
-        pcl_parent = ParentChildLink.objects.filter(parent__email__in=emails)
-        pcl_child = ParentChildLink.objects.filter(child__email__in=emails)
-        pcl_count = pcl_parent.count() + pcl_child.count()
-        pcl_parent.delete()
-        pcl_child.delete()
-
-        # Parent link requests
-        plr_parent = ParentLinkRequest.objects.filter(parent__email__in=emails)
-        plr_student = ParentLinkRequest.objects.filter(student__email__in=emails)
-        plr_count = plr_parent.count() + plr_student.count()
-        plr_parent.delete()
-        plr_student.delete()
-
-        # Parent invites and deliveries
-        inv_qs = ParentInvite.objects.filter(parent__email__in=emails) | ParentInvite.objects.filter(child_email__in=emails)
-        inv_ids = list(inv_qs.values_list('id', flat=True))
-        del_count_deliveries = InviteDelivery.objects.filter(invite_id__in=inv_ids).count()
-        InviteDelivery.objects.filter(invite_id__in=inv_ids).delete()
-        inv_count = inv_qs.count()
-        inv_qs.delete()
-
-        # Notifications
-        notif_count = Notification.objects.filter(user__email__in=emails).count()
-        Notification.objects.filter(user__email__in=emails).delete()
-
+        user_ids = list(queryset.values_list('id', flat=True))
+        if len(user_ids) > CLEANUP_INLINE_LIMIT:
+            try:
+                cleanup_user_artifacts_task.delay(user_ids, notify_user_id=request.user.pk)
+                self.message_user(
+                    request,
+                    f"Cleanup queued for {len(user_ids)} users; you will get a notification when it finishes.")
+                return
+            except Exception:
+                # Broker unavailable: fall back to running inline
+                pass
+        counts = cleanup_user_artifacts(user_ids=user_ids)
         self.message_user(
             request,
-            f"Artifacts removed: Links={pcl_count}, LinkRequests={plr_count}, Invites={inv_count}, Deliveries={del_count_deliveries}, Notifications={notif_count}. Users retained.")
+            f"Artifacts removed: {format_cleanup_summary(counts)}. Users retained.")
     cleanup_user_artifacts.short_description = "Cleanup linked artifacts for selected users"
 
 
@@ -100,20 +99,30 @@ class ParentInviteAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        # Annotate totals to avoid extra queries in list_display
+        # Totals and latest delivery per invite as correlated subqueries, so the
+        # page is one SELECT without a GROUP BY over the deliveries join
+        per_invite = InviteDelivery.objects.filter(invite=OuterRef('pk')).order_by().values('invite')
+        last = InviteDelivery.objects.filter(invite=OuterRef('pk')).order_by('-sent_at', '-id')
         qs = qs.annotate(
-            _total_sent=Count('deliveries', distinct=True),
-            _total_failed=Count('deliveries', filter=Q(deliveries__success=False), distinct=True),
+            _total_sent=Coalesce(Subquery(per_invite.annotate(n=Count('id')).values('n')[:1]), 0),
+            _total_failed=Coalesce(Subquery(per_invite.filter(success=False).annotate(n=Count('id')).values('n')[:1]), 0),
+            _last_sent_at=Subquery(last.values('sent_at')[:1]),
+            _last_success=Subquery(last.values('success')[:1]),
         )
         return qs
 
     def last_delivery_time(self, obj):
-        last = obj.deliveries.all().first() if hasattr(obj, 'deliveries') else None
+        if hasattr(obj, '_last_sent_at'):
+            return obj._last_sent_at
+        last = obj.deliveries.all().first()
         return last.sent_at if last else None
     last_delivery_time.short_description = "Last emailed"
+    last_delivery_time.admin_order_field = "_last_sent_at"
 
     def last_delivery_success(self, obj):
-        last = obj.deliveries.all().first() if hasattr(obj, 'deliveries') else None
+        if hasattr(obj, '_last_success'):
+            return obj._last_success
+        last = obj.deliveries.all().first()
         return last.success if last else None
     last_delivery_success.boolean = True
     last_delivery_success.short_description = "Last success"
@@ -205,50 +214,31 @@ class ParentInviteAdmin(admin.ModelAdmin):
         return custom + urls
 
     def analytics_view(self, request):
-        # Time window
+        # Time window (answered from daily rollups, 0 = all time)
         days = int(request.GET.get('days', '30'))
-        since = timezone.now() - timedelta(days=days)
-        qs = InviteDelivery.objects.all()
-        if days > 0:
-            qs = qs.filter(sent_at__gte=since)
+        qs = rollups_for_window(days)
 
         # By day
-        by_day = (
-            qs.annotate(day=TruncDate('sent_at'))
-              .values('day')
-              .annotate(total=Count('id'), ok=Count('id', filter=Q(success=True)))
-              .order_by('day')
-        )
+        by_day = rollup_by_day(qs)
         day_labels = [row['day'].strftime('%Y-%m-%d') for row in by_day]
         day_total = [int(row['total'] or 0) for row in by_day]
         day_ok = [int(row['ok'] or 0) for row in by_day]
 
         # By week
-        by_week = (
-            qs.annotate(week=TruncWeek('sent_at'))
-              .values('week')
-              .annotate(total=Count('id'), ok=Count('id', filter=Q(success=True)))
-              .order_by('week')
-        )
-        week_labels = [row['week'].date().isoformat() for row in by_week]
+        by_week = rollup_by_week(qs)
+        week_labels = [row['week'].isoformat() for row in by_week]
         week_total = [int(row['total'] or 0) for row in by_week]
         week_ok = [int(row['ok'] or 0) for row in by_week]
 
-        total = qs.count()
-        ok_count = qs.filter(success=True).count()
+        total, ok_count = rollup_totals(qs)
         fail_count = total - ok_count
         success_rate = (ok_count / total * 100.0) if total else 0.0
 
-        # Top domains by failure (Python aggregation for portability)
+        # Top domains by failure
         domain_counts = {}
-        for row in qs.values('to_email', 'success'):
-            email = row['to_email'] or ''
-            dom = email.split('@')[-1].lower() if '@' in email else ''
-            if dom not in domain_counts:
-                domain_counts[dom] = {'failed': 0, 'total': 0}
-            domain_counts[dom]['total'] += 1
-            if not row['success']:
-                domain_counts[dom]['failed'] += 1
+        for row in rollup_by_domain(qs):
+            total_d = int(row['total'] or 0)
+            domain_counts[row['domain'] or ''] = {'failed': total_d - int(row['ok'] or 0), 'total': total_d}
         top_domains = [
             {
                 'domain': dom or '(unknown)',
@@ -277,18 +267,13 @@ class ParentInviteAdmin(admin.ModelAdmin):
         bad_domains.sort(key=lambda x: (x['fail_rate'], x['total']), reverse=True)
 
         # Per-parent outcomes
-        per_parent_qs = (
-            qs.values('invite__parent_id', 'invite__parent__email')
-              .annotate(total=Count('id'), ok=Count('id', filter=Q(success=True)))
-              .order_by('-total')
-        )
         per_parent = []
-        for row in per_parent_qs:
+        for row in rollup_by_parent(qs):
             total_p = int(row.get('total') or 0)
             ok_p = int(row.get('ok') or 0)
             rate_p = (ok_p / total_p * 100.0) if total_p else 0.0
             per_parent.append({
-                'parent_email': row.get('invite__parent__email') or '(unknown)',
+                'parent_email': row.get('parent__email') or '(unknown)',
                 'total': total_p,
                 'ok': ok_p,
                 'success_rate': rate_p,
@@ -317,27 +302,13 @@ class ParentInviteAdmin(admin.ModelAdmin):
     def analytics_export(self, request):
         days = int(request.GET.get('days', '30'))
         since = timezone.now() - timedelta(days=days)
-        qs = InviteDelivery.objects.select_related('invite__parent').all()
+        qs = InviteDelivery.objects.all()
         if days > 0:
             qs = qs.filter(sent_at__gte=since)
-        # Stream CSV
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="invite_deliveries.csv"'
-        writer = csv.writer(response)
-        writer.writerow(['sent_at', 'to_email', 'subject', 'success', 'error_text', 'invite_id', 'parent_id', 'parent_email'])
-        for d in qs.order_by('-sent_at'):
-            parent = getattr(d.invite, 'parent', None)
-            writer.writerow([
-                d.sent_at.isoformat() if d.sent_at else '',
-                d.to_email,
-                d.subject,
-                '1' if d.success else '0',
-                (d.error_text or '').replace('\n', ' ').replace('\r', ' '),
-                d.invite_id,
-                getattr(parent, 'id', ''),
-                getattr(parent, 'email', ''),
-            ])
-        return response
+        # Stream CSV straight from a cursor; no model instances are built
+        fields = ('sent_at', 'to_email', 'subject', 'success', 'error_text', 'invite_id', 'invite__parent_id', 'invite__parent__email')
+        header = ['sent_at', 'to_email', 'subject', 'success', 'error_text', 'invite_id', 'parent_id', 'parent_email']
+        return streaming_csv_response('invite_deliveries.csv', header, iter_rows(qs.order_by('-sent_at'), fields))
 
 class HasSuccessfulDeliveryFilter(admin.SimpleListFilter):
     title = 'has successful delivery'
@@ -364,18 +335,25 @@ class TopParentFailuresFilter(admin.SimpleListFilter):
     title = 'top parent failures'
     parameter_name = 'parent_fail'
 
+    cache_key = 'accounts:admin:top_parent_failures'
+    cache_ttl = 60
+
     def lookups(self, request, model_admin):
-        # Compute top 10 parents by failed deliveries
-        agg = (
-            InviteDelivery.objects.values('invite__parent_id', 'invite__parent__email')
-            .annotate(failed=Count('id', filter=Q(success=False)), total=Count('id'))
-            .filter(failed__gt=0)
-            .order_by('-failed', '-total')[:10]
-        )
-        return [
-            (str(row['invite__parent_id'] or ''), f"{row['invite__parent__email'] or '(unknown)'} ({row['failed']}/{row['total']})")
-            for row in agg
-        ]
+        # Top 10 parents by failed deliveries, from rollups and cached briefly
+        choices = cache.get(self.cache_key)
+        if choices is None:
+            agg = (
+                InviteDeliveryRollup.objects.values('parent_id', 'parent__email')
+                .annotate(sent=Sum('total'), failed=Sum(F('total') - F('ok')))
+                .filter(failed__gt=0)
+                .order_by('-failed', '-sent')[:10]
+            )
+            choices = [
+                (str(row['parent_id'] or ''), f"{row['parent__email'] or '(unknown)'} ({row['failed']}/{row['sent']})")
+                for row in agg
+            ]
+            cache.set(self.cache_key, choices, self.cache_ttl)
+        return choices
 
     def queryset(self, request, queryset):
         val = self.value()
@@ -392,16 +370,29 @@ ParentInviteAdmin.list_filter = ParentInviteAdmin.list_filter + (TopParentFailur
 
 
 @admin.register(InviteDelivery)
-class InviteDeliveryAdmin(admin.ModelAdmin):
+class InviteDeliveryAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ("to_email", "subject", "success", "sent_at", "invite",)
     list_filter = ("success", "sent_at")
     search_fields = ("to_email", "subject", "invite__child_email", "invite__parent__username", "invite__parent__email")
+    prefix_search_fields = ("to_email", "subject")
+    related_prefix_search = {"invite": ("child_email",), "invite__parent": ("username", "email")}
+    list_select_related = ("invite__parent",)
+    # pk follows sent_at (auto_now_add) and keeps deep pages on the pk index
+    ordering = ("-pk",)
     readonly_fields = ("invite", "to_email", "subject", "sent_at", "success", "error_text")
 
 
 # ---- Notifications Admin ----
 @admin.register(Notification)
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(LargeTableAdminMixin, CsvExportAdminMixin, admin.ModelAdmin):
     list_display = ("user", "category", "severity", "title", "is_read", "read_at", "created_at")
     list_filter = ("category", "severity", "is_read")
     search_fields = ("title", "user__username", "user__email")
+    prefix_search_fields = ("title",)
+    related_prefix_search = {"user": ("username", "email")}
+    list_select_related = ("user",)
+    # pk follows created_at (auto_now_add) and keeps deep pages on the pk index
+    ordering = ("-pk",)
+    actions = ["export_csv"]
+    csv_export_fields = ("id", "user_id", "user__email", "category", "severity", "title", "is_read", "read_at", "created_at")
+    csv_export_filename = "notifications.csv"
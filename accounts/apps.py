@@ -6,6 +6,13 @@ class AccountsConfig(AppConfig):
     name = 'accounts'
 
     def ready(self):  # Auto-create/update configured admin on startup
+        # Registers the delivery rollup model and its post_save hook
+        from . import invite_rollups  # noqa: F401
+        # Resized/WebP avatar variants are generated in the background after upload
+        from eduvanta.images import connect_image_field
+        from .models import User
+        connect_image_field(User, 'avatar', 'avatar')
+
         try:
             from django.conf import settings
             from django.contrib.auth import get_user_model
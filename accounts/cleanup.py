@@ -0,0 +1,87 @@
+"""Set-based removal of the artifacts linked to a group of users.
+
+User ids (and their emails) are resolved once; every table is then cleaned by
+primary key in bounded chunks, each in its own short transaction, so a large
+cleanup never holds long table locks. Used by the admin action (inline or via
+the Celery task) and by the clean_test_seed command.
+"""
+from django.db import transaction
+from django.db.models import Q
+
+from .models import User, ParentChildLink, ParentInvite, InviteDelivery, Notification, ParentLinkRequest
+from .invite_rollups import rebuild_invite_rollups
+
+CLEANUP_CHUNK_SIZE = 500
+# Admin selections above this size are handed to the Celery task
+CLEANUP_INLINE_LIMIT = 200
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _delete_by_pk(queryset, label, chunk_size, progress, counts):
+    """Delete rows matched by `queryset` in pk-ordered chunks of `chunk_size`."""
+    model = queryset.model
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    while True:
+        batch = list(pks[:chunk_size])
+        if not batch:
+            break
+        with transaction.atomic():
+            model.objects.filter(pk__in=batch).delete()
+        counts[label] += len(batch)
+        if progress:
+            progress(label, counts[label])
+
+
+def cleanup_user_artifacts(user_ids=None, emails=None, delete_users=False, chunk_size=CLEANUP_CHUNK_SIZE, progress=None):
+    """Remove links, link requests, invites (+deliveries) and notifications for users.
+
+    Users are selected by `user_ids` and/or `emails`. Invites addressed to the
+    emails are removed even when no account exists for them. `progress`, if
+    given, is called as progress(label, deleted_so_far) after every chunk.
+    Returns a dict of deleted row counts per artifact type.
+    """
+    emails = [e for e in (emails or []) if e]
+    user_filter = Q(pk__in=list(user_ids or []))
+    if emails:
+        user_filter |= Q(email__in=emails)
+    users = list(User.objects.filter(user_filter).values_list('id', 'email'))
+    ids = [uid for uid, _ in users]
+    all_emails = sorted(set(emails) | {email for _, email in users if email})
+
+    counts = dict.fromkeys(('links', 'link_requests', 'deliveries', 'invites', 'notifications', 'users'), 0)
+    touched_parents = set()
+
+    for id_batch in _chunks(ids, chunk_size):
+        _delete_by_pk(ParentChildLink.objects.filter(Q(parent_id__in=id_batch) | Q(child_id__in=id_batch)), 'links', chunk_size, progress, counts)
+        _delete_by_pk(ParentLinkRequest.objects.filter(Q(parent_id__in=id_batch) | Q(student_id__in=id_batch)), 'link_requests', chunk_size, progress, counts)
+
+    invite_batches = [ParentInvite.objects.filter(parent_id__in=b) for b in _chunks(ids, chunk_size)]
+    invite_batches += [ParentInvite.objects.filter(child_email__in=b) for b in _chunks(all_emails, chunk_size)]
+    for invites in invite_batches:
+        touched_parents.update(invites.values_list('parent_id', flat=True).distinct())
+        _delete_by_pk(InviteDelivery.objects.filter(invite__in=invites.values('pk')), 'deliveries', chunk_size, progress, counts)
+        _delete_by_pk(invites, 'invites', chunk_size, progress, counts)
+
+    for id_batch in _chunks(ids, chunk_size):
+        _delete_by_pk(Notification.objects.filter(user_id__in=id_batch), 'notifications', chunk_size, progress, counts)
+
+    # Keep analytics rollups in line with the deliveries that were removed
+    if counts['deliveries']:
+        rebuild_invite_rollups(parent_ids=touched_parents - set(ids) if delete_users else touched_parents)
+
+    if delete_users:
+        for id_batch in _chunks(ids, chunk_size):
+            _delete_by_pk(User.objects.filter(pk__in=id_batch), 'users', chunk_size, progress, counts)
+
+    return counts
+
+
+def format_cleanup_summary(counts):
+    return (
+        f"Links={counts['links']}, LinkRequests={counts['link_requests']}, Invites={counts['invites']}, "
+        f"Deliveries={counts['deliveries']}, Notifications={counts['notifications']}"
+    )
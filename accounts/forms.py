@@ -1,11 +1,12 @@
 from django import forms
 from courses.models import Department, Specialization, SubSpecialization
+from courses.taxonomy import TaxonomyChoiceField
 
 class DepartmentSelectionForm(forms.Form):
-    department = forms.ModelChoiceField(queryset=Department.objects.all(), empty_label='Select a department')
+    department = TaxonomyChoiceField('department', queryset=Department.objects.all(), empty_label='Select a department')
 
 class SpecializationSelectionForm(forms.Form):
-    specialization = forms.ModelChoiceField(queryset=Specialization.objects.all(), empty_label='Select a specialization')
+    specialization = TaxonomyChoiceField('specialization', queryset=Specialization.objects.all(), empty_label='Select a specialization')
 
 class SubSpecializationSelectionForm(forms.Form):
-    sub_specialization = forms.ModelChoiceField(queryset=SubSpecialization.objects.all(), empty_label='Select a subspecialization')
+    sub_specialization = TaxonomyChoiceField('subspecialization', queryset=SubSpecialization.objects.all(), empty_label='Select a subspecialization')
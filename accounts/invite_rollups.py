@@ -0,0 +1,150 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncWeek
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import InviteDelivery
+
+
+def email_domain(email):
+    email = email or ''
+    return email.split('@')[-1].lower() if '@' in email else ''
+
+
+class InviteDeliveryRollup(models.Model):
+    """Per-day delivery counters keyed by recipient domain and inviting parent.
+
+    Maintained incrementally when an InviteDelivery is created, so analytics can
+    answer any window (including all time) without scanning raw delivery rows.
+    """
+    day = models.DateField()
+    domain = models.CharField(max_length=255, blank=True, default='')
+    parent = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='invite_delivery_rollups')
+    total = models.PositiveIntegerField(default=0)
+    ok = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('day', 'domain', 'parent')
+        indexes = [models.Index(fields=['parent', 'day'], name='accounts_rollup_parent_day_idx')]
+        ordering = ['day']
+
+    def __str__(self):
+        return f"{self.day} {self.domain or '(unknown)'} parent={self.parent_id}: {self.ok}/{self.total}"
+
+
+def record_delivery(delivery):
+    """Add a single delivery to its (day, domain, parent) bucket."""
+    key = {
+        'day': timezone.localdate(delivery.sent_at or timezone.now()),
+        'domain': email_domain(delivery.to_email),
+        # The invite is already cached on freshly created deliveries
+        'parent_id': getattr(delivery.invite, 'parent_id', None),
+    }
+    if key['parent_id'] is None:
+        return
+    ok = 1 if delivery.success else 0
+    bucket = InviteDeliveryRollup.objects.filter(**key)
+    if bucket.update(total=F('total') + 1, ok=F('ok') + ok):
+        return
+    try:
+        with transaction.atomic():
+            InviteDeliveryRollup.objects.create(total=1, ok=ok, **key)
+    except IntegrityError:
+        # Another writer created the bucket between our update and insert
+        bucket.update(total=F('total') + 1, ok=F('ok') + ok)
+
+
+@receiver(post_save, sender=InviteDelivery, dispatch_uid='accounts.invite_rollups.record_delivery')
+def _rollup_on_create(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_delivery(instance)
+
+
+@transaction.atomic
+def rebuild_invite_rollups(parent_ids=None):
+    """Recompute rollups from raw deliveries (all parents, or only `parent_ids`).
+
+    Used to backfill history and to repair buckets after raw rows are deleted.
+    Grouping happens in the database; only one row per (day, email, parent) is
+    read back to derive the recipient domain.
+    """
+    rollups = InviteDeliveryRollup.objects.all()
+    deliveries = InviteDelivery.objects.all()
+    if parent_ids is not None:
+        parent_ids = list(parent_ids)
+        rollups = rollups.filter(parent_id__in=parent_ids)
+        deliveries = deliveries.filter(invite__parent_id__in=parent_ids)
+    rollups.delete()
+
+    buckets = {}
+    grouped = (
+        deliveries.annotate(day=TruncDate('sent_at'))
+        .values('day', 'to_email', 'invite__parent_id')
+        .annotate(total=Count('id'), ok=Count('id', filter=Q(success=True)))
+        .order_by()
+    )
+    for row in grouped.iterator(chunk_size=2000):
+        key = (row['day'], email_domain(row['to_email']), row['invite__parent_id'])
+        bucket = buckets.setdefault(key, [0, 0])
+        bucket[0] += row['total'] or 0
+        bucket[1] += row['ok'] or 0
+
+    InviteDeliveryRollup.objects.bulk_create(
+        [
+            InviteDeliveryRollup(day=day, domain=domain, parent_id=parent_id, total=total, ok=ok)
+            for (day, domain, parent_id), (total, ok) in buckets.items()
+        ],
+        batch_size=1000,
+    )
+    return len(buckets)
+
+
+def rollups_for_window(days):
+    """Rollup rows covering the last `days` days (0 or less means all time)."""
+    qs = InviteDeliveryRollup.objects.all()
+    if days and days > 0:
+        qs = qs.filter(day__gte=timezone.localdate() - timedelta(days=days))
+    return qs
+
+
+def rollup_totals(qs):
+    agg = qs.aggregate(total=Sum('total'), ok=Sum('ok'))
+    return int(agg['total'] or 0), int(agg['ok'] or 0)
+
+
+def rollup_by_day(qs):
+    return (
+        qs.values('day')
+          .annotate(total=Sum('total'), ok=Sum('ok'))
+          .order_by('day')
+    )
+
+
+def rollup_by_week(qs):
+    return (
+        qs.annotate(week=TruncWeek('day'))
+          .values('week')
+          .annotate(total=Sum('total'), ok=Sum('ok'))
+          .order_by('week')
+    )
+
+
+def rollup_by_domain(qs):
+    return (
+        qs.values('domain')
+          .annotate(total=Sum('total'), ok=Sum('ok'))
+          .order_by()
+    )
+
+
+def rollup_by_parent(qs):
+    return (
+        qs.values('parent_id', 'parent__email')
+          .annotate(total=Sum('total'), ok=Sum('ok'))
+          .order_by('-total')
+    )
@@ -1,9 +1,15 @@
-from django.core.management.base import BaseCommand
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
 from django.db.models import Count, Q
-from django.db.models.functions import TruncDate, TruncWeek
-from accounts.models import InviteDelivery
-from datetime import timedelta
+from django.db.models.functions import TruncDate
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from accounts.models import InviteDelivery
+from accounts.invite_rollups import InviteDeliveryRollup, rebuild_invite_rollups, rollup_by_day
 
 
 class Command(BaseCommand):
@@ -11,88 +17,177 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('--days', type=int, default=30, help='Analyze only the last N days (default: 30). Use 0 for all time.')
+        parser.add_argument('--since', help='Analyze deliveries from this ISO date/datetime onwards (overrides --days); use for incremental cron runs')
         parser.add_argument('--top', type=int, default=10, help='Top N emails with most failures (default: 10)')
+        parser.add_argument('--format', choices=('text', 'json', 'csv'), default='text', help='Output format (default: text)')
+        parser.add_argument('--source', choices=('rollups', 'raw'), default='rollups', help='Read daily counts from rollups (default) or raw deliveries')
+        parser.add_argument('--rebuild-rollups', action='store_true', help='Recompute daily rollups from raw deliveries before reporting')
 
     def handle(self, *args, **options):
+        since = self._resolve_since(options)
+        if options['rebuild_rollups']:
+            buckets = rebuild_invite_rollups()
+            if options['format'] == 'text':
+                self.stdout.write(f"Rebuilt {buckets} rollup buckets.")
+
+        report = self._build_report(since, options['source'], options['top'])
+        if options['format'] == 'json':
+            self.stdout.write(json.dumps(report, indent=2))
+        elif options['format'] == 'csv':
+            self._write_csv(report)
+        else:
+            self._write_text(report, options)
+
+    def _resolve_since(self, options):
+        raw = options.get('since')
+        if raw:
+            value = parse_datetime(raw)
+            if value is None:
+                day = parse_date(raw)
+                if day is None:
+                    raise CommandError(f"Invalid --since value: {raw!r} (expected ISO date or datetime)")
+                value = datetime.combine(day, time.min)
+            if timezone.is_naive(value):
+                value = timezone.make_aware(value)
+            return value
         days = options['days']
-        top_n = options['top']
+        if days and days > 0:
+            return timezone.now() - timedelta(days=days)
+        return None
 
+    def _daily_counts(self, since, source):
+        """One grouped pass returning [(day, total, ok)]; totals and weeks derive from it."""
+        if source == 'raw':
+            qs = InviteDelivery.objects.all()
+            if since:
+                qs = qs.filter(sent_at__gte=since)
+            rows = (
+                qs.annotate(day=TruncDate('sent_at'))
+                  .values('day')
+                  .annotate(total=Count('id'), ok=Count('id', filter=Q(success=True)))
+                  .order_by('day')
+            )
+        else:
+            qs = InviteDeliveryRollup.objects.all()
+            partial = []
+            if since:
+                first_day = timezone.localdate(since)
+                if since > timezone.make_aware(datetime.combine(first_day, time.min)):
+                    # Rollups hold whole days: count the rest of the first day from raw rows,
+                    # so a mid-day --since (e.g. the last generated_at) is not re-counted
+                    next_day = timezone.make_aware(datetime.combine(first_day + timedelta(days=1), time.min))
+                    head = InviteDelivery.objects.filter(sent_at__gte=since, sent_at__lt=next_day).aggregate(
+                        total=Count('id'), ok=Count('id', filter=Q(success=True)),
+                    )
+                    if head['total']:
+                        partial.append({'day': first_day, **head})
+                    first_day += timedelta(days=1)
+                qs = qs.filter(day__gte=first_day)
+            rows = partial + list(rollup_by_day(qs))
+        return [(row['day'], int(row['total'] or 0), int(row['ok'] or 0)) for row in rows]
+
+    def _build_report(self, since, source, top_n):
+        daily = self._daily_counts(since, source)
+
+        weeks = {}
+        for day, total, ok in daily:
+            week = day - timedelta(days=day.weekday())
+            bucket = weeks.setdefault(week, [0, 0])
+            bucket[0] += total
+            bucket[1] += ok
+        total = sum(row[1] for row in daily)
+        successes = sum(row[2] for row in daily)
+
+        # Second pass: per-recipient failures need raw rows
         qs = InviteDelivery.objects.all()
-        if days and days > 0:
-            since = timezone.now() - timedelta(days=days)
+        if since:
             qs = qs.filter(sent_at__gte=since)
+        top_fail = (
+            qs.values('to_email')
+              .annotate(failed=Count('id', filter=Q(success=False)), total=Count('id'))
+              .filter(failed__gt=0)
+              .order_by('-failed', '-total')[:top_n]
+        )
+
+        def counts(t, ok):
+            return {'total': t, 'ok': ok, 'failed': t - ok, 'success_rate': round(ok / t * 100.0, 2) if t else 0.0}
+
+        return {
+            'generated_at': timezone.now().isoformat(),
+            'since': since.isoformat() if since else None,
+            'source': source,
+            'totals': counts(total, successes),
+            'by_day': [dict(day=day.isoformat(), **counts(t, ok)) for day, t, ok in daily],
+            'by_week': [dict(week=week.isoformat(), **counts(t, ok)) for week, (t, ok) in sorted(weeks.items())],
+            'top_failures': [
+                {'email': row['to_email'], 'failed': row['failed'] or 0, 'total': row['total'] or 0}
+                for row in top_fail
+            ],
+        }
 
-        total = qs.count()
-        successes = qs.filter(success=True).count()
-        failures = total - successes
-        success_rate = (successes / total * 100.0) if total else 0.0
+    def _write_csv(self, report):
+        writer = csv.writer(self.stdout, lineterminator='\n')
+        writer.writerow(['kind', 'key', 'total', 'ok', 'failed', 'success_rate'])
+        t = report['totals']
+        writer.writerow(['total', report['since'] or 'all', t['total'], t['ok'], t['failed'], t['success_rate']])
+        for row in report['by_day']:
+            writer.writerow(['day', row['day'], row['total'], row['ok'], row['failed'], row['success_rate']])
+        for row in report['by_week']:
+            writer.writerow(['week', row['week'], row['total'], row['ok'], row['failed'], row['success_rate']])
+        for row in report['top_failures']:
+            ok = row['total'] - row['failed']
+            rate = round(ok / row['total'] * 100.0, 2) if row['total'] else 0.0
+            writer.writerow(['recipient', row['email'], row['total'], ok, row['failed'], rate])
+
+    def _write_text(self, report, options):
+        days = options['days']
+        top_n = options['top']
+        totals = report['totals']
 
         self.stdout.write(self.style.MIGRATE_HEADING('Invite Delivery Analytics'))
-        window = f"last {days} days" if days and days > 0 else "all time"
+        if options.get('since'):
+            window = f"since {report['since']}"
+        else:
+            window = f"last {days} days" if days and days > 0 else "all time"
         self.stdout.write(f"Window: {window}")
         self.stdout.write("")
 
         # Totals
         self.stdout.write(self.style.HTTP_INFO('Totals'))
-        self.stdout.write(f"Total deliveries: {total}")
-        self.stdout.write(f"Successful: {successes}")
-        self.stdout.write(f"Failed: {failures}")
-        self.stdout.write(f"Success rate: {success_rate:.2f}%")
+        self.stdout.write(f"Total deliveries: {totals['total']}")
+        self.stdout.write(f"Successful: {totals['ok']}")
+        self.stdout.write(f"Failed: {totals['failed']}")
+        self.stdout.write(f"Success rate: {totals['success_rate']:.2f}%")
         self.stdout.write("")
 
         # Breakdown by day
         self.stdout.write(self.style.HTTP_INFO('By Day'))
-        by_day = (
-            qs.annotate(day=TruncDate('sent_at'))
-              .values('day')
-              .annotate(total=Count('id'), ok=Count('id', filter=Q(success=True)))
-              .order_by('day')
-        )
-        if not by_day:
+        if not report['by_day']:
             self.stdout.write("(no data)")
         else:
-            for row in by_day:
-                day_total = row['total'] or 0
-                day_ok = row['ok'] or 0
-                rate = (day_ok / day_total * 100.0) if day_total else 0.0
-                self.stdout.write(f"{row['day']}: total={day_total} ok={day_ok} rate={rate:.1f}%")
+            for row in report['by_day']:
+                self.stdout.write(f"{row['day']}: total={row['total']} ok={row['ok']} rate={row['success_rate']:.1f}%")
         self.stdout.write("")
 
         # Breakdown by week
         self.stdout.write(self.style.HTTP_INFO('By Week'))
-        by_week = (
-            qs.annotate(week=TruncWeek('sent_at'))
-              .values('week')
-              .annotate(total=Count('id'), ok=Count('id', filter=Q(success=True)))
-              .order_by('week')
-        )
-        if not by_week:
+        if not report['by_week']:
             self.stdout.write("(no data)")
         else:
-            for row in by_week:
-                w_total = row['total'] or 0
-                w_ok = row['ok'] or 0
-                rate = (w_ok / w_total * 100.0) if w_total else 0.0
-                self.stdout.write(f"{row['week'].date()}: total={w_total} ok={w_ok} rate={rate:.1f}%")
+            for row in report['by_week']:
+                self.stdout.write(f"{row['week']}: total={row['total']} ok={row['ok']} rate={row['success_rate']:.1f}%")
         self.stdout.write("")
 
         # Top failure recipients
         self.stdout.write(self.style.HTTP_INFO(f'Top {top_n} emails with most failures'))
-        top_fail = (
-            qs.values('to_email')
-              .annotate(failed=Count('id', filter=Q(success=False)), total=Count('id'))
-              .filter(failed__gt=0)
-              .order_by('-failed', '-total')[:top_n]
-        )
-        if not top_fail:
+        if not report['top_failures']:
             self.stdout.write("(no failures)")
         else:
-            for row in top_fail:
-                email = row['to_email']
-                failed = row['failed'] or 0
-                t = row['total'] or 0
+            for row in report['top_failures']:
+                failed = row['failed']
+                t = row['total']
                 rate_fail = (failed / t * 100.0) if t else 0.0
-                self.stdout.write(f"{email}: failed={failed} / total={t} ({rate_fail:.1f}% failure)")
+                self.stdout.write(f"{row['email']}: failed={failed} / total={t} ({rate_fail:.1f}% failure)")
 
         self.stdout.write("")
         self.stdout.write(self.style.SUCCESS('Analytics complete.'))
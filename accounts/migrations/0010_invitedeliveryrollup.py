@@ -0,0 +1,61 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    InviteDelivery = apps.get_model('accounts', 'InviteDelivery')
+    InviteDeliveryRollup = apps.get_model('accounts', 'InviteDeliveryRollup')
+    buckets = {}
+    grouped = (
+        InviteDelivery.objects.annotate(day=TruncDate('sent_at'))
+        .values('day', 'to_email', 'invite__parent_id')
+        .annotate(total=Count('id'), ok=Count('id', filter=Q(success=True)))
+        .order_by()
+    )
+    for row in grouped.iterator(chunk_size=2000):
+        email = row['to_email'] or ''
+        domain = email.split('@')[-1].lower() if '@' in email else ''
+        bucket = buckets.setdefault((row['day'], domain, row['invite__parent_id']), [0, 0])
+        bucket[0] += row['total'] or 0
+        bucket[1] += row['ok'] or 0
+    InviteDeliveryRollup.objects.bulk_create(
+        [
+            InviteDeliveryRollup(day=day, domain=domain, parent_id=parent_id, total=total, ok=ok)
+            for (day, domain, parent_id), (total, ok) in buckets.items()
+        ],
+        batch_size=1000,
+    )
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_parentlinkrequest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InviteDeliveryRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('domain', models.CharField(blank=True, default='', max_length=255)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('ok', models.PositiveIntegerField(default=0)),
+                ('parent', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='invite_delivery_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['day'],
+                'indexes': [models.Index(fields=['parent', 'day'], name='accounts_rollup_parent_day_idx')],
+                'unique_together': {('day', 'domain', 'parent')},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, reverse_code=noop),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+# Expression indexes matching the SQL Django emits for istartswith on Postgres
+# (UPPER(col::text) LIKE UPPER('term%')), used by the admin prefix searches.
+PREFIX_INDEXES = [
+    ('accounts_user_username_prefix_idx', 'accounts_user', 'username'),
+    ('accounts_user_email_prefix_idx', 'accounts_user', 'email'),
+    ('accounts_user_first_name_prefix_idx', 'accounts_user', 'first_name'),
+    ('accounts_user_last_name_prefix_idx', 'accounts_user', 'last_name'),
+    ('accounts_notif_title_prefix_idx', 'accounts_notification', 'title'),
+    ('accounts_invdel_to_email_prefix_idx', 'accounts_invitedelivery', 'to_email'),
+    ('accounts_invdel_subject_prefix_idx', 'accounts_invitedelivery', 'subject'),
+    ('accounts_invite_child_email_prefix_idx', 'accounts_parentinvite', 'child_email'),
+]
+
+
+def create_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in PREFIX_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{table}" (UPPER("{column}"::text) text_pattern_ops)'
+        )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _table, _column in PREFIX_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0010_invitedeliveryrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, reverse_code=drop_prefix_indexes),
+    ]
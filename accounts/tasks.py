@@ -0,0 +1,23 @@
+from celery import shared_task
+
+from .cleanup import cleanup_user_artifacts, format_cleanup_summary
+
+
+@shared_task(bind=True)
+def cleanup_user_artifacts_task(self, user_ids, delete_users=False, notify_user_id=None):
+    """Background variant of the admin cleanup action; reports progress via task state."""
+    def progress(label, deleted):
+        if self.request.id:
+            self.update_state(state='PROGRESS', meta={'artifact': label, 'deleted': deleted})
+
+    counts = cleanup_user_artifacts(user_ids=user_ids, delete_users=delete_users, progress=progress)
+    if notify_user_id:
+        from .models import Notification
+        Notification.objects.create(
+            user_id=notify_user_id,
+            category='system',
+            severity='success',
+            title='User artifact cleanup finished',
+            body=f"Artifacts removed: {format_cleanup_summary(counts)}.",
+        )
+    return counts
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class AnnouncementsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'announcements'
+
+    def ready(self):
+        # Change stamp behind the announcements API's ETag/Last-Modified
+        from eduvanta.conditional import track
+        from .models import Announcement, Category
+        track('announcements', Announcement, Category)
@@ -1,7 +1,8 @@
-from rest_framework import serializers
+from eduvanta.api_fields import DynamicFieldsModelSerializer
+
 from .models import Announcement
 
-class AnnouncementSerializer(serializers.ModelSerializer):
+class AnnouncementSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Announcement
         fields = '__all__'
@@ -7,6 +7,8 @@ from django.contrib.auth.decorators import user_passes_test, login_required
 from django.contrib import messages
 from django.db.models import Q
 from .models import Category
+from eduvanta.api_fields import SparseFieldsMixin
+from eduvanta.conditional import ConditionalGetMixin
 
 # Create your views here.
 
@@ -126,7 +128,13 @@ def delete_announcement(request, pk):
     # Safety: GET will just redirect to detail
     return redirect('announcements:announcement_detail', pk=pk)
 
-class AnnouncementViewSet(viewsets.ModelViewSet):
-    queryset = Announcement.objects.all()
+class AnnouncementViewSet(ConditionalGetMixin, SparseFieldsMixin, viewsets.ModelViewSet):
+    # Cursor-paginated newest first (see eduvanta.pagination)
+    queryset = Announcement.objects.order_by('-created_at', '-pk')
     serializer_class = AnnouncementSerializer
     permission_classes = [IsAuthenticated]  # Restrict to authenticated users; refine permissions later
+    # ?fields=/?expand= narrow the SQL; list skips serializer instances (see eduvanta.api_fields)
+    expandable_fields = {'category': ('id', 'name', 'slug'), 'posted_by': ('id', 'username')}
+    fast_list = True
+    # 304 on a matching If-None-Match/If-Modified-Since before any query (see eduvanta.conditional)
+    conditional_groups = ('announcements',)
@@ -1,4 +1,6 @@
 from django.contrib import admin
+from eduvanta.admin_perf import LargeTableAdminMixin
+from eduvanta.exports import CsvExportAdminMixin
 from .models import (
     Department,
     Specialization,
@@ -10,7 +12,9 @@ from .models import (
     Module,
     Lesson,
     CodingAssignment,
+    Submission,
 )
+from .outline import deferred_snapshots
 
 
 @admin.register(Department)
@@ -62,6 +66,11 @@ class CourseAdmin(admin.ModelAdmin):
     filter_horizontal = ("tags",)
     inlines = [ModuleInline]
 
+    def save_related(self, request, form, formsets, change):
+        # One outline rebuild for all inline module edits
+        with deferred_snapshots():
+            super().save_related(request, form, formsets, change)
+
 
 @admin.register(CourseInstructor)
 class CourseInstructorAdmin(admin.ModelAdmin):
@@ -71,10 +80,18 @@ class CourseInstructorAdmin(admin.ModelAdmin):
 
 
 @admin.register(Enrollment)
-class EnrollmentAdmin(admin.ModelAdmin):
+class EnrollmentAdmin(LargeTableAdminMixin, CsvExportAdminMixin, admin.ModelAdmin):
     list_display = ("student", "course", "status", "progress_percent", "grade", "created_at")
     list_filter = ("status",)
     search_fields = ("student__username", "student__email", "course__title")
+    related_prefix_search = {"student": ("username", "email"), "course": ("title",)}
+    list_select_related = ("student", "course")
+    actions = ["export_csv"]
+    csv_export_fields = (
+        "id", "student_id", "student__email", "course_id", "course__title",
+        "status", "progress_percent", "grade", "earned_xp", "created_at", "updated_at",
+    )
+    csv_export_filename = "enrollments.csv"
 
 
 @admin.register(Tag)
@@ -102,3 +119,17 @@ class CodingAssignmentAdmin(admin.ModelAdmin):
     list_display = ("lesson", "language", "auto_grade", "time_limit_ms")
     list_filter = ("language", "auto_grade")
     search_fields = ("lesson__title",)
+
+
+@admin.register(Submission)
+class SubmissionAdmin(CsvExportAdminMixin, admin.ModelAdmin):
+    list_display = ("enrollment", "lesson", "status", "score", "max_score", "submitted_at", "graded_at")
+    list_filter = ("status",)
+    search_fields = ("enrollment__student__username", "enrollment__student__email", "lesson__title")
+    list_select_related = ("enrollment__student", "enrollment__course", "lesson")
+    actions = ["export_csv"]
+    csv_export_fields = (
+        "id", "enrollment_id", "enrollment__student__email", "enrollment__course__title",
+        "lesson_id", "lesson__title", "status", "score", "max_score", "submitted_at", "graded_at",
+    )
+    csv_export_filename = "submissions.csv"
@@ -0,0 +1,436 @@
+import json
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse
+from django.views.decorators.http import require_http_methods
+from rest_framework import mixins, serializers, status, viewsets
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.permissions import AllowAny, BasePermission
+from rest_framework.response import Response
+
+from eduvanta.conditional import conditional_on
+from eduvanta.jsonpatch import JsonPatchError
+
+from .draft_history import RevisionNotFound, draft_history, restore_draft_revision, revision_data, undo_draft
+from .cloning import schedule_clone
+from .drafts import DraftBusy, StaleRevision, apply_draft_patch, draft_state, flush_draft
+from .enrollment import (
+    ALREADY_ENROLLED, ALREADY_WAITLISTED, ENROLLED, FULL, WAITLISTED,
+    CourseCapacity, WaitlistEntry, drop_enrollment, enroll, set_capacity, waitlist_position,
+)
+from .facets import VISIBLE_FILTERS, facet_counts, filters_from_params
+from .models import Course, CourseDraft, CourseInstructor, Enrollment, Module
+from .moderation import ACTIONS, MAX_BATCH, moderate_courses
+from .ordering import InvalidOrdering, reorder_lessons, reorder_modules
+from .outline import CourseOutlineSnapshot, get_outline_snapshot
+from .publishing import publish_draft
+from .schedule import locked_lessons
+from .search import highlight_courses, search_courses
+from .taxonomy import get_taxonomy
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@conditional_on('courses', 'taxonomy')
+def course_search(request):
+    """Ranked catalog search: ?q=<terms>&limit=<n> over published, approved courses."""
+    term = (request.GET.get('q') or request.GET.get('search') or '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', SEARCH_PAGE_SIZE)), 1), SEARCH_MAX_PAGE_SIZE)
+    except ValueError:
+        limit = SEARCH_PAGE_SIZE
+    if not term:
+        return Response({'query': term, 'results': []})
+    qs = Course.objects.filter(published=True, approval_status='approved').select_related('department', 'specialization')
+    courses = highlight_courses(search_courses(qs, term)[:limit], term)
+    results = [
+        {
+            'id': c.id,
+            'slug': c.slug,
+            'title': c.title,
+            'title_highlight': str(getattr(c, 'title_highlight', '') or ''),
+            'snippet': str(getattr(c, 'description_snippet', '') or ''),
+            'department': c.department.name,
+            'specialization': c.specialization.name,
+            'rank': getattr(c, 'search_rank', None),
+        }
+        for c in courses
+    ]
+    return Response({'query': term, 'results': results})
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@conditional_on('courses')
+def course_facets(request):
+    """Facet counts for the catalog sidebar under the current ?department=&tag=... filters."""
+    return Response(facet_counts(filters_from_params(request.GET, base=VISIBLE_FILTERS)))
+
+
+@conditional_on('taxonomy')
+def taxonomy_tree(request):
+    """Department > program/specialization > subspecialization tree for cascading selects."""
+    return HttpResponse(get_taxonomy().to_json(), content_type='application/json')
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def course_outline(request, course_id):
+    """Modules and lessons of a published course, served from its outline snapshot."""
+    snapshot = (CourseOutlineSnapshot.objects
+                .filter(course_id=course_id, course__published=True, course__approval_status='approved')
+                .first())
+    if snapshot is None:
+        if not Course.objects.filter(pk=course_id, published=True, approval_status='approved').exists():
+            raise Http404
+        snapshot = get_outline_snapshot(course_id)
+    return Response({
+        'course': snapshot.course_id,
+        'module_count': snapshot.module_count,
+        'lesson_count': snapshot.lesson_count,
+        'assignment_count': snapshot.assignment_count,
+        'updated_at': snapshot.updated_at,
+        'modules': snapshot.outline,
+    })
+
+
+@login_required
+@require_http_methods(['GET', 'POST'])
+def draft_autosave(request, draft_id):
+    """Wizard autosave: GET the current {revision, data}; POST a JSON Patch delta.
+
+    POST body: ``{"revision": n, "patch": [...], "step": "basic", "flush": false}``.
+    A stale ``revision`` gets 409 with the current state to rebase on. The
+    older ``{"step": ..., "data": ...}`` body is accepted as a whole-step add
+    with no revision check.
+    """
+    draft = get_object_or_404(CourseDraft.objects.only('id', 'owner_id'), pk=draft_id, owner=request.user)
+    if request.method == 'GET':
+        return JsonResponse(draft_state(draft.pk))
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({'error': 'Expected a JSON object'}, status=400)
+    step = payload.get('step') if isinstance(payload.get('step'), str) else None
+    if 'patch' in payload:
+        operations, revision = payload['patch'], payload.get('revision')
+        if not isinstance(revision, int):
+            return JsonResponse({'error': '"revision" is required with "patch"'}, status=400)
+    elif step and 'data' in payload:
+        operations, revision = [{'op': 'add', 'path': '/' + step.replace('~', '~0').replace('/', '~1'), 'value': payload['data']}], None
+    else:
+        return JsonResponse({'error': 'Send "patch" and "revision"'}, status=400)
+    if not isinstance(operations, list):
+        return JsonResponse({'error': '"patch" must be a list'}, status=400)
+    try:
+        new_revision = apply_draft_patch(draft.pk, revision, operations, step=step)
+        if payload.get('flush'):
+            flush_draft(draft.pk)
+    except StaleRevision as exc:
+        return JsonResponse(dict(exc.state, error='stale_revision'), status=409)
+    except DraftBusy:
+        return JsonResponse({'error': 'Draft is busy, retry'}, status=503)
+    except JsonPatchError as exc:
+        return JsonResponse({'error': str(exc)}, status=422)
+    return JsonResponse({'revision': new_revision})
+
+
+@login_required
+@require_http_methods(['GET'])
+def draft_revisions(request, draft_id, revision=None):
+    """Draft history: the list of recorded revisions, or one revision's document."""
+    draft = get_object_or_404(CourseDraft.objects.only('id', 'owner_id'), pk=draft_id, owner=request.user)
+    if revision is None:
+        return JsonResponse({
+            'revision': draft_state(draft.pk)['revision'],
+            'revisions': draft_history(draft.pk),
+        })
+    try:
+        return JsonResponse({'revision': revision, 'data': revision_data(draft.pk, revision)})
+    except RevisionNotFound:
+        raise Http404('Revision not found')
+
+
+@login_required
+@require_http_methods(['POST'])
+def draft_restore(request, draft_id, revision=None):
+    """Restore `revision` (or undo the last change) as a new revision.
+
+    Optional body ``{"revision": n}`` with the client's current revision; a
+    stale one gets 409 like autosave.
+    """
+    draft = get_object_or_404(CourseDraft.objects.only('id', 'owner_id'), pk=draft_id, owner=request.user)
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    base_revision = payload.get('revision') if isinstance(payload, dict) else None
+    if base_revision is not None and not isinstance(base_revision, int):
+        return JsonResponse({'error': '"revision" must be an integer'}, status=400)
+    try:
+        if revision is None:
+            state = undo_draft(draft.pk, base_revision)
+        else:
+            state = restore_draft_revision(draft.pk, revision, base_revision)
+    except RevisionNotFound:
+        return JsonResponse({'error': 'Nothing to restore'}, status=404)
+    except StaleRevision as exc:
+        return JsonResponse(dict(exc.state, error='stale_revision'), status=409)
+    except DraftBusy:
+        return JsonResponse({'error': 'Draft is busy, retry'}, status=503)
+    return JsonResponse(state)
+
+
+@login_required
+@require_http_methods(['POST'])
+def draft_publish(request, draft_id):
+    """Publish the draft as a course; 400 with field errors if it is incomplete."""
+    draft = get_object_or_404(CourseDraft.objects.only('id', 'owner_id'), pk=draft_id, owner=request.user)
+    try:
+        course = publish_draft(draft.pk, request.user)
+    except ValidationError as exc:
+        errors = exc.message_dict if hasattr(exc, 'error_dict') else {'draft': exc.messages}
+        return JsonResponse({'error': 'invalid_draft', 'errors': errors}, status=400)
+    except DraftBusy:
+        return JsonResponse({'error': 'Draft is busy, retry'}, status=503)
+    return JsonResponse({
+        'course_id': course.pk,
+        'slug': course.slug,
+        'url': reverse('courses:course_detail', args=[course.pk]),
+    }, status=201)
+
+
+def can_manage_course(user, course):
+    """Staff, the course's instructor or one of its co-instructors."""
+    if user.is_staff or course.instructor_id == user.pk:
+        return True
+    return CourseInstructor.objects.filter(course=course, instructor=user).exists()
+
+
+def _json_body(request):
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+@login_required
+@require_http_methods(['POST'])
+def course_clone(request, course_id):
+    """Deep-clone a course into a new course (``target=course``) or wizard draft.
+
+    Accepts JSON (``{"title": ..., "target": "course"|"draft"}``, answered with
+    201, or 202 when queued) or a plain form post from My Courses (redirects
+    back with a message).
+    """
+    course = get_object_or_404(Course.objects.only('id', 'instructor_id'), pk=course_id)
+    if not can_manage_course(request.user, course):
+        raise Http404('Course not found')
+    is_json = request.content_type == 'application/json'
+    payload = _json_body(request) if is_json else request.POST
+    if payload is None:
+        return JsonResponse({'error': 'Expected a JSON object'}, status=400)
+    target = payload.get('target') or 'course'
+    title = payload.get('title') if isinstance(payload.get('title'), str) else None
+    if target not in ('course', 'draft'):
+        return JsonResponse({'error': '"target" must be "course" or "draft"'}, status=400)
+    result = schedule_clone(course.pk, request.user, title, target)
+    if not is_json:
+        if result is None:
+            messages.info(request, 'The course is being copied. You will get a notification when it is ready.')
+        else:
+            messages.success(request, f'Created "{result.title}".')
+        return redirect('courses:instructor_my_courses')
+    if result is None:
+        return JsonResponse({'queued': True}, status=202)
+    body = {'id': result.pk, 'target': target, 'title': result.title}
+    if target == 'course':
+        body['url'] = reverse('courses:course_detail', args=[result.pk])
+    return JsonResponse(body, status=201)
+
+
+@login_required
+@require_http_methods(['POST'])
+def course_reorder(request, course_id):
+    """Reorder a course's modules: ``{"modules": [id, ...]}`` listing all of them."""
+    course = get_object_or_404(Course.objects.only('id', 'instructor_id'), pk=course_id)
+    if not can_manage_course(request.user, course):
+        raise Http404('Course not found')
+    payload = _json_body(request)
+    if payload is None:
+        return JsonResponse({'error': 'Expected a JSON object'}, status=400)
+    try:
+        updated = reorder_modules(course.pk, payload.get('modules'))
+    except InvalidOrdering as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return JsonResponse({'updated': updated})
+
+
+@login_required
+@require_http_methods(['POST'])
+def module_reorder(request, module_id):
+    """Reorder (and move in) lessons: ``{"lessons": [id, ...]}`` for the whole module."""
+    module = get_object_or_404(Module.objects.select_related('course').only('id', 'course__id', 'course__instructor_id'), pk=module_id)
+    if not can_manage_course(request.user, module.course):
+        raise Http404('Module not found')
+    payload = _json_body(request)
+    if payload is None:
+        return JsonResponse({'error': 'Expected a JSON object'}, status=400)
+    try:
+        updated = reorder_lessons(module.pk, payload.get('lessons'))
+    except InvalidOrdering as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return JsonResponse({'updated': updated})
+
+
+ENROLL_RESPONSES = {
+    ENROLLED: (201, 'You are enrolled.'),
+    ALREADY_ENROLLED: (200, 'You are already enrolled in this course.'),
+    WAITLISTED: (202, 'The course is full. You have been added to the waitlist.'),
+    ALREADY_WAITLISTED: (200, 'You are already on the waitlist for this course.'),
+    FULL: (409, 'The course is full.'),
+}
+
+
+@login_required
+@require_http_methods(['POST'])
+def course_enroll(request, course_id):
+    """Take a seat in a published course, or join its waitlist when full.
+
+    JSON callers get ``{"status": ..., "waitlist_position": ...}`` (201
+    enrolled, 202 waitlisted, 409 full); the course page's form post is
+    redirected back with a message.
+    """
+    course = get_object_or_404(Course.objects.only('id'), pk=course_id, published=True)
+    form_post = request.content_type != 'application/json'
+    if getattr(request.user, 'role', None) != 'student':
+        if form_post:
+            messages.error(request, 'Only students can enroll in courses.')
+            return redirect('courses:course_detail', course.pk)
+        return JsonResponse({'error': 'Only students can enroll'}, status=403)
+    result = enroll(course.pk, request.user)
+    code, message = ENROLL_RESPONSES[result]
+    if form_post:
+        (messages.error if result == FULL else messages.success)(request, message)
+        return redirect('courses:course_detail', course.pk)
+    body = {'status': result}
+    if result in (WAITLISTED, ALREADY_WAITLISTED):
+        body['waitlist_position'] = waitlist_position(course.pk, request.user)
+    return JsonResponse(body, status=code)
+
+
+@login_required
+@require_http_methods(['POST'])
+def course_leave(request, course_id):
+    """Drop the course or leave its waitlist; the seat goes to the next in line."""
+    course = get_object_or_404(Course.objects.only('id'), pk=course_id)
+    return JsonResponse({'left': drop_enrollment(course.pk, request.user)})
+
+
+@login_required
+@require_http_methods(['GET', 'POST'])
+def course_capacity(request, course_id):
+    """Read or set a course's enrollment cap: ``{"limit": n|null, "waitlist": bool}``."""
+    course = get_object_or_404(Course.objects.only('id', 'instructor_id'), pk=course_id)
+    if not can_manage_course(request.user, course):
+        raise Http404('Course not found')
+    if request.method == 'POST':
+        payload = _json_body(request)
+        if payload is None:
+            return JsonResponse({'error': 'Expected a JSON object'}, status=400)
+        limit = payload.get('limit')
+        if limit is not None and (not isinstance(limit, int) or isinstance(limit, bool) or limit < 1):
+            return JsonResponse({'error': '"limit" must be a positive integer or null'}, status=400)
+        set_capacity(course.pk, limit, bool(payload.get('waitlist')))
+    capacity = CourseCapacity.objects.filter(course_id=course.pk).first()
+    return JsonResponse({
+        'limit': capacity.limit if capacity else None,
+        'waitlist': bool(capacity and capacity.waitlist_enabled),
+        'seats_taken': capacity.seats_taken if capacity else None,
+        'waitlist_length': WaitlistEntry.objects.filter(course_id=course.pk).count(),
+    })
+
+
+@login_required
+@require_http_methods(['GET'])
+def course_unlocks(request, course_id):
+    """The student's still-locked lessons in a drip course: ``{"locked": {lesson id: unlock time}}``."""
+    enrollment_id = (
+        Enrollment.objects.filter(course_id=course_id, student=request.user).exclude(status='dropped')
+        .values_list('id', flat=True).first()
+    )
+    if enrollment_id is None:
+        raise Http404('Not enrolled')
+    locked = locked_lessons(enrollment_id)
+    return JsonResponse({'locked': {str(pk): unlock_at.isoformat() for pk, unlock_at in locked.items()}})
+
+
+class IsCourseModerator(BasePermission):
+    """Staff or users with the admin role."""
+
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(user and user.is_authenticated and (user.is_staff or getattr(user, 'role', None) == 'admin'))
+
+
+class ModerationCourseSerializer(serializers.ModelSerializer):
+    instructor = serializers.SerializerMethodField()
+    department = serializers.CharField(source='department.code', read_only=True)
+    specialization = serializers.CharField(source='specialization.name', read_only=True)
+
+    class Meta:
+        model = Course
+        fields = ('id', 'title', 'slug', 'approval_status', 'published', 'created_at',
+                  'instructor', 'department', 'specialization')
+
+    def get_instructor(self, course):
+        instructor = course.instructor
+        if instructor is None:
+            return None
+        return {'id': instructor.id, 'name': instructor.get_full_name() or instructor.username}
+
+
+class BulkModerationSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=MAX_BATCH)
+    action = serializers.ChoiceField(choices=tuple(ACTIONS))
+    reason = serializers.CharField(required=False, allow_blank=True, default='', max_length=1000)
+
+
+class CourseModerationViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """Moderation queue: ?status=pending|rejected oldest first; POST bulk/ to approve or reject many.
+
+    Pages seek on the (approval_status, created_at, id) index (courses migration 0011).
+    """
+    serializer_class = ModerationCourseSerializer
+    permission_classes = [IsCourseModerator]
+    cursor_ordering = ('created_at', 'pk')
+
+    def get_queryset(self):
+        status_filter = self.request.query_params.get('status', 'pending')
+        if status_filter not in ('pending', 'rejected'):
+            status_filter = 'pending'
+        return (Course.objects
+                .filter(approval_status=status_filter)
+                .select_related('instructor', 'department', 'specialization')
+                .only('id', 'title', 'slug', 'approval_status', 'published', 'created_at',
+                      'instructor__id', 'instructor__username', 'instructor__first_name', 'instructor__last_name',
+                      'department__id', 'department__code', 'specialization__id', 'specialization__name'))
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        payload = BulkModerationSerializer(data=request.data)
+        payload.is_valid(raise_exception=True)
+        data = payload.validated_data
+        changed = moderate_courses(data['ids'], data['action'], request.user, data['reason'])
+        skipped = sorted(set(data['ids']) - set(changed))
+        return Response({'action': data['action'], 'updated': changed, 'skipped': skipped}, status=status.HTTP_200_OK)
@@ -4,3 +4,30 @@ from django.apps import AppConfig
 class CoursesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'courses'
+
+    def ready(self):
+        # Registers the deploy check that the caches used below are shared
+        import eduvanta.cache  # noqa: F401
+
+        # Keeps search documents, facet counts, outline fragments, recommendations,
+        # seat counts, drip unlock times and the taxonomy tree in sync; also
+        # registers CourseRecommendation, CourseOutlineSnapshot, CourseDraftHead,
+        # CourseCapacity, WaitlistEntry, CourseSchedule and LessonUnlock
+        from . import draft_history, drafts, enrollment, facets, outline, recommendations, schedule, search, taxonomy  # noqa: F401
+        search.connect_signals()
+        facets.connect_signals()
+        taxonomy.connect_signals()
+        outline.connect_signals()
+        recommendations.connect_signals()
+        enrollment.connect_signals()
+        schedule.connect_signals()
+
+        from eduvanta.images import connect_image_field
+        from .models import Course
+        connect_image_field(Course, 'thumbnail', 'course_thumbnail')
+
+        # Change stamps behind the catalog API's ETag/Last-Modified
+        from eduvanta.conditional import track
+        from .models import Department, Program, Specialization, SubSpecialization, Tag
+        track('courses', Course, Course.tags.through, Tag)
+        track('taxonomy', Department, Program, Specialization, SubSpecialization)
@@ -0,0 +1,412 @@
+"""Course archives: newline-delimited JSON records plus content-addressed media.
+
+An archive is a directory::
+
+    records.ndjson             one JSON object per line
+    media/ab/ab12…ef.jpg       files named by the SHA-256 of their bytes
+
+Records carry a ``type`` and, in file order, are: ``archive`` (format
+version); ``department``, ``program``, ``specialization`` and
+``subspecialization``; then one ``course`` per line. A course record holds its
+tags, taxonomy keys, thumbnail path and the whole module / lesson /
+coding-assignment tree. Records refer to each other by natural keys
+(department code, specialization slug, course slug), never by database ids,
+so an archive loads into any environment.
+
+``export_archive`` walks courses by primary key in chunks of ``CHUNK_SIZE``
+and reads each chunk with five queries. Memory use is bounded by one chunk
+however large the catalog is. A media file used by many courses is written
+once.
+
+``import_archive`` reads the file line by line. Taxonomy rows and courses are
+upserted in batches, with one ``bulk_create(update_conflicts=True)`` per
+table per batch, keyed on the natural keys. Modules and lessons are matched
+to existing rows by position, so re-importing an unchanged course keeps its
+lesson ids, and with them student submissions. Instructors are matched by
+username where they exist. Co-instructors, enrollments and drafts are
+environment data and are not archived.
+"""
+import hashlib
+import json
+import os
+import re
+import uuid
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .models import CodingAssignment, Course, Department, Lesson, Module, Program, Specialization, SubSpecialization
+
+FORMAT_VERSION = 1
+CHUNK_SIZE = 200
+RECORDS_FILE = 'records.ndjson'
+MEDIA_DIR = 'media'
+THUMBNAIL_DIR = 'courses/thumbnails'
+COPY_CHUNK = 1024 * 1024
+MEDIA_PATH = re.compile(r'^media/[0-9a-f]{2}/[0-9a-f]{64}(\.[a-z0-9]{1,8})?$')
+COURSE_FIELDS = ('title', 'description', 'published', 'approval_status', 'max_xp')
+ASSIGNMENT_FIELDS = ('language', 'prompt', 'starter_code', 'tests', 'time_limit_ms', 'memory_limit_kb', 'auto_grade')
+TAXONOMY = ('department', 'program', 'specialization', 'subspecialization')
+
+
+class ArchiveError(Exception):
+    pass
+
+
+# ---------- export ----------
+
+def _write(fh, record):
+    fh.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+
+def _store_media(root, name):
+    """Copy storage file `name` into the archive; returns its archive path (None if unreadable)."""
+    try:
+        source = default_storage.open(name, 'rb')
+    except OSError:
+        return None
+    os.makedirs(os.path.join(root, MEDIA_DIR), exist_ok=True)
+    tmp = os.path.join(root, MEDIA_DIR, f'.{uuid.uuid4().hex}.tmp')
+    digest = hashlib.sha256()
+    with source, open(tmp, 'wb') as out:
+        for chunk in iter(lambda: source.read(COPY_CHUNK), b''):
+            digest.update(chunk)
+            out.write(chunk)
+    key = digest.hexdigest()
+    path = f'{MEDIA_DIR}/{key[:2]}/{key}{os.path.splitext(name)[1].lower()}'
+    target = os.path.join(root, *path.split('/'))
+    if os.path.exists(target):
+        os.remove(tmp)
+    else:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(tmp, target)
+    return path
+
+
+def _course_records(root, course_ids, media):
+    """Course records for one chunk of ids, read with five queries."""
+    courses = list(
+        Course.objects.filter(pk__in=course_ids).order_by('pk').values(
+            'pk', 'slug', 'thumbnail', 'department__code', 'specialization__slug',
+            'subspecialization__name', 'instructor__username', *COURSE_FIELDS,
+        )
+    )
+    tags = defaultdict(list)
+    for course_id, slug, name in (Course.tags.through.objects.filter(course_id__in=course_ids)
+                                  .order_by('tag__slug').values_list('course_id', 'tag__slug', 'tag__name')):
+        tags[course_id].append({'slug': slug, 'name': name})
+    modules = defaultdict(list)
+    module_lessons = {}
+    for pk, course_id, title, order in (Module.objects.filter(course_id__in=course_ids)
+                                        .order_by('order', 'id').values_list('id', 'course_id', 'title', 'order')):
+        module_lessons[pk] = []
+        modules[course_id].append({'title': title, 'order': order, 'lessons': module_lessons[pk]})
+    assignments = {
+        row.pop('lesson_id'): row
+        for row in CodingAssignment.objects.filter(lesson__module__course_id__in=course_ids).values('lesson_id', *ASSIGNMENT_FIELDS)
+    }
+    for pk, module_id, title, order in (Lesson.objects.filter(module__course_id__in=course_ids)
+                                        .order_by('order', 'id').values_list('id', 'module_id', 'title', 'order')):
+        module_lessons[module_id].append({'title': title, 'order': order, 'assignment': assignments.get(pk)})
+
+    for course in courses:
+        thumbnail = course['thumbnail']
+        if thumbnail and thumbnail not in media:
+            media[thumbnail] = _store_media(root, thumbnail)
+        yield {
+            'type': 'course',
+            'slug': course['slug'],
+            **{field: course[field] for field in COURSE_FIELDS},
+            'department': course['department__code'],
+            'specialization': course['specialization__slug'],
+            'subspecialization': course['subspecialization__name'],
+            'instructor': course['instructor__username'],
+            'thumbnail': media.get(thumbnail) if thumbnail else None,
+            'tags': tags[course['pk']],
+            'modules': modules[course['pk']],
+        }
+
+
+def export_archive(root, courses=None, chunk_size=CHUNK_SIZE):
+    """Write `courses` (default: all) and the whole taxonomy to directory `root`.
+
+    Returns {record type: count}.
+    """
+    courses = Course.objects.all() if courses is None else courses
+    os.makedirs(root, exist_ok=True)
+    counts = defaultdict(int)
+    # Media path per storage name, so shared thumbnails are hashed once
+    media = {}
+    with open(os.path.join(root, RECORDS_FILE), 'w', encoding='utf-8') as fh:
+        _write(fh, {'type': 'archive', 'version': FORMAT_VERSION})
+        taxonomy = (
+            ('department', Department.objects.order_by('pk').values('code', 'name', 'description', 'order')),
+            ('program', Program.objects.order_by('pk').values('department__code', 'name', 'code', 'level', 'duration', 'order')),
+            ('specialization', Specialization.objects.order_by('pk').values('department__code', 'name', 'slug', 'description', 'level')),
+            ('subspecialization', SubSpecialization.objects.order_by('pk').values('specialization__slug', 'name', 'code', 'description', 'order')),
+        )
+        for kind, rows in taxonomy:
+            for row in rows.iterator(chunk_size=chunk_size):
+                _write(fh, {'type': kind, **{key.split('__')[0]: value for key, value in row.items()}})
+                counts[kind] += 1
+        last = 0
+        while True:
+            ids = list(courses.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not ids:
+                break
+            for record in _course_records(root, ids, media):
+                _write(fh, record)
+                counts['course'] += 1
+            last = ids[-1]
+    counts['media'] = sum(1 for path in set(media.values()) if path)
+    return dict(counts)
+
+
+# ---------- import ----------
+
+def iter_records(root):
+    """(line number, record) for each line of the archive, read lazily."""
+    path = os.path.join(root, RECORDS_FILE)
+    if not os.path.exists(path):
+        raise ArchiveError(f'{path} not found')
+    with open(path, encoding='utf-8') as fh:
+        for number, line in enumerate(fh, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                raise ArchiveError(f'Line {number}: invalid JSON')
+            if not isinstance(record, dict) or not isinstance(record.get('type'), str):
+                raise ArchiveError(f'Line {number}: expected an object with a "type"')
+            yield number, record
+
+
+class ArchiveImporter:
+    """Streams an archive into the database in batches of `batch_size` records."""
+
+    def __init__(self, root, batch_size=CHUNK_SIZE):
+        self.root = root
+        self.batch_size = batch_size
+        self.pending = {kind: [] for kind in TAXONOMY + ('course',)}
+        self.counts = defaultdict(int)
+        # Natural key -> pk, filled as rows are upserted or looked up
+        self.keys = {kind: {} for kind in TAXONOMY + ('tag', 'user')}
+
+    def run(self):
+        for number, record in iter_records(self.root):
+            kind = record['type']
+            if kind == 'archive':
+                if record.get('version') != FORMAT_VERSION:
+                    raise ArchiveError(f'Unsupported archive version {record.get("version")!r}')
+                continue
+            if kind not in self.pending:
+                raise ArchiveError(f'Line {number}: unknown record type {kind!r}')
+            self.pending[kind].append(record)
+            if len(self.pending[kind]) >= self.batch_size:
+                self.flush(kind)
+        for kind in self.pending:
+            self.flush(kind)
+        self._invalidate()
+        return dict(self.counts)
+
+    def flush(self, kind):
+        # Earlier kinds first: their keys are referenced by later ones
+        order = TAXONOMY + ('course',)
+        for earlier in order[:order.index(kind) + 1]:
+            records, self.pending[earlier] = self.pending[earlier], []
+            if records:
+                getattr(self, f'_load_{earlier}s')(records)
+                self.counts[earlier] += len(records)
+
+    def _lookup(self, kind, keys, queryset, key_fields):
+        """pks for natural `keys` of `kind`, querying only the ones not seen yet."""
+        known = self.keys[kind]
+        missing = {key for key in keys if key is not None and key not in known}
+        if missing:
+            filters = {f'{key_fields[0]}__in': {key if len(key_fields) == 1 else key[0] for key in missing}}
+            for row in queryset.filter(**filters).values_list(*key_fields, 'pk'):
+                key = row[0] if len(key_fields) == 1 else row[:-1]
+                known[key] = row[-1]
+        return known
+
+    def _require(self, mapping, key, what, owner):
+        if key not in mapping:
+            raise ArchiveError(f'{owner}: unknown {what} {key!r}')
+        return mapping[key]
+
+    def _load_departments(self, records):
+        Department.objects.bulk_create(
+            [Department(code=r['code'], name=r['name'], description=r.get('description') or '', order=r.get('order') or 0) for r in records],
+            update_conflicts=True, unique_fields=['code'], update_fields=['name', 'description', 'order'],
+        )
+        self._lookup('department', [r['code'] for r in records], Department.objects, ('code',))
+
+    def _load_programs(self, records):
+        departments = self._lookup('department', [r['department'] for r in records], Department.objects, ('code',))
+        Program.objects.bulk_create(
+            [Program(department_id=self._require(departments, r['department'], 'department', r['name']), name=r['name'],
+                     code=r.get('code'), level=r.get('level'), duration=r.get('duration'), order=r.get('order') or 0)
+             for r in records],
+            update_conflicts=True, unique_fields=['department', 'name'], update_fields=['code', 'level', 'duration', 'order'],
+        )
+
+    def _load_specializations(self, records):
+        departments = self._lookup('department', [r['department'] for r in records], Department.objects, ('code',))
+        Specialization.objects.bulk_create(
+            [Specialization(department_id=self._require(departments, r['department'], 'department', r['slug']), name=r['name'],
+                            slug=r['slug'], description=r.get('description') or '', level=r.get('level') or 'beginner')
+             for r in records],
+            update_conflicts=True, unique_fields=['slug'], update_fields=['department', 'name', 'description', 'level'],
+        )
+        self._lookup('specialization', [r['slug'] for r in records], Specialization.objects, ('slug',))
+
+    def _load_subspecializations(self, records):
+        specializations = self._lookup('specialization', [r['specialization'] for r in records], Specialization.objects, ('slug',))
+        SubSpecialization.objects.bulk_create(
+            [SubSpecialization(specialization_id=self._require(specializations, r['specialization'], 'specialization', r['name']),
+                               name=r['name'], code=r.get('code'), description=r.get('description') or '', order=r.get('order') or 0)
+             for r in records],
+            update_conflicts=True, unique_fields=['specialization', 'name'], update_fields=['code', 'description', 'order'],
+        )
+
+    def _media(self, path):
+        """Storage name for archive media `path`, copied in unless already present."""
+        if not path:
+            return None
+        if not MEDIA_PATH.match(path):
+            raise ArchiveError(f'Invalid media path {path!r}')
+        name = f'{THUMBNAIL_DIR}/{path.rsplit("/", 1)[1]}'
+        if not default_storage.exists(name):
+            source = os.path.join(self.root, *path.split('/'))
+            if not os.path.exists(source):
+                raise ArchiveError(f'Missing media file {path}')
+            with open(source, 'rb') as fh:
+                name = default_storage.save(name, File(fh))
+            self.counts['media'] += 1
+            from eduvanta.images import schedule_derivatives
+            schedule_derivatives(name, 'course_thumbnail')
+        return name
+
+    def _load_courses(self, records):
+        from .outline import rebuild_outline_snapshots
+        from .publishing import resolve_tags
+        from .search import reindex_courses
+
+        departments = self._lookup('department', [r.get('department') for r in records], Department.objects, ('code',))
+        specializations = self._lookup('specialization', [r.get('specialization') for r in records], Specialization.objects, ('slug',))
+        subspecializations = self._lookup(
+            'subspecialization',
+            [(r['specialization'], r['subspecialization']) for r in records if r.get('subspecialization')],
+            SubSpecialization.objects, ('specialization__slug', 'name'),
+        )
+        users = self._lookup('user', [r.get('instructor') for r in records], get_user_model().objects, ('username',))
+        tags = self.keys['tag']
+        tag_names = {tag['slug']: tag['name'] for r in records for tag in r.get('tags') or ()}
+        tags.update(resolve_tags({slug: name for slug, name in tag_names.items() if slug not in tags}))
+
+        with transaction.atomic():
+            courses = []
+            for r in records:
+                sub_key = (r.get('specialization'), r.get('subspecialization'))
+                courses.append(Course(
+                    slug=r['slug'],
+                    **{field: r[field] for field in COURSE_FIELDS if field in r},
+                    department_id=self._require(departments, r.get('department'), 'department', r['slug']),
+                    specialization_id=self._require(specializations, r.get('specialization'), 'specialization', r['slug']),
+                    subspecialization_id=self._require(subspecializations, sub_key, 'subspecialization', r['slug']) if sub_key[1] else None,
+                    instructor_id=users.get(r.get('instructor')),
+                    thumbnail=self._media(r.get('thumbnail')),
+                ))
+            Course.objects.bulk_create(
+                courses, update_conflicts=True, unique_fields=['slug'],
+                update_fields=[*COURSE_FIELDS, 'department', 'specialization', 'subspecialization', 'instructor', 'thumbnail'],
+            )
+            course_ids = dict(Course.objects.filter(slug__in=[r['slug'] for r in records]).values_list('slug', 'pk'))
+
+            Course.tags.through.objects.filter(course_id__in=course_ids.values()).delete()
+            # Two slugs can resolve to one tag (matched by name)
+            course_tags = {
+                (course_ids[r['slug']], self._require(tags, tag['slug'], 'tag', r['slug']))
+                for r in records for tag in r.get('tags') or ()
+            }
+            Course.tags.through.objects.bulk_create([
+                Course.tags.through(course_id=course_id, tag_id=tag_id) for course_id, tag_id in course_tags
+            ])
+            self._sync_structure(records, course_ids)
+            rebuild_outline_snapshots(course_ids.values())
+            transaction.on_commit(lambda ids=list(course_ids.values()): reindex_courses(ids))
+
+    def _sync_structure(self, records, course_ids):
+        """Match archived modules/lessons to existing rows by position; add and drop the rest."""
+        existing_modules = defaultdict(list)
+        for pk, course_id in (Module.objects.filter(course_id__in=course_ids.values())
+                              .order_by('order', 'id').values_list('id', 'course_id')):
+            existing_modules[course_id].append(pk)
+        modules, stale = [], []
+        for r in records:
+            course_id = course_ids[r['slug']]
+            have, want = existing_modules[course_id], r.get('modules') or []
+            modules += [(Module(pk=have[i] if i < len(have) else None, course_id=course_id, title=m['title'], order=m.get('order') or 0), m)
+                        for i, m in enumerate(want)]
+            stale += have[len(want):]
+        self.counts['module'] += len(modules)
+        Module.objects.filter(pk__in=stale).delete()
+        Module.objects.bulk_update([m for m, _ in modules if m.pk], ['title', 'order'], batch_size=self.batch_size)
+        self._create([m for m, _ in modules if m.pk is None])
+
+        existing_lessons = defaultdict(list)
+        for pk, module_id in (Lesson.objects.filter(module_id__in=[m.pk for m, _ in modules])
+                              .order_by('order', 'id').values_list('id', 'module_id')):
+            existing_lessons[module_id].append(pk)
+        lessons, stale = [], []
+        for module, record in modules:
+            have, want = existing_lessons[module.pk], record.get('lessons') or []
+            lessons += [(Lesson(pk=have[i] if i < len(have) else None, module_id=module.pk, title=l['title'], order=l.get('order') or 0), l)
+                        for i, l in enumerate(want)]
+            stale += have[len(want):]
+        self.counts['lesson'] += len(lessons)
+        Lesson.objects.filter(pk__in=stale).delete()
+        Lesson.objects.bulk_update([l for l, _ in lessons if l.pk], ['title', 'order'], batch_size=self.batch_size)
+        self._create([l for l, _ in lessons if l.pk is None])
+
+        assignments = [
+            CodingAssignment(lesson_id=lesson.pk, **{field: record['assignment'][field] for field in ASSIGNMENT_FIELDS if field in record['assignment']})
+            for lesson, record in lessons if record.get('assignment')
+        ]
+        CodingAssignment.objects.filter(
+            lesson_id__in=[lesson.pk for lesson, record in lessons if not record.get('assignment')]
+        ).delete()
+        CodingAssignment.objects.bulk_create(
+            assignments, batch_size=self.batch_size,
+            update_conflicts=True, unique_fields=['lesson'], update_fields=list(ASSIGNMENT_FIELDS),
+        )
+
+    def _create(self, objs):
+        """bulk_create `objs` in place; their pks are needed for the next level."""
+        if not objs:
+            return
+        model = type(objs[0])
+        model.objects.bulk_create(objs, batch_size=self.batch_size)
+        if objs[0].pk is None:
+            raise ArchiveError('Importing needs a database that returns ids from bulk inserts (PostgreSQL, SQLite 3.35+, MariaDB 10.5+)')
+
+    def _invalidate(self):
+        from eduvanta.conditional import touch
+
+        from .facets import invalidate_facets
+        from .recommendations import FEATURES_KEY
+        from .taxonomy import invalidate_taxonomy
+        invalidate_taxonomy()
+        invalidate_facets()
+        cache.delete(FEATURES_KEY)
+        touch('courses', 'taxonomy')
+
+
+def import_archive(root, batch_size=CHUNK_SIZE):
+    """Load the archive in directory `root`; returns {record type: count}."""
+    return ArchiveImporter(root, batch_size).run()
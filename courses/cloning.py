@@ -0,0 +1,197 @@
+"""Deep-clone a course for a new term.
+
+``clone_course`` copies a Course with its modules, lessons, coding
+assignments (prompt, starter code, tests, limits), tags, co-instructors, the
+enrollment cap and the release mode and drip interval. Enrollments, the
+waitlist and the old term's start date are not copied. A cohort course
+therefore becomes a drip course, counted from each enrollment. A draft
+copy keeps the cohort mode, and the wizard asks for the new start date
+before it publishes.
+Each table is copied with one ``bulk_create``, and the old ids are mapped
+to the new ones in memory (module -> module, lesson -> lesson), so the
+query count does not grow with the size of the course. The copy starts
+unpublished and pending approval, with the cloning user as lead
+instructor.
+
+``clone_course_to_draft`` instead writes the structure into a new wizard
+CourseDraft, for instructors who want to edit before publishing.
+
+``schedule_clone`` runs large clones (more than ``ASYNC_LESSONS`` lessons)
+in Celery and notifies the user when the copy is ready. Smaller ones run
+inline.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from .enrollment import CourseCapacity
+from .models import CodingAssignment, Course, CourseDraft, CourseInstructor, Lesson, Module
+from .publishing import unique_course_slug
+from .schedule import CourseSchedule, format_interval
+
+ASYNC_LESSONS = getattr(settings, 'COURSE_CLONE_ASYNC_LESSONS', 300)
+BATCH_SIZE = 500
+ASSIGNMENT_FIELDS = ('language', 'prompt', 'starter_code', 'tests', 'time_limit_ms', 'memory_limit_kb', 'auto_grade')
+
+
+def _copy_title(title):
+    return f'{title} (copy)'[:255]
+
+
+def _created(model, objs, **filters):
+    """`objs` after bulk_create, with primary keys even on backends without RETURNING."""
+    objs = model.objects.bulk_create(objs, batch_size=BATCH_SIZE)
+    if objs and objs[0].pk is None:
+        objs = list(model.objects.filter(**filters).order_by('pk'))
+    return objs
+
+
+def clone_course(course_id, user, title=None):
+    """Copy course `course_id` for `user`; returns the new Course."""
+    from .outline import rebuild_outline_snapshot
+
+    source = Course.objects.get(pk=course_id)
+    title = (title or '').strip()[:255] or _copy_title(source.title)
+    modules = list(Module.objects.filter(course_id=course_id).order_by('order', 'pk'))
+    lessons = list(Lesson.objects.filter(module__course_id=course_id).order_by('module__order', 'module_id', 'order', 'pk'))
+    assignments = list(
+        CodingAssignment.objects.filter(lesson__module__course_id=course_id)
+        .only('lesson_id', *ASSIGNMENT_FIELDS)
+    )
+    tag_ids = list(Course.tags.through.objects.filter(course_id=course_id).values_list('tag_id', flat=True))
+    capacity = CourseCapacity.objects.filter(course_id=course_id).values('limit', 'waitlist_enabled').first()
+    schedule = CourseSchedule.objects.filter(course_id=course_id).values('mode', 'timezone', 'drip_interval').first()
+    co_instructors = list(
+        CourseInstructor.objects.filter(course_id=course_id).exclude(instructor=user).values_list('instructor_id', flat=True)
+    )
+
+    with transaction.atomic():
+        course = Course.objects.create(
+            title=title,
+            slug=unique_course_slug(title),
+            description=source.description,
+            thumbnail=source.thumbnail.name if source.thumbnail else None,
+            published=False,
+            instructor=user,
+            department_id=source.department_id,
+            specialization_id=source.specialization_id,
+            subspecialization_id=source.subspecialization_id,
+            max_xp=source.max_xp,
+        )
+        CourseInstructor.objects.bulk_create(
+            [CourseInstructor(course=course, instructor=user, is_lead=True)]
+            + [CourseInstructor(course=course, instructor_id=pk, is_lead=False) for pk in co_instructors]
+        )
+        new_modules = _created(
+            Module, [Module(course=course, title=m.title, order=m.order) for m in modules], course=course,
+        )
+        module_map = {old.pk: new.pk for old, new in zip(modules, new_modules)}
+        new_lessons = _created(
+            Lesson, [Lesson(module_id=module_map[l.module_id], title=l.title, order=l.order) for l in lessons],
+            module__course=course,
+        )
+        lesson_map = {old.pk: new.pk for old, new in zip(lessons, new_lessons)}
+        CodingAssignment.objects.bulk_create(
+            [CodingAssignment(lesson_id=lesson_map[a.lesson_id], **{f: getattr(a, f) for f in ASSIGNMENT_FIELDS})
+             for a in assignments if a.lesson_id in lesson_map],
+            batch_size=BATCH_SIZE,
+        )
+        Course.tags.through.objects.bulk_create(
+            [Course.tags.through(course_id=course.pk, tag_id=tag_id) for tag_id in tag_ids],
+        )
+        if capacity is not None:
+            CourseCapacity.objects.create(course=course, **capacity)
+        if schedule is not None:
+            if schedule['mode'] == CourseSchedule.COHORT:
+                # A cohort needs a start date, and the old one is not copied
+                schedule['mode'] = CourseSchedule.DRIP
+            CourseSchedule.objects.create(course=course, **schedule)
+        rebuild_outline_snapshot(course.pk)
+    return course
+
+
+def course_draft_data(course_id):
+    """Wizard document for an existing course (basic info, structure, content)."""
+    course = Course.objects.get(pk=course_id)
+    lessons = list(
+        Lesson.objects.filter(module__course_id=course_id)
+        .select_related('module', 'coding_assignment')
+        .order_by('module__order', 'module_id', 'order', 'pk')
+    )
+    modules = {m.pk: {'id': f'm{m.pk}', 'title': m.title, 'description': '', 'lessons': []}
+               for m in Module.objects.filter(course_id=course_id).order_by('order', 'pk')}
+    content = {}
+    for lesson in lessons:
+        key = f'l{lesson.pk}'
+        modules[lesson.module_id]['lessons'].append({'id': key, 'title': lesson.title, 'duration': ''})
+        assignment = getattr(lesson, 'coding_assignment', None)
+        if assignment is not None:
+            content[key] = {'type': 'code', 'duration': '', 'notes': assignment.prompt}
+    keywords = ', '.join(course.tags.order_by('name').values_list('name', flat=True))
+    capacity = CourseCapacity.objects.filter(course_id=course_id).values_list('limit', 'waitlist_enabled').first()
+    schedule = CourseSchedule.objects.filter(course_id=course_id).first()
+    return {
+        'basic': {
+            'title': course.title,
+            'subtitle': '',
+            'short_description': '',
+            'long_description': course.description,
+            'department': str(course.department_id),
+            'specialization': str(course.specialization_id),
+            'subspecialization': str(course.subspecialization_id) if course.subspecialization_id else None,
+        },
+        'structure': {'modules': list(modules.values())},
+        'content': {'lessons': content},
+        'extras': {'seo': {'keywords': keywords}},
+        'access': {
+            'cap': str(capacity[0] or 0) if capacity else '0',
+            'waitlist': bool(capacity and capacity[1]),
+        },
+        'schedule': {
+            'mode': schedule.mode if schedule else CourseSchedule.IMMEDIATE,
+            # Left for the new term; publishing a cohort without one is refused
+            'start': '',
+            'timezone': schedule.timezone if schedule else 'UTC',
+            'drip': format_interval(schedule.drip_interval) if schedule else '',
+        },
+    }
+
+
+def clone_course_to_draft(course_id, user, title=None):
+    """New wizard draft for `user` pre-filled from course `course_id`."""
+    data = course_draft_data(course_id)
+    data['basic']['title'] = (title or '').strip()[:255] or _copy_title(data['basic']['title'])
+    return CourseDraft.objects.create(owner=user, title=data['basic']['title'], data=data, last_step='structure')
+
+
+def clone(course_id, user, title=None, target='course'):
+    return (clone_course_to_draft if target == 'draft' else clone_course)(course_id, user, title)
+
+
+def schedule_clone(course_id, user, title=None, target='course'):
+    """Clone inline (returns the new object) or queue it for large courses (returns None)."""
+    from .tasks import clone_course_task
+    if Lesson.objects.filter(module__course_id=course_id).count() <= ASYNC_LESSONS:
+        return clone(course_id, user, title, target)
+    try:
+        clone_course_task.delay(course_id, user.pk, title, target)
+    except Exception:
+        return clone(course_id, user, title, target)
+    return None
+
+
+def clone_and_notify(course_id, user_id, title=None, target='course'):
+    """Background clone; tells the user where the copy is."""
+    from django.contrib.auth import get_user_model
+
+    from accounts.models import Notification
+
+    user = get_user_model().objects.get(pk=user_id)
+    result = clone(course_id, user, title, target)
+    Notification.objects.create(
+        user=user,
+        category='course',
+        severity='success',
+        title='Course copy ready',
+        body=f'"{result.title}" has been created as a new {"draft" if target == "draft" else "course"}.',
+    )
+    return result.pk
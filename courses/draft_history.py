@@ -0,0 +1,183 @@
+"""Revision history for CourseDraft, stored as compressed diffs.
+
+Every flush of the autosave buffer (see ``courses.drafts``) records one
+``CourseDraftRevision`` inside the flush transaction. A row holds either a
+JSON Patch from the previous recorded revision (``delta``) or the whole
+document (``snapshot``), zlib-compressed. A snapshot is written every
+``SNAPSHOT_EVERY`` revisions, or sooner once the deltas since the last
+snapshot outweigh a fresh one. Storage therefore grows with the size of the
+edits, not the size of the draft.
+
+Rebuilding a revision takes two queries: find the nearest snapshot at or
+before it, then load it and the deltas up to the revision. At most
+``SNAPSHOT_EVERY`` patches are replayed. Only the newest ``HISTORY_LIMIT``
+revisions are kept. When older rows are pruned, the oldest surviving row is
+rewritten as a snapshot so the rest can still be rebuilt.
+
+Restoring never rewrites history. The old document is written as a new
+revision, so a restore can itself be undone.
+"""
+import json
+import zlib
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, Max, Sum
+
+from eduvanta.jsonpatch import apply_patch, make_patch
+
+SNAPSHOT_EVERY = getattr(settings, 'COURSE_DRAFT_SNAPSHOT_EVERY', 20)
+HISTORY_LIMIT = getattr(settings, 'COURSE_DRAFT_HISTORY_LIMIT', 100)
+
+
+class RevisionNotFound(Exception):
+    """The revision was never recorded or has been pruned."""
+
+
+class CourseDraftRevision(models.Model):
+    SNAPSHOT = 'snapshot'
+    DELTA = 'delta'
+    KIND_CHOICES = (
+        (SNAPSHOT, 'Snapshot'),
+        (DELTA, 'Delta'),
+    )
+
+    draft = models.ForeignKey('courses.CourseDraft', on_delete=models.CASCADE, related_name='revisions')
+    revision = models.PositiveIntegerField()
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES)
+    # zlib-compressed JSON: the document (snapshot) or a patch from the previous row (delta)
+    payload = models.BinaryField()
+    size = models.PositiveIntegerField(default=0)
+    restored_from = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('draft', 'revision')
+
+    def __str__(self):
+        return f"Draft {self.draft_id} r{self.revision} ({self.kind})"
+
+
+def _pack(value):
+    return zlib.compress(json.dumps(value, separators=(',', ':')).encode(), 6)
+
+
+def _unpack(payload):
+    return json.loads(zlib.decompress(bytes(payload)))
+
+
+def _row(draft_id, revision, kind, payload, restored_from=None):
+    return CourseDraftRevision(
+        draft_id=draft_id, revision=revision, kind=kind,
+        payload=payload, size=len(payload), restored_from=restored_from,
+    )
+
+
+def record_revision(draft_id, base_revision, base_data, revision, data, restored_from=None):
+    """Record `data` as `revision`; `base_*` is the previously flushed document.
+
+    Called by the autosave flush inside its transaction.
+    """
+    rows = CourseDraftRevision.objects.filter(draft_id=draft_id)
+    snapshot = rows.filter(kind=CourseDraftRevision.SNAPSHOT).order_by('-revision').values_list('revision', flat=True).first()
+    new_rows = []
+    if snapshot is None:
+        tail = {'count': 0, 'bytes': 0, 'last': None}
+        if base_data is not None and base_revision < revision:
+            # First recorded save: keep the document it started from
+            new_rows.append(_row(draft_id, base_revision, CourseDraftRevision.SNAPSHOT, _pack(base_data)))
+            tail['last'] = base_revision
+    else:
+        tail = rows.filter(revision__gt=snapshot).aggregate(count=Count('id'), bytes=Sum('size'), last=Max('revision'))
+        tail['last'] = tail['last'] or snapshot
+    full = _pack(data)
+    if tail['last'] is not None and tail['last'] == base_revision and base_data is not None:
+        delta = _pack(make_patch(base_data, data))
+        if tail['count'] + 1 < SNAPSHOT_EVERY and (tail['bytes'] or 0) + len(delta) < len(full):
+            new_rows.append(_row(draft_id, revision, CourseDraftRevision.DELTA, delta, restored_from))
+    if not new_rows or new_rows[-1].revision != revision:
+        # No usable base (first save, lost buffer) or the delta chain is long enough
+        new_rows.append(_row(draft_id, revision, CourseDraftRevision.SNAPSHOT, full, restored_from))
+    CourseDraftRevision.objects.bulk_create(new_rows)
+    if new_rows[-1].kind == CourseDraftRevision.SNAPSHOT:
+        # Snapshots come at most every SNAPSHOT_EVERY saves, which amortises pruning
+        prune_history(draft_id)
+
+
+def revision_data(draft_id, revision):
+    """The draft document as it was at `revision`; raises RevisionNotFound."""
+    rows = CourseDraftRevision.objects.filter(draft_id=draft_id)
+    snapshot = (
+        rows.filter(kind=CourseDraftRevision.SNAPSHOT, revision__lte=revision)
+        .order_by('-revision').values_list('revision', flat=True).first()
+    )
+    if snapshot is None:
+        raise RevisionNotFound(revision)
+    chain = list(
+        rows.filter(revision__gte=snapshot, revision__lte=revision)
+        .order_by('revision').values_list('revision', 'kind', 'payload')
+    )
+    if chain[-1][0] != revision:
+        raise RevisionNotFound(revision)
+    data = _unpack(chain[0][2])
+    for _, kind, payload in chain[1:]:
+        data = _unpack(payload) if kind == CourseDraftRevision.SNAPSHOT else apply_patch(data, _unpack(payload))
+    return data
+
+
+def prune_history(draft_id, keep=None):
+    """Drop all but the newest `keep` revisions, re-basing the oldest survivor."""
+    keep = HISTORY_LIMIT if keep is None else keep
+    rows = CourseDraftRevision.objects.filter(draft_id=draft_id)
+    oldest = list(rows.order_by('-revision').values_list('revision', 'kind')[keep - 1:keep])
+    if not oldest:
+        return 0
+    cutoff, kind = oldest[0]
+    with transaction.atomic():
+        if kind != CourseDraftRevision.SNAPSHOT:
+            payload = _pack(revision_data(draft_id, cutoff))
+            rows.filter(revision=cutoff).update(kind=CourseDraftRevision.SNAPSHOT, payload=payload, size=len(payload))
+        deleted, _ = rows.filter(revision__lt=cutoff).delete()
+    return deleted
+
+
+def draft_history(draft_id, limit=None):
+    """Recorded revisions, newest first, without payloads."""
+    return list(
+        CourseDraftRevision.objects.filter(draft_id=draft_id)
+        .order_by('-revision')
+        .values('revision', 'kind', 'size', 'restored_from', 'created_at')[:limit or HISTORY_LIMIT]
+    )
+
+
+def restore_draft_revision(draft_id, revision, base_revision=None):
+    """Write the document from `revision` as a new revision; returns the new state.
+
+    `base_revision`, when given, must be the client's current revision
+    (StaleRevision otherwise), so a restore never clobbers unseen edits.
+    """
+    from .drafts import flush_draft, replace_draft_data
+    # Buffered edits get their own revision first, so the restore can be undone to them
+    flush_draft(draft_id)
+    data = revision_data(draft_id, revision)
+    new_revision = replace_draft_data(draft_id, data, base_revision, restored_from=revision)
+    return {'revision': new_revision, 'data': data, 'restored_from': revision}
+
+
+def undo_draft(draft_id, base_revision=None):
+    """Restore the revision before the current one.
+
+    Repeated undos walk further back: after a restore, "current" means the
+    revision that was restored.
+    """
+    from .drafts import flush_draft
+    current = flush_draft(draft_id)
+    rows = CourseDraftRevision.objects.filter(draft_id=draft_id)
+    restored_from = rows.filter(revision=current).values_list('restored_from', flat=True).first()
+    target = (
+        rows.filter(revision__lt=restored_from if restored_from is not None else current)
+        .order_by('-revision').values_list('revision', flat=True).first()
+    )
+    if target is None:
+        raise RevisionNotFound(current)
+    return restore_draft_revision(draft_id, target, base_revision)
@@ -0,0 +1,232 @@
+"""Delta autosave for CourseDraft with write coalescing.
+
+The course wizard sends JSON Patch deltas against the draft revision it last
+saw. A delta based on an older revision is rejected (``StaleRevision``), and
+the client rebases on the current document. Accepted deltas are applied to a
+write-back buffer in the cache (the document plus its revision). The buffer
+is flushed to ``CourseDraft.data`` at most once per ``FLUSH_INTERVAL``:
+inline once the interval has passed since the last flush, otherwise by a
+delayed Celery task. A burst of keystrokes therefore costs one row write
+instead of one per request.
+
+Each flush also records a revision in ``courses.draft_history``, which backs
+undo and restore.
+
+Writers to the same draft are serialised by a short cache lock. Anything that
+reads ``CourseDraft.data`` for real work (publishing, previews built
+server-side) must call ``flush_draft`` first, or read through ``draft_state``.
+
+The buffer and the lock are shared by web processes and the Celery flush, so
+write-back needs the shared default cache (Redis; see ``eduvanta.cache``).
+With a per-process cache every delta is written through instead, serialised
+by the draft's row lock. An evicted buffer loses the edits made since the
+last flush, and the client then receives a 409 and rebases on the stored
+revision.
+"""
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.utils import timezone
+
+from eduvanta.cache import cache_is_shared
+from eduvanta.jsonpatch import JsonPatchError, apply_patch
+
+FLUSH_INTERVAL = getattr(settings, 'COURSE_DRAFT_FLUSH_SECONDS', 10)
+MAX_PATCH_OPERATIONS = 500
+BUFFER_KEY = 'courses:draft:buffer:{draft_id}'
+BUFFER_TTL = 60 * 60 * 6
+LOCK_KEY = 'courses:draft:lock:{draft_id}'
+LOCK_TTL = 10
+LOCK_WAIT = 2.0
+
+
+class StaleRevision(Exception):
+    """The delta was made against an older revision; carries the current state."""
+
+    def __init__(self, state):
+        super().__init__(f"Draft is at revision {state['revision']}")
+        self.state = state
+
+
+class DraftBusy(Exception):
+    """Another writer held the draft's lock for longer than LOCK_WAIT."""
+
+
+class CourseDraftHead(models.Model):
+    """Revision number of the ``data`` stored on a CourseDraft."""
+    draft = models.OneToOneField('courses.CourseDraft', on_delete=models.CASCADE, primary_key=True, related_name='head')
+    revision = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Draft {self.draft_id} @ r{self.revision}"
+
+
+class _draft_lock:
+    def __init__(self, draft_id):
+        self.key = LOCK_KEY.format(draft_id=draft_id)
+        self.token = uuid.uuid4().hex
+
+    def __enter__(self):
+        deadline = time.monotonic() + LOCK_WAIT
+        while not cache.add(self.key, self.token, LOCK_TTL):
+            if time.monotonic() > deadline:
+                raise DraftBusy(self.key)
+            time.sleep(0.02)
+        return self
+
+    def __exit__(self, *exc):
+        if cache.get(self.key) == self.token:
+            cache.delete(self.key)
+
+
+@contextmanager
+def _locked(draft_id):
+    """Serialise writers: the cache lock with a shared buffer, else the draft's row lock."""
+    if cache_is_shared():
+        with _draft_lock(draft_id):
+            yield
+        return
+    from .models import CourseDraft
+    with transaction.atomic():
+        list(CourseDraft.objects.select_for_update().filter(pk=draft_id).values_list('pk', flat=True))
+        yield
+
+
+def _load_state(draft_id):
+    """Buffered state, or the stored document and revision."""
+    if cache_is_shared():
+        state = cache.get(BUFFER_KEY.format(draft_id=draft_id))
+        if state is not None:
+            return state
+    from .models import CourseDraft
+    data = CourseDraft.objects.filter(pk=draft_id).values_list('data', flat=True).first()
+    revision = CourseDraftHead.objects.filter(draft_id=draft_id).values_list('revision', flat=True).first() or 0
+    return {
+        'data': data or {},
+        'revision': revision,
+        'flushed_data': data or {},
+        'flushed_revision': revision,
+        # The first delta after a (re)load writes through
+        'flushed_at': 0,
+        'last_step': None,
+        'flush_scheduled': False,
+    }
+
+
+def _save_state(draft_id, state):
+    if cache_is_shared():
+        cache.set(BUFFER_KEY.format(draft_id=draft_id), state, BUFFER_TTL)
+
+
+def draft_state(draft_id):
+    """{'revision', 'data'} as clients should see it (includes unflushed edits)."""
+    state = _load_state(draft_id)
+    return {'revision': state['revision'], 'data': state['data']}
+
+
+def apply_draft_patch(draft_id, base_revision, operations, step=None):
+    """Apply `operations` if `base_revision` is current; returns the new revision.
+
+    `base_revision` None skips the check (whole-step saves from older clients).
+    Raises StaleRevision, DraftBusy or JsonPatchError.
+    """
+    if len(operations) > MAX_PATCH_OPERATIONS:
+        raise JsonPatchError(f'At most {MAX_PATCH_OPERATIONS} operations per patch')
+    with _locked(draft_id):
+        state = _load_state(draft_id)
+        if base_revision is not None and base_revision != state['revision']:
+            raise StaleRevision({'revision': state['revision'], 'data': state['data']})
+        if not operations:
+            return state['revision']
+        data = apply_patch(state['data'], operations)
+        if not isinstance(data, dict):
+            raise JsonPatchError('The draft document must stay an object')
+        state['data'] = data
+        state['revision'] += 1
+        state['last_step'] = step or state['last_step']
+        if not cache_is_shared() or time.time() - state['flushed_at'] >= FLUSH_INTERVAL:
+            _flush(draft_id, state)
+        else:
+            if not state['flush_scheduled']:
+                state['flush_scheduled'] = _schedule_flush(draft_id)
+            if not state['flush_scheduled']:
+                # No broker to flush later: write through
+                _flush(draft_id, state)
+        _save_state(draft_id, state)
+        return state['revision']
+
+
+def replace_draft_data(draft_id, data, base_revision=None, restored_from=None):
+    """Replace the whole document as one new revision and flush it; returns the revision."""
+    with _locked(draft_id):
+        state = _load_state(draft_id)
+        if base_revision is not None and base_revision != state['revision']:
+            raise StaleRevision({'revision': state['revision'], 'data': state['data']})
+        state['data'] = data
+        state['revision'] += 1
+        _flush(draft_id, state, restored_from=restored_from)
+        _save_state(draft_id, state)
+        return state['revision']
+
+
+def _schedule_flush(draft_id):
+    from .tasks import flush_course_draft_task
+    try:
+        flush_course_draft_task.apply_async((draft_id,), countdown=FLUSH_INTERVAL)
+    except Exception:
+        return False
+    return True
+
+
+def _flush(draft_id, state, restored_from=None):
+    """Write the buffered document to the row and its history; caller holds the lock.
+
+    Raises StaleRevision if another writer stored a revision since the buffer
+    was loaded (expired lock, evicted or stale buffer). The buffer is then
+    dropped, and the stored document wins.
+    """
+    if state['revision'] > state['flushed_revision']:
+        from .draft_history import record_revision
+        from .models import CourseDraft
+        fields = {'data': state['data'], 'updated_at': timezone.now()}
+        basic = state['data'].get('basic')
+        title = basic.get('title') if isinstance(basic, dict) else None
+        if title:
+            fields['title'] = title[:255]
+        if state['last_step']:
+            fields['last_step'] = state['last_step'][:32]
+        with transaction.atomic():
+            list(CourseDraft.objects.select_for_update().filter(pk=draft_id).values_list('pk', flat=True))
+            stored = CourseDraftHead.objects.filter(draft_id=draft_id).values_list('revision', flat=True).first() or 0
+            if stored != state['flushed_revision']:
+                cache.delete(BUFFER_KEY.format(draft_id=draft_id))
+                raise StaleRevision(draft_state(draft_id))
+            if CourseDraft.objects.filter(pk=draft_id).update(**fields):
+                CourseDraftHead.objects.update_or_create(draft_id=draft_id, defaults={'revision': state['revision']})
+                record_revision(
+                    draft_id, state['flushed_revision'], state.get('flushed_data'),
+                    state['revision'], state['data'], restored_from=restored_from,
+                )
+        state['flushed_data'] = state['data']
+        state['flushed_revision'] = state['revision']
+    state['flushed_at'] = time.time()
+    state['flush_scheduled'] = False
+
+
+def flush_draft(draft_id):
+    """Persist any buffered edits now; returns the stored revision."""
+    with _locked(draft_id):
+        # Nothing is buffered when deltas are written through
+        state = cache.get(BUFFER_KEY.format(draft_id=draft_id)) if cache_is_shared() else None
+        if state is None:
+            return CourseDraftHead.objects.filter(draft_id=draft_id).values_list('revision', flat=True).first() or 0
+        try:
+            _flush(draft_id, state)
+        except StaleRevision as stale:
+            return stale.state['revision']
+        _save_state(draft_id, state)
+        return state['revision']
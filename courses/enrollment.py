@@ -0,0 +1,247 @@
+"""Enrollment capacity, seat allocation and the waitlist.
+
+A course without a ``CourseCapacity`` row (or with ``limit`` None) is
+unlimited, and enrolling is a plain insert. For capped courses
+``seats_taken`` counts the enrollments that are not dropped. A seat is
+claimed with one conditional UPDATE:
+
+    UPDATE ... SET seats_taken = seats_taken + 1
+    WHERE course_id = %s AND seats_taken < limit
+
+The database runs it atomically, so two requests can never take the last
+seat, and nothing is read and written back in Python. The row lock only
+lasts from the claim to the enrollment insert in the same short
+transaction. If the insert fails (the student enrolled twice at once), the
+claim rolls back with it.
+
+When the course is full and the waitlist is on, the student gets a
+``WaitlistEntry``. The entry's id is its place in the line. Freed seats are
+handed out by ``promote_waitlist``: it locks the capacity row, takes as many
+entries as there are free seats, and enrolls them with one bulk insert and
+one counter update. Releases come through ``drop_enrollment`` or through the
+Enrollment signals below (admin edits, cascades), which keep the counter
+right. Promotion runs after commit, in Celery when a broker is reachable.
+"""
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+
+from .models import Enrollment
+
+PROMOTE_BATCH = getattr(settings, 'COURSE_WAITLIST_PROMOTE_BATCH', 500)
+
+ENROLLED = 'enrolled'
+ALREADY_ENROLLED = 'already_enrolled'
+WAITLISTED = 'waitlisted'
+ALREADY_WAITLISTED = 'already_waitlisted'
+FULL = 'full'
+
+
+class CourseCapacity(models.Model):
+    course = models.OneToOneField('courses.Course', on_delete=models.CASCADE, primary_key=True, related_name='capacity')
+    limit = models.PositiveIntegerField(null=True, blank=True, help_text='Maximum active enrollments; empty = unlimited')
+    waitlist_enabled = models.BooleanField(default=False)
+    # Enrollments that are not dropped; only ever changed with F() updates
+    seats_taken = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Course {self.course_id}: {self.seats_taken}/{self.limit if self.limit is not None else '∞'}"
+
+
+class WaitlistEntry(models.Model):
+    course = models.ForeignKey('courses.Course', on_delete=models.CASCADE, related_name='waitlist_entries')
+    student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='waitlist_entries')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # First come, first served: ids are handed out in arrival order
+        ordering = ['id']
+        unique_together = ('course', 'student')
+        indexes = [models.Index(fields=['course', 'id'])]
+
+    def __str__(self):
+        return f"{self.student_id} waiting for course {self.course_id}"
+
+
+def _enroll(course_id, student, existing, seat_claimed):
+    enrollment = existing or Enrollment(course_id=course_id, student=student)
+    enrollment.status = 'active'
+    # Tells the signal handler the counter is already up to date
+    enrollment._seat_claimed = seat_claimed
+    enrollment.save()
+    return enrollment
+
+
+def enroll(course_id, student):
+    """Enroll `student`, or put them on the waitlist; returns one of the status constants.
+
+    A dropped enrollment is reactivated, which needs a seat like a new one.
+    """
+    existing = Enrollment.objects.filter(course_id=course_id, student=student).first()
+    if existing is not None and existing.status != 'dropped':
+        return ALREADY_ENROLLED
+    capacity = CourseCapacity.objects.filter(course_id=course_id).values_list('limit', 'waitlist_enabled').first()
+    unlimited = capacity is None or capacity[0] is None
+    waitlist = not unlimited and capacity[1]
+    # Seats freed while people are waiting belong to the line, not to newcomers
+    if not waitlist or not WaitlistEntry.objects.filter(course_id=course_id).exists():
+        try:
+            with transaction.atomic():
+                if unlimited:
+                    _enroll(course_id, student, existing, seat_claimed=False)
+                    return ENROLLED
+                claimed = CourseCapacity.objects.filter(
+                    course_id=course_id, seats_taken__lt=F('limit'),
+                ).update(seats_taken=F('seats_taken') + 1)
+                if claimed:
+                    _enroll(course_id, student, existing, seat_claimed=True)
+                    return ENROLLED
+        except IntegrityError:
+            # A concurrent request enrolled the same student; the claim was rolled back
+            return ALREADY_ENROLLED
+    if not waitlist:
+        return FULL
+    try:
+        with transaction.atomic():
+            WaitlistEntry.objects.create(course_id=course_id, student=student)
+    except IntegrityError:
+        return ALREADY_WAITLISTED
+    if CourseCapacity.objects.filter(course_id=course_id, seats_taken__lt=F('limit')).exists():
+        # A seat freed up after our claim failed; its promotion may have already run
+        schedule_promotion(course_id)
+    return WAITLISTED
+
+
+def drop_enrollment(course_id, student):
+    """Drop the student's enrollment or leave the waitlist; False if they had neither.
+
+    The freed seat goes to the waitlist (see the signal handlers).
+    """
+    left = WaitlistEntry.objects.filter(course_id=course_id, student=student).delete()[0]
+    enrollment = Enrollment.objects.filter(course_id=course_id, student=student).exclude(status='dropped').first()
+    if enrollment is None:
+        return bool(left)
+    enrollment.status = 'dropped'
+    enrollment.save(update_fields=['status', 'updated_at'])
+    return True
+
+
+def waitlist_position(course_id, student):
+    """1-based place in the course's waitlist, or None."""
+    entry_id = WaitlistEntry.objects.filter(course_id=course_id, student=student).values_list('id', flat=True).first()
+    if entry_id is None:
+        return None
+    return WaitlistEntry.objects.filter(course_id=course_id, id__lte=entry_id).count()
+
+
+def set_capacity(course_id, limit, waitlist_enabled):
+    """Create or change a course's cap (None = unlimited); recounts seats and promotes.
+
+    Lowering the cap below the current enrollment keeps everyone enrolled;
+    new students wait until enough seats free up.
+    """
+    with transaction.atomic():
+        capacity, _ = CourseCapacity.objects.select_for_update().get_or_create(course_id=course_id)
+        capacity.limit = limit
+        capacity.waitlist_enabled = waitlist_enabled
+        capacity.seats_taken = Enrollment.objects.filter(course_id=course_id).exclude(status='dropped').count()
+        capacity.save()
+        schedule_promotion(course_id)
+    return capacity
+
+
+def promote_waitlist(course_id):
+    """Enroll waitlisted students into the free seats, oldest first; returns their ids."""
+    from accounts.models import Notification
+    from .models import Course
+    from .recommendations import schedule_refresh
+    from .schedule import schedule_enrollment_unlocks
+
+    with transaction.atomic():
+        capacity = CourseCapacity.objects.select_for_update().filter(course_id=course_id).first()
+        if capacity is None:
+            return []
+        free = PROMOTE_BATCH if capacity.limit is None else min(capacity.limit - capacity.seats_taken, PROMOTE_BATCH)
+        entries = list(WaitlistEntry.objects.filter(course_id=course_id).values_list('id', 'student_id')[:max(free, 0)])
+        if not entries:
+            return []
+        student_ids = [student_id for _, student_id in entries]
+        existing = dict(
+            Enrollment.objects.filter(course_id=course_id, student_id__in=student_ids).values_list('student_id', 'status')
+        )
+        # Already enrolled (raced with their own enroll): just leave the line
+        promoted = [pk for pk in student_ids if existing.get(pk, 'dropped') == 'dropped']
+        Enrollment.objects.filter(course_id=course_id, student_id__in=promoted, status='dropped').update(status='active')
+        Enrollment.objects.bulk_create(
+            [Enrollment(course_id=course_id, student_id=pk) for pk in promoted if pk not in existing],
+        )
+        CourseCapacity.objects.filter(pk=capacity.pk).update(seats_taken=F('seats_taken') + len(promoted))
+        WaitlistEntry.objects.filter(id__in=[entry_id for entry_id, _ in entries]).delete()
+
+        title = Course.objects.filter(pk=course_id).values_list('title', flat=True).first()
+        Notification.objects.bulk_create([
+            Notification(
+                user_id=pk, category='course', severity='success',
+                title='A seat opened up',
+                body=f'You have been enrolled in "{title}" from the waitlist.',
+            )
+            for pk in promoted
+        ])
+        # Update and bulk_create send no signals
+        schedule_enrollment_unlocks(course_id, promoted)
+        for pk in promoted:
+            schedule_refresh(pk)
+        if len(entries) == PROMOTE_BATCH:
+            schedule_promotion(course_id)
+    return promoted
+
+
+def schedule_promotion(course_id):
+    """Run `promote_waitlist` after commit, in Celery when a broker is reachable."""
+    def run():
+        from .tasks import promote_waitlist_task
+        try:
+            promote_waitlist_task.delay(course_id)
+        except Exception:
+            promote_waitlist(course_id)
+    transaction.on_commit(run)
+
+
+def _holds_seat(status):
+    return status not in (None, 'dropped')
+
+
+def _remember_status(sender, instance, **kwargs):
+    instance._seat_status = instance.__dict__.get('status')
+
+
+def _enrollment_saved(sender, instance, raw=False, created=False, **kwargs):
+    before = None if created else getattr(instance, '_seat_status', None)
+    instance._seat_status = instance.status
+    if raw or _holds_seat(before) == _holds_seat(instance.status):
+        return
+    if _holds_seat(instance.status):
+        if not getattr(instance, '_seat_claimed', False):
+            # Enrolled outside enroll() (admin, imports): count it even past the cap
+            CourseCapacity.objects.filter(course_id=instance.course_id).update(seats_taken=F('seats_taken') + 1)
+    else:
+        _release(instance.course_id)
+    instance._seat_claimed = False
+
+
+def _enrollment_deleted(sender, instance, **kwargs):
+    if _holds_seat(getattr(instance, '_seat_status', instance.status)):
+        _release(instance.course_id)
+
+
+def _release(course_id):
+    if CourseCapacity.objects.filter(course_id=course_id, seats_taken__gt=0).update(seats_taken=F('seats_taken') - 1):
+        schedule_promotion(course_id)
+
+
+def connect_signals():
+    from django.db.models.signals import post_delete, post_init, post_save
+    post_init.connect(_remember_status, sender=Enrollment, dispatch_uid='courses.enrollment.init')
+    post_save.connect(_enrollment_saved, sender=Enrollment, dispatch_uid='courses.enrollment.saved')
+    post_delete.connect(_enrollment_deleted, sender=Enrollment, dispatch_uid='courses.enrollment.deleted')
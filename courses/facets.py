@@ -0,0 +1,170 @@
+"""Catalog facet counts backed by a cached bitmap index.
+
+One query loads (course, department, specialization, subspecialization,
+published, approval_status, tag) rows and turns them into one Python-int bitmap
+per facet value, bit i meaning "course at position i". Counts for any filter
+combination are then bitwise ANDs and popcounts, with no further SQL.
+
+Counts are disjunctive: a facet's own selection is ignored when counting that
+facet. With department=3 selected, the other departments still show how many
+courses selecting them would give. The index and each filter signature's
+counts are cached under a version stamp. The stamp is bumped whenever a course's
+catalog fields (publish/approve state, taxonomy, tags) change.
+
+Stamp, index and counts live in the default cache. That cache must be shared
+by every web and Celery process (see ``eduvanta.cache``), because
+invalidations also come from Celery tasks (scheduled publishing, imports) and
+from other workers.
+"""
+import hashlib
+from functools import reduce
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+FACETS = ('department', 'specialization', 'subspecialization', 'tag', 'published', 'approval')
+# Course fields feeding the index; saves touching none of them keep the cache
+INDEXED_FIELDS = {'department', 'specialization', 'subspecialization', 'published', 'approval_status'}
+
+VERSION_KEY = 'courses:facets:version'
+INDEX_KEY = 'courses:facets:index:{version}'
+COUNTS_KEY = 'courses:facets:counts:{version}:{signature}'
+CACHE_TTL = 60 * 60
+
+# Student-facing pages only count what students can open
+VISIBLE_FILTERS = {'published': ['1'], 'approval': ['approved']}
+
+
+def _version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(VERSION_KEY, version, None)
+    return version
+
+
+def invalidate_facets():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+
+
+def build_index():
+    """Return {'size': n, 'facets': {facet: {value: bitmap}}} from one query."""
+    from .models import Course
+    rows = Course.objects.order_by('pk').values_list(
+        'pk', 'department_id', 'specialization_id', 'subspecialization_id', 'published', 'approval_status', 'tags',
+    )
+    positions = {}
+    facets = {facet: {} for facet in FACETS}
+    for pk, department, specialization, subspecialization, published, approval, tag in rows.iterator():
+        bit = 1 << positions.setdefault(pk, len(positions))
+        values = (department, specialization, subspecialization, tag, '1' if published else '0', approval)
+        for facet, value in zip(FACETS, values):
+            if value is not None:
+                key = str(value)
+                facets[facet][key] = facets[facet].get(key, 0) | bit
+    return {'size': len(positions), 'facets': facets}
+
+
+def get_index(version=None):
+    key = INDEX_KEY.format(version=version or _version())
+    index = cache.get(key)
+    if index is None:
+        index = build_index()
+        cache.set(key, index, CACHE_TTL)
+    return index
+
+
+def _normalize(filters):
+    clean = {}
+    for facet in FACETS:
+        values = (filters or {}).get(facet) or []
+        if isinstance(values, str):
+            values = [values]
+        values = sorted({str(v) for v in values if v not in (None, '')})
+        if values:
+            clean[facet] = values
+    return clean
+
+
+def _signature(filters):
+    raw = '&'.join(f"{facet}={','.join(values)}" for facet, values in sorted(filters.items()))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def facet_counts(filters=None):
+    """Counts per facet value under `filters` ({facet: [values]}), plus 'total'.
+
+    Returns {'total': n, 'facets': {facet: {value: count}}}; values are strings
+    (ids as str, '1'/'0' for published) and zero counts are omitted.
+    """
+    filters = _normalize(filters)
+    version = _version()
+    key = COUNTS_KEY.format(version=version, signature=_signature(filters))
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    index = get_index(version)
+    everything = (1 << index['size']) - 1
+    # One OR-ed bitmap per filtered facet
+    selected = {
+        facet: reduce(lambda acc, v: acc | index['facets'][facet].get(v, 0), values, 0)
+        for facet, values in filters.items()
+    }
+
+    def mask_without(skip):
+        return reduce(lambda acc, item: acc & item[1] if item[0] != skip else acc, selected.items(), everything)
+
+    counts = {}
+    for facet in FACETS:
+        mask = mask_without(facet)
+        counts[facet] = {}
+        for value, bitmap in index['facets'][facet].items():
+            n = (bitmap & mask).bit_count()
+            if n:
+                counts[facet][value] = n
+    result = {'total': mask_without(None).bit_count(), 'facets': counts}
+    cache.set(key, result, CACHE_TTL)
+    return result
+
+
+def filters_from_params(params, base=None):
+    """Read facet filters from a QueryDict (``?department=3&tag=1&tag=4``)."""
+    filters = {facet: params.getlist(facet) for facet in FACETS if params.getlist(facet)}
+    filters.update(base or {})
+    return filters
+
+
+def annotate_choices(objects, counts, facet):
+    """Set ``facet_count`` on each object (e.g. departments for a sidebar select)."""
+    values = counts['facets'].get(facet, {})
+    for obj in objects:
+        obj.facet_count = values.get(str(obj.pk), 0)
+    return objects
+
+
+def _course_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not INDEXED_FIELDS.intersection(update_fields)):
+        return
+    # After commit, so a concurrent rebuild cannot cache pre-commit rows under the new stamp
+    transaction.on_commit(invalidate_facets)
+
+
+def _course_deleted(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_facets)
+
+
+def _course_tags_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(invalidate_facets)
+
+
+def connect_signals():
+    from .models import Course
+    post_save.connect(_course_saved, sender=Course, dispatch_uid='courses.facets.course_saved')
+    post_delete.connect(_course_deleted, sender=Course, dispatch_uid='courses.facets.course_deleted')
+    m2m_changed.connect(_course_tags_changed, sender=Course.tags.through, dispatch_uid='courses.facets.course_tags')
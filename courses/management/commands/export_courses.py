@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from courses.archive import CHUNK_SIZE, export_archive
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = "Export courses (with taxonomy, structure and thumbnails) to an NDJSON course archive directory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Archive directory to write (created if missing).')
+        parser.add_argument('--slug', action='append', dest='slugs', default=[], help='Only export this course (repeatable).')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Courses read per batch.')
+
+    def handle(self, *args, **opts):
+        courses = Course.objects.filter(slug__in=opts['slugs']) if opts['slugs'] else None
+        counts = export_archive(opts['path'], courses, chunk_size=opts['chunk_size'])
+        summary = ', '.join(f"{count} {kind}" for kind, count in sorted(counts.items()))
+        self.stdout.write(self.style.SUCCESS(f"Exported {summary} to {opts['path']}."))
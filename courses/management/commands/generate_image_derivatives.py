@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from courses.models import Course
+from eduvanta.images import generate_derivatives
+
+
+class Command(BaseCommand):
+    help = "Generate (or verify) thumbnail/WebP derivatives for existing course thumbnails and user avatars."
+
+    def handle(self, *args, **options):
+        sources = [
+            ('course_thumbnail', Course.objects.exclude(thumbnail='').exclude(thumbnail__isnull=True).values_list('thumbnail', flat=True)),
+            ('avatar', get_user_model().objects.exclude(avatar='').exclude(avatar__isnull=True).values_list('avatar', flat=True)),
+        ]
+        done = failed = 0
+        for kind, names in sources:
+            for name in names.iterator():
+                try:
+                    generate_derivatives(name, kind)
+                    done += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"{name}: {e}")
+        self.stdout.write(self.style.SUCCESS(f"Derivatives ready for {done} images ({failed} failed)."))
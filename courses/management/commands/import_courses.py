@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.archive import CHUNK_SIZE, ArchiveError, import_archive
+
+
+class Command(BaseCommand):
+    help = "Import (upsert) taxonomy and courses from an NDJSON course archive directory written by export_courses."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Archive directory to read.')
+        parser.add_argument('--batch-size', type=int, default=CHUNK_SIZE, help='Records upserted per batch.')
+
+    def handle(self, *args, **opts):
+        try:
+            counts = import_archive(opts['path'], batch_size=opts['batch_size'])
+        except ArchiveError as e:
+            raise CommandError(str(e))
+        summary = ', '.join(f"{count} {kind}" for kind, count in sorted(counts.items()))
+        self.stdout.write(self.style.SUCCESS(f"Imported {summary} from {opts['path']}."))
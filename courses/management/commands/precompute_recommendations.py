@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from courses.recommendations import BATCH_SIZE, TOP_N, precompute_recommendations
+
+
+class Command(BaseCommand):
+    help = "Recompute the precomputed 'Recommended for you' course lists for students."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--student', type=int, action='append', dest='students', help='Only this student id (repeatable)')
+        parser.add_argument('--top', type=int, default=TOP_N, help=f'Courses kept per student (default: {TOP_N})')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help=f'Students written per transaction (default: {BATCH_SIZE})')
+
+    def handle(self, *args, **options):
+        count = precompute_recommendations(student_ids=options['students'], top_n=options['top'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Recommendations computed for {count} students."))
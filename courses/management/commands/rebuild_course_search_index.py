@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from courses.search import rebuild_index, search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search documents for every course (FTS5 on SQLite, tsvector on Postgres)."
+
+    def handle(self, *args, **options):
+        backend = search_backend()
+        if backend is None:
+            self.stdout.write(self.style.WARNING("No search index table on this database; run migrate first (SQLite/Postgres only)."))
+            return
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Reindexed {count} courses ({backend})."))
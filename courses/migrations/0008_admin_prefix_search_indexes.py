@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# Expression indexes matching the SQL Django emits for istartswith on Postgres
+# (UPPER(col::text) LIKE UPPER('term%')), used by the admin prefix searches.
+PREFIX_INDEXES = [
+    ('courses_course_title_prefix_idx', 'courses_course', 'title'),
+]
+
+
+def create_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in PREFIX_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{table}" (UPPER("{column}"::text) text_pattern_ops)'
+        )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _table, _column in PREFIX_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('courses', '0007_enrollmentprogresslog_submission'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, reverse_code=drop_prefix_indexes),
+    ]
@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# Search documents for courses/search.py: an FTS5 table on SQLite, a weighted
+# tsvector table with a GIN index on Postgres. Other backends get nothing and
+# search falls back to substring matching.
+DOCUMENT_SELECT = """
+    SELECT c.id,
+           c.title,
+           c.description,
+           COALESCE((SELECT {tag_agg} FROM courses_course_tags ct
+                     JOIN courses_tag t ON t.id = ct.tag_id
+                     WHERE ct.course_id = c.id), '') AS tags,
+           d.name || ' ' || d.code || ' ' || s.name || ' ' || COALESCE(ss.name, '') AS taxonomy
+    FROM courses_course c
+    JOIN courses_department d ON d.id = c.department_id
+    JOIN courses_specialization s ON s.id = c.specialization_id
+    LEFT JOIN courses_subspecialization ss ON ss.id = c.subspecialization_id
+"""
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS courses_course_fts "
+            "USING fts5(title, description, tags, taxonomy, tokenize='porter unicode61')"
+        )
+        schema_editor.execute(
+            "INSERT INTO courses_course_fts (rowid, title, description, tags, taxonomy) "
+            + DOCUMENT_SELECT.format(tag_agg="group_concat(t.name, ' ')")
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE TABLE IF NOT EXISTS courses_course_search ("
+            "course_id bigint PRIMARY KEY REFERENCES courses_course (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "title text NOT NULL, description text NOT NULL, tags text NOT NULL, taxonomy text NOT NULL, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS courses_course_search_document_idx "
+            "ON courses_course_search USING GIN (document)"
+        )
+        schema_editor.execute(
+            "INSERT INTO courses_course_search (course_id, title, description, tags, taxonomy, document) "
+            "SELECT id, title, description, tags, taxonomy, "
+            "setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', tags), 'B') || "
+            "setweight(to_tsvector('english', taxonomy), 'C') || setweight(to_tsvector('english', description), 'D') "
+            "FROM (" + DOCUMENT_SELECT.format(tag_agg="string_agg(t.name, ' ')") + ") docs"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS courses_course_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP TABLE IF EXISTS courses_course_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_admin_prefix_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, reverse_code=drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations
+
+# Serves the moderation queue (WHERE approval_status = %s ORDER BY created_at, id).
+# Raw SQL: the index is kept out of Course's model state (its Meta does not declare it).
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0010_courserecommendation'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX courses_course_approval_queue_idx ON courses_course (approval_status, created_at, id)',
+            reverse_sql='DROP INDEX courses_course_approval_queue_idx',
+        ),
+    ]
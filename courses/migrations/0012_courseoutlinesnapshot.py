@@ -0,0 +1,65 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_snapshots(apps, schema_editor):
+    # Mirrors courses.outline.build_outline with the historical models
+    Course = apps.get_model('courses', 'Course')
+    Module = apps.get_model('courses', 'Module')
+    Lesson = apps.get_model('courses', 'Lesson')
+    CodingAssignment = apps.get_model('courses', 'CodingAssignment')
+    CourseOutlineSnapshot = apps.get_model('courses', 'CourseOutlineSnapshot')
+    languages = dict(CodingAssignment._meta.get_field('language').choices)
+
+    outlines = {course_id: [] for course_id in Course.objects.values_list('id', flat=True)}
+    modules = {}
+    for pk, course_id, title, order in Module.objects.order_by('order', 'id').values_list('id', 'course_id', 'title', 'order'):
+        module = {'id': pk, 'title': title, 'order': order, 'lesson_count': 0, 'lessons': []}
+        modules[pk] = module
+        outlines[course_id].append(module)
+    for pk, module_id, title, order, language in (Lesson.objects.order_by('order', 'id')
+                                                  .values_list('id', 'module_id', 'title', 'order', 'coding_assignment__language')):
+        module = modules[module_id]
+        module['lessons'].append({
+            'id': pk,
+            'title': title,
+            'order': order,
+            'assignment': None if language is None else str(languages.get(language, language)),
+        })
+        module['lesson_count'] += 1
+
+    snapshots = []
+    for course_id, outline in outlines.items():
+        lessons = [lesson for module in outline for lesson in module['lessons']]
+        snapshots.append(CourseOutlineSnapshot(
+            course_id=course_id,
+            outline=outline,
+            module_count=len(outline),
+            lesson_count=len(lessons),
+            assignment_count=sum(1 for lesson in lessons if lesson['assignment'] is not None),
+        ))
+    CourseOutlineSnapshot.objects.bulk_create(snapshots, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0011_course_approval_queue_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseOutlineSnapshot',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='outline_snapshot', serialize=False, to='courses.course')),
+                ('outline', models.JSONField(blank=True, default=list)),
+                ('module_count', models.PositiveIntegerField(default=0)),
+                ('lesson_count', models.PositiveIntegerField(default=0)),
+                ('assignment_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_snapshots, migrations.RunPython.noop),
+    ]
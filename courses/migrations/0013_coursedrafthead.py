@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0012_courseoutlinesnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseDraftHead',
+            fields=[
+                ('draft', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='head', serialize=False, to='courses.coursedraft')),
+                ('revision', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0013_coursedrafthead'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseDraftRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revision', models.PositiveIntegerField()),
+                ('kind', models.CharField(choices=[('snapshot', 'Snapshot'), ('delta', 'Delta')], max_length=8)),
+                ('payload', models.BinaryField()),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('restored_from', models.PositiveIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('draft', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='courses.coursedraft')),
+            ],
+            options={
+                'unique_together': {('draft', 'revision')},
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0015_coursecapacity_waitlistentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseSchedule',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='schedule', serialize=False, to='courses.course')),
+                ('mode', models.CharField(choices=[('immediate', 'Immediate'), ('drip', 'Drip'), ('cohort', 'Cohort')], default='immediate', max_length=16)),
+                ('starts_at', models.DateTimeField(blank=True, null=True)),
+                ('timezone', models.CharField(default='UTC', max_length=64)),
+                ('drip_interval', models.DurationField(blank=True, null=True)),
+                ('publish_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LessonUnlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unlock_at', models.DateTimeField()),
+                ('unlocked', models.BooleanField(default=False)),
+                ('enrollment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lesson_unlocks', to='courses.enrollment')),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unlocks', to='courses.lesson')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('unlocked', False)), fields=['unlock_at'], name='courses_unlock_due_idx')],
+                'unique_together': {('enrollment', 'lesson')},
+            },
+        ),
+    ]
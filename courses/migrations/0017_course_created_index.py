@@ -0,0 +1,19 @@
+from django.db import migrations
+
+# Serves the API's cursor pagination: the ordered scan (ORDER BY created_at DESC, id DESC)
+# and the seek on created_at. CursorPagination breaks created_at ties with an offset.
+# Raw SQL: the index is kept out of Course's model state (its Meta does not declare it).
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0016_courseschedule_lessonunlock'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX courses_course_created_idx ON courses_course (created_at, id)',
+            reverse_sql='DROP INDEX courses_course_created_idx',
+        ),
+    ]
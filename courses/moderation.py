@@ -0,0 +1,124 @@
+"""Bulk moderation queue for course approvals.
+
+The queue API (``CourseModerationViewSet`` in courses.api) cursor-pages one
+approval status oldest first on the (approval_status, created_at, id) index.
+Each page is one index range scan no matter how deep it is.
+``moderate_courses`` approves or rejects a whole selection with one
+``bulk_update``. Instructor notifications and emails are sent after commit by a
+Celery task, so moderators never wait on them.
+
+``bulk_update`` sends no post_save signals, so the caches that depend on
+approval status (facet counts, catalog ETags) are invalidated explicitly.
+"""
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+from django.utils.html import format_html
+
+from .models import Course
+
+# Upper bound on courses per moderate_courses() call
+MAX_BATCH = getattr(settings, 'COURSE_MODERATION_MAX_BATCH', 1000)
+ACTIONS = {'approve': 'approved', 'reject': 'rejected'}
+# Statuses each action may move a course out of
+ACTION_FROM = {'approve': ('pending', 'rejected'), 'reject': ('pending',)}
+
+
+def moderate_courses(course_ids, action, moderator, reason=''):
+    """Approve or reject `course_ids` with one bulk_update; returns the ids actually changed.
+
+    Courses that are already in the target status, or whose status the action
+    does not apply to, are skipped.
+    """
+    if action not in ACTIONS:
+        raise ValueError(f'Unknown moderation action: {action}')
+    ids = list(dict.fromkeys(int(pk) for pk in course_ids))
+    if len(ids) > MAX_BATCH:
+        raise ValueError(f'At most {MAX_BATCH} courses can be moderated at once')
+    status = ACTIONS[action]
+    now = timezone.now()
+    with transaction.atomic():
+        courses = list(
+            Course.objects.select_for_update()
+            .filter(pk__in=ids, approval_status__in=ACTION_FROM[action])
+            .only('id', 'approval_status', 'approved_at', 'approver')
+        )
+        for course in courses:
+            course.approval_status = status
+            course.approved_at = now if action == 'approve' else None
+            course.approver = moderator if action == 'approve' else None
+        Course.objects.bulk_update(courses, ['approval_status', 'approved_at', 'approver'], batch_size=500)
+        changed = [course.id for course in courses]
+        if changed:
+            transaction.on_commit(lambda: _after_moderation(changed, action, reason))
+    return changed
+
+
+def _after_moderation(course_ids, action, reason):
+    from eduvanta.conditional import touch
+
+    from .facets import invalidate_facets
+    invalidate_facets()
+    touch('courses')
+    schedule_notifications(course_ids, action, reason)
+
+
+def schedule_notifications(course_ids, action, reason=''):
+    """Notify instructors in Celery, or inline when no broker is reachable."""
+    from .tasks import notify_course_moderation_task
+    try:
+        notify_course_moderation_task.delay(course_ids, action, reason)
+    except Exception:
+        notify_course_moderation(course_ids, action, reason)
+
+
+def notify_course_moderation(course_ids, action, reason=''):
+    """In-app notifications (one bulk insert) and emails (one SMTP connection) to instructors."""
+    from accounts.models import Notification
+
+    courses = list(
+        Course.objects.filter(pk__in=course_ids)
+        .select_related('instructor')
+        .only('id', 'title', 'instructor__id', 'instructor__username', 'instructor__email')
+    )
+    approved = action == 'approve'
+    prefix = getattr(settings, 'SITE_EMAIL_SUBJECT_PREFIX', '[EduVanta]')
+    notifications = []
+    emails = []
+    for course in courses:
+        instructor = course.instructor
+        if instructor is None:
+            continue
+        if approved:
+            title = 'Course Approved'
+            body = f'Your course "{course.title}" has been approved.'
+            html = format_html(
+                '<p>Hi {},</p><p>Your course <strong>{}</strong> has been approved and can now be published to students.</p>',
+                instructor.username, course.title,
+            )
+        else:
+            title = 'Course Rejected'
+            body = f'Your course "{course.title}" was not approved.' + (f' Reason: {reason}' if reason else '')
+            html = format_html(
+                '<p>Hi {},</p><p>Your course <strong>{}</strong> was not approved.</p>{}',
+                instructor.username, course.title, format_html('<p>Reason: {}</p>', reason) if reason else '',
+            )
+        notifications.append(Notification(
+            user=instructor,
+            category='course',
+            severity='success' if approved else 'warning',
+            title=title,
+            body=body,
+        ))
+        if instructor.email:
+            email = EmailMessage(f'{prefix} {title}'.strip(), html, settings.DEFAULT_FROM_EMAIL, [instructor.email])
+            email.content_subtype = 'html'
+            emails.append(email)
+    Notification.objects.bulk_create(notifications, batch_size=500)
+    if emails:
+        try:
+            get_connection(fail_silently=True).send_messages(emails)
+        except Exception:
+            pass
+    return len(notifications)
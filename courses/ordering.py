@@ -0,0 +1,133 @@
+"""Bulk reordering of modules and lessons.
+
+Callers send the complete new order of a course's modules, or of a module's
+lessons (which may include lessons moved in from other modules of the same
+course). ``order`` values are sparse, so a reorder usually rewrites only the
+rows that moved:
+
+* Rows whose current values are already in the right relative order (the
+  longest increasing run) keep them.
+* Moved rows get values spread inside the gap between their new neighbours.
+* Only when a gap is too small is the whole set renumbered ``GAP`` apart.
+
+The changed rows are written with one ``bulk_update``, a single
+``UPDATE ... CASE`` statement, in one transaction with the rows locked. The
+outline snapshot is then rebuilt once. ``order`` only ranks rows: display
+positions come from the loop counter. Rows appended with dense values
+(1, 2, 3...) have no gaps, so the first move between them renumbers the set.
+Later moves are cheap again.
+"""
+from bisect import bisect_left
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Lesson, Module
+
+GAP = 1024
+
+
+class InvalidOrdering(ValueError):
+    pass
+
+
+def _anchors(orders):
+    """Indexes of a longest strictly increasing subsequence of `orders` (None = never an anchor)."""
+    tails, tail_index, previous = [], [], [None] * len(orders)
+    for i, value in enumerate(orders):
+        if value is None:
+            continue
+        pos = bisect_left(tails, value)
+        if pos == len(tails):
+            tails.append(value)
+            tail_index.append(i)
+        else:
+            tails[pos] = value
+            tail_index[pos] = i
+        previous[i] = tail_index[pos - 1] if pos else None
+    keep, i = set(), tail_index[-1] if tail_index else None
+    while i is not None:
+        keep.add(i)
+        i = previous[i]
+    return keep
+
+
+def plan_orders(ids, current):
+    """{id: new order} for the rows of `ids` (in their new order) that must change.
+
+    `current` maps ids to their present order; ids missing from it (rows
+    moved in from elsewhere) always get a new value.
+    """
+    orders = [current.get(pk) for pk in ids]
+    keep = _anchors(orders)
+    planned = {}
+    run, low = [], 0
+    for i, pk in enumerate(ids + [None]):
+        if pk is not None and i not in keep:
+            run.append(pk)
+            continue
+        high = orders[i] if pk is not None else low + GAP * (len(run) + 1)
+        if run:
+            if high - low <= len(run):
+                return {pk: GAP * (n + 1) for n, pk in enumerate(ids) if current.get(pk) != GAP * (n + 1)}
+            step = (high - low) / (len(run) + 1)
+            planned.update({moved: low + int(step * (n + 1)) for n, moved in enumerate(run)})
+            run = []
+        if pk is not None:
+            low = orders[i]
+    return planned
+
+
+def _check(ids):
+    if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+        raise InvalidOrdering('Send a list of ids')
+    if len(set(ids)) != len(ids):
+        raise InvalidOrdering('Duplicate ids')
+
+
+def reorder_modules(course_id, module_ids):
+    """Put the course's modules in `module_ids` order; returns the number of rows updated."""
+    from .outline import rebuild_outline_snapshot
+    _check(module_ids)
+    with transaction.atomic():
+        current = dict(Module.objects.select_for_update().filter(course_id=course_id).values_list('id', 'order'))
+        if set(module_ids) != set(current):
+            raise InvalidOrdering("List every module of the course exactly once")
+        planned = plan_orders(module_ids, current)
+        Module.objects.bulk_update([Module(pk=pk, order=order) for pk, order in planned.items()], ['order'])
+        if planned:
+            rebuild_outline_snapshot(course_id)
+    return len(planned)
+
+
+def reorder_lessons(module_id, lesson_ids):
+    """Put lessons in `lesson_ids` order under module `module_id`.
+
+    The list must hold every lesson of the module. It may also hold lessons
+    from other modules of the same course, which are moved here.
+    Returns the number of rows updated.
+    """
+    from .outline import rebuild_outline_snapshot
+    _check(lesson_ids)
+    with transaction.atomic():
+        course_id = Module.objects.filter(pk=module_id).values_list('course_id', flat=True).first()
+        if course_id is None:
+            raise Module.DoesNotExist(module_id)
+        course_modules = Module.objects.filter(course_id=course_id).values('id')
+        rows = list(
+            Lesson.objects.select_for_update()
+            .filter(Q(module_id=module_id) | Q(pk__in=lesson_ids, module_id__in=course_modules))
+            .only('id', 'order', 'module_id')
+        )
+        if {row.pk for row in rows} != set(lesson_ids):
+            raise InvalidOrdering("List every lesson of the module exactly once, plus only lessons of this course")
+        current = {row.pk: row.order for row in rows if row.module_id == module_id}
+        moved = {row.pk for row in rows if row.module_id != module_id}
+        planned = plan_orders(lesson_ids, current)
+        Lesson.objects.bulk_update(
+            [Lesson(pk=pk, order=order, module_id=module_id) for pk, order in planned.items()],
+            ['order', 'module'] if moved else ['order'],
+        )
+        if planned:
+            rebuild_outline_snapshot(course_id)
+    return len(planned)
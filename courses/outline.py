@@ -0,0 +1,302 @@
+"""Course outline snapshots, loading and fragment caching for the course detail page.
+
+Every course has a ``CourseOutlineSnapshot``: a compact JSON copy of its
+module and lesson titles and order, with per-module lesson counts and
+assignment flags. Read paths (the detail page, the outline API, parent
+dashboards) read that one row by primary key instead of joining the
+structure tables. ``render_course_outline`` renders the curriculum HTML from
+the snapshot and caches it under a per-course version stamp, so popular pages
+usually touch no table at all. Stamps and fragments live in the default cache,
+which must be shared by every process (Redis in ``settings.CACHES``; see
+``eduvanta.cache``). Otherwise a structure edit in one worker leaves the others
+serving the old curriculum for up to ``FRAGMENT_TTL``.
+
+Module/Lesson/CodingAssignment saves and deletes rebuild the snapshot inside
+the writer's transaction, so it commits or rolls back with the edit. They
+also bump the fragment stamp on commit. This covers add_module, add_lesson,
+delete_lesson and the wizard publish. Wrap many structure writes in
+``deferred_snapshots()`` to rebuild each course once at the end. Deletes are
+coalesced without it: rows removed by a cascade (a module's lessons, a
+lesson's assignment) leave the rebuild to the object being deleted, and a
+queryset delete rebuilds each course once. Code that
+changes structure through ``bulk_create``/``update`` must call
+``rebuild_outline_snapshot`` itself. Every rebuild sends ``outline_rebuilt``
+(with ``course_ids``) for other per-structure data such as drip unlock times.
+
+``load_course_outline`` still fetches the full model graph (modules, lessons,
+coding assignments, instructors) in a fixed four queries for editing views.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Prefetch
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+VERSION_KEY = 'courses:outline:version:{course_id}'
+FRAGMENT_KEY = 'courses:outline:html:{course_id}:{version}'
+FRAGMENT_TTL = 60 * 60 * 24
+OUTLINE_TEMPLATE = 'courses/course_outline.html'
+
+_deferred = threading.local()
+
+# Sent inside the writer's transaction after snapshots are rebuilt
+outline_rebuilt = Signal()
+
+
+class CourseOutlineSnapshot(models.Model):
+    """Denormalized outline of one course, rebuilt on every structure edit.
+
+    ``outline`` is a list of modules:
+    ``{id, title, order, lesson_count, lessons: [{id, title, order, assignment}]}``,
+    where ``assignment`` is the coding assignment's language label or None.
+    """
+    course = models.OneToOneField('courses.Course', on_delete=models.CASCADE, primary_key=True, related_name='outline_snapshot')
+    outline = models.JSONField(default=list, blank=True)
+    module_count = models.PositiveIntegerField(default=0)
+    lesson_count = models.PositiveIntegerField(default=0)
+    assignment_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Outline of course {self.course_id}"
+
+
+def build_outline(course_id):
+    """Snapshot fields for a course, read with two narrow queries."""
+    return build_outlines([course_id])[course_id]
+
+
+def build_outlines(course_ids):
+    """{course_id: snapshot fields} for many courses, still with two queries."""
+    from .models import CodingAssignment, Lesson, Module
+    languages = dict(CodingAssignment._meta.get_field('language').choices)
+    outlines = {
+        course_id: {'outline': [], 'module_count': 0, 'lesson_count': 0, 'assignment_count': 0}
+        for course_id in course_ids
+    }
+    by_id = {}
+    for pk, title, order, course_id in (Module.objects.filter(course_id__in=outlines)
+                                        .order_by('order', 'id').values_list('id', 'title', 'order', 'course_id')):
+        module = {'id': pk, 'title': title, 'order': order, 'lesson_count': 0, 'lessons': []}
+        by_id[pk] = (module, outlines[course_id])
+        outlines[course_id]['outline'].append(module)
+        outlines[course_id]['module_count'] += 1
+    lessons = (Lesson.objects.filter(module__course_id__in=outlines)
+               .order_by('order', 'id')
+               .values_list('id', 'title', 'order', 'module_id', 'coding_assignment__language'))
+    for pk, title, order, module_id, language in lessons:
+        module, fields = by_id[module_id]
+        module['lessons'].append({
+            'id': pk,
+            'title': title,
+            'order': order,
+            'assignment': None if language is None else str(languages.get(language, language)),
+        })
+        module['lesson_count'] += 1
+        fields['lesson_count'] += 1
+        fields['assignment_count'] += language is not None
+    return outlines
+
+
+def rebuild_outline_snapshot(course_id):
+    """Rewrite the course's snapshot in the current transaction; bumps the fragment stamp on commit."""
+    snapshot, _ = CourseOutlineSnapshot.objects.update_or_create(course_id=course_id, defaults=build_outline(course_id))
+    _bump_on_commit(course_id)
+    outline_rebuilt.send(sender=CourseOutlineSnapshot, course_ids=[course_id])
+    return snapshot
+
+
+def rebuild_outline_snapshots(course_ids):
+    """Batch form of rebuild_outline_snapshot: two reads and one upsert for all `course_ids`."""
+    outlines = build_outlines(set(course_ids))
+    CourseOutlineSnapshot.objects.bulk_create(
+        [CourseOutlineSnapshot(course_id=course_id, updated_at=timezone.now(), **fields) for course_id, fields in outlines.items()],
+        update_conflicts=True, unique_fields=['course'],
+        update_fields=['outline', 'module_count', 'lesson_count', 'assignment_count', 'updated_at'],
+    )
+    for course_id in outlines:
+        _bump_on_commit(course_id)
+    outline_rebuilt.send(sender=CourseOutlineSnapshot, course_ids=list(outlines))
+
+
+def get_outline_snapshot(course_id):
+    """The course's snapshot (built on first use), or None if the course does not exist."""
+    from .models import Course
+    snapshot = CourseOutlineSnapshot.objects.filter(course_id=course_id).first()
+    if snapshot is None and Course.objects.filter(pk=course_id).exists():
+        with transaction.atomic():
+            snapshot = rebuild_outline_snapshot(course_id)
+    return snapshot
+
+
+def outline_snapshots(course_ids):
+    """{course_id: snapshot} for many courses in one query (missing ones are built)."""
+    course_ids = set(course_ids)
+    snapshots = {s.course_id: s for s in CourseOutlineSnapshot.objects.filter(course_id__in=course_ids)}
+    for course_id in course_ids - set(snapshots):
+        snapshot = get_outline_snapshot(course_id)
+        if snapshot is not None:
+            snapshots[course_id] = snapshot
+    return snapshots
+
+
+@contextmanager
+def deferred_snapshots():
+    """Collect structure edits and rebuild each touched course's snapshot once on exit."""
+    outermost = getattr(_deferred, 'pending', None) is None
+    if outermost:
+        _deferred.pending = set()
+    try:
+        yield
+        if outermost:
+            for course_id in sorted(_deferred.pending):
+                rebuild_outline_snapshot(course_id)
+    finally:
+        if outermost:
+            _deferred.pending = None
+
+
+def outline_queryset():
+    from .models import Course, CourseInstructor, Lesson, Module
+    lessons = Lesson.objects.select_related('coding_assignment').order_by('order', 'id')
+    modules = Module.objects.order_by('order', 'id').prefetch_related(Prefetch('lessons', queryset=lessons))
+    instructors = CourseInstructor.objects.select_related('instructor').order_by('-is_lead', 'assigned_at')
+    return Course.objects.select_related(
+        'department', 'specialization', 'subspecialization', 'instructor',
+    ).prefetch_related(
+        Prefetch('modules', queryset=modules),
+        Prefetch('instructors', queryset=instructors),
+    )
+
+
+def load_course_outline(course_id):
+    """Course with ``modules`` > ``lessons`` > ``coding_assignment`` and ``instructors`` prefetched.
+
+    Sets ``lessons_count`` and ``assignments_count`` on the course. Raises
+    Course.DoesNotExist like a normal get().
+    """
+    course = outline_queryset().get(pk=course_id)
+    lessons = [lesson for module in course.modules.all() for lesson in module.lessons.all()]
+    course.lessons_count = len(lessons)
+    course.assignments_count = sum(1 for lesson in lessons if _assignment(lesson) is not None)
+    return course
+
+
+def _assignment(lesson):
+    # The missing-reverse-one-to-one error is also an AttributeError
+    return getattr(lesson, 'coding_assignment', None)
+
+
+def outline_version(course_id):
+    key = VERSION_KEY.format(course_id=course_id)
+    version = cache.get(key)
+    if version is None:
+        # Time-based stamps never repeat, even after the stamp itself is evicted
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_outline_version(course_id):
+    cache.set(VERSION_KEY.format(course_id=course_id), time.time_ns(), None)
+
+
+def render_course_outline(course_id, course=None):
+    """Cached curriculum HTML for the course; reads its snapshot only on a miss.
+
+    `course` is accepted for callers that already hold it; it is not needed.
+    """
+    key = FRAGMENT_KEY.format(course_id=course_id, version=outline_version(course_id))
+    html = cache.get(key)
+    if html is None:
+        snapshot = get_outline_snapshot(course_id)
+        html = render_to_string(OUTLINE_TEMPLATE, {'modules': snapshot.outline if snapshot else []})
+        cache.set(key, html, FRAGMENT_TTL)
+    return html
+
+
+def _bump_on_commit(course_id):
+    if course_id is not None:
+        transaction.on_commit(lambda: bump_outline_version(course_id))
+
+
+def _cascaded(sender, origin):
+    from .models import CodingAssignment, Course, Lesson, Module
+    origin_model = getattr(origin, 'model', type(origin))
+    if origin_model is Course:
+        # The course itself is being deleted; its snapshot cascades with it
+        return True
+    # Rows removed with a deleted module/lesson: its own signal (sent after theirs) rebuilds
+    return origin_model in (Module, Lesson, CodingAssignment) and origin_model is not sender
+
+
+def _structure_changed(course_id, sender, origin=None):
+    if course_id is None or _cascaded(sender, origin):
+        return
+    pending = getattr(_deferred, 'pending', None)
+    if pending is not None:
+        pending.add(course_id)
+        return
+    if origin is not None:
+        # Deletes signal each row after the whole batch is gone: once per course is enough
+        deleted_by, rebuilt = getattr(_deferred, 'deleted', (None, None))
+        if deleted_by is not origin:
+            rebuilt = set()
+            _deferred.deleted = (origin, rebuilt)
+        if course_id in rebuilt:
+            return
+        rebuilt.add(course_id)
+    rebuild_outline_snapshot(course_id)
+
+
+def _course_created(sender, instance, raw=False, created=False, **kwargs):
+    # New courses start with an empty outline so readers never build one lazily
+    if created and not raw:
+        CourseOutlineSnapshot.objects.get_or_create(course_id=instance.pk)
+
+
+def _instructors_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _bump_on_commit(instance.course_id)
+
+
+def _module_changed(sender, instance, raw=False, origin=None, **kwargs):
+    if not raw:
+        _structure_changed(instance.course_id, sender, origin)
+
+
+def _lesson_changed(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or _cascaded(sender, origin):
+        return
+    from .models import Module
+    course_id = Module.objects.filter(pk=instance.module_id).values_list('course_id', flat=True).first()
+    _structure_changed(course_id, sender, origin)
+
+
+def _assignment_changed(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or instance.lesson_id is None or _cascaded(sender, origin):
+        return
+    from .models import Lesson
+    course_id = Lesson.objects.filter(pk=instance.lesson_id).values_list('module__course_id', flat=True).first()
+    _structure_changed(course_id, sender, origin)
+
+
+def connect_signals():
+    from .models import CodingAssignment, Course, CourseInstructor, Lesson, Module
+    post_save.connect(_course_created, sender=Course, dispatch_uid='courses.outline.course_created')
+    handlers = (
+        (Module, _module_changed),
+        (CourseInstructor, _instructors_changed),
+        (Lesson, _lesson_changed),
+        (CodingAssignment, _assignment_changed),
+    )
+    for model, handler in handlers:
+        label = model._meta.model_name
+        post_save.connect(handler, sender=model, dispatch_uid=f'courses.outline.{label}_saved')
+        post_delete.connect(handler, sender=model, dispatch_uid=f'courses.outline.{label}_deleted')
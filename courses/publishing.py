@@ -0,0 +1,252 @@
+"""Publish a wizard CourseDraft as a Course with its full structure.
+
+``publish_draft`` reads the flushed draft document and validates it. It then
+writes the course, its lead instructor row, modules, lessons, coding
+assignments and tag links in one transaction. Everything after the Course
+row goes through ``bulk_create``, so the number of queries depends on the
+number of tables, not on the size of the course: a 500-lesson course costs
+about the same as a 5-lesson one.
+
+``bulk_create`` sends no signals. The outline snapshot is therefore rebuilt
+explicitly inside the transaction. The Course save itself still triggers the
+usual after-commit work: search reindex, facet invalidation and catalog
+ETags. That work runs once the tag links exist.
+
+Document shape (as saved by the wizard):
+``basic`` {title, short_description, long_description, department,
+specialization, subspecialization}, ``structure`` {modules: [{id, title,
+lessons: [{id, title}]}]}, ``content`` {lessons: {<lesson id>: {type, notes}}},
+``extras`` {seo: {keywords}}, ``access`` {cap, waitlist} and ``schedule``
+{mode, start, timezone, drip}. Lessons whose content type is ``code`` get a
+CodingAssignment whose prompt is the lesson notes. A cap above 0 becomes the
+course's CourseCapacity. A drip/cohort mode or a start date becomes its
+CourseSchedule; a future start date keeps the course unpublished until then.
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .enrollment import CourseCapacity
+from .models import CodingAssignment, Course, CourseDraft, CourseInstructor, Department, Lesson, Module, Specialization, SubSpecialization, Tag
+from .schedule import CourseSchedule, parse_schedule
+
+MAX_MODULES = getattr(settings, 'COURSE_PUBLISH_MAX_MODULES', 200)
+MAX_LESSONS = getattr(settings, 'COURSE_PUBLISH_MAX_LESSONS', 2000)
+MAX_TAGS = 20
+BATCH_SIZE = 500
+
+
+def _text(value, limit=None):
+    text = value.strip() if isinstance(value, str) else ''
+    return text[:limit] if limit else text
+
+
+def _id(value):
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _dict(value):
+    return value if isinstance(value, dict) else {}
+
+
+def validate_draft_data(data):
+    """Check a draft document and return a publish plan; raises ValidationError.
+
+    Costs at most three taxonomy lookups, whatever the course size.
+    """
+    errors = {}
+    basic = _dict(data.get('basic'))
+    title = _text(basic.get('title'), 255)
+    if not title:
+        errors['title'] = 'A course title is required.'
+
+    department_id, specialization_id = _id(basic.get('department')), _id(basic.get('specialization'))
+    subspecialization_id = _id(basic.get('subspecialization'))
+    if department_id is None or not Department.objects.filter(pk=department_id).exists():
+        errors['department'] = 'Choose a department.'
+    elif specialization_id is None or not Specialization.objects.filter(pk=specialization_id, department_id=department_id).exists():
+        errors['specialization'] = 'Choose a specialization in the selected department.'
+    elif subspecialization_id is not None and not SubSpecialization.objects.filter(pk=subspecialization_id, specialization_id=specialization_id).exists():
+        errors['subspecialization'] = 'The sub-specialization does not belong to the selected specialization.'
+
+    raw_modules = _dict(data.get('structure')).get('modules')
+    raw_modules = raw_modules if isinstance(raw_modules, list) else []
+    content = _dict(_dict(data.get('content')).get('lessons'))
+    modules = []
+    lesson_total = 0
+    for m_index, raw_module in enumerate(raw_modules, start=1):
+        raw_module = _dict(raw_module)
+        raw_lessons = raw_module.get('lessons') if isinstance(raw_module.get('lessons'), list) else []
+        lessons = []
+        for l_index, raw_lesson in enumerate(raw_lessons, start=1):
+            raw_lesson = _dict(raw_lesson)
+            lesson_content = _dict(content.get(str(raw_lesson.get('id'))))
+            coding = lesson_content.get('type') == 'code'
+            lessons.append({
+                'title': _text(raw_lesson.get('title'), 255) or f'Lesson {l_index}',
+                'order': l_index,
+                'prompt': (_text(lesson_content.get('notes')) or _text(raw_lesson.get('title'))) if coding else None,
+            })
+        lesson_total += len(lessons)
+        modules.append({
+            'title': _text(raw_module.get('title'), 255) or f'Module {m_index}',
+            'order': m_index,
+            'lessons': lessons,
+        })
+    if not modules:
+        errors['structure'] = 'Add at least one module.'
+    elif len(modules) > MAX_MODULES:
+        errors['structure'] = f'A course can have at most {MAX_MODULES} modules.'
+    elif lesson_total > MAX_LESSONS:
+        errors['structure'] = f'A course can have at most {MAX_LESSONS} lessons.'
+
+    keywords = _dict(_dict(data.get('extras')).get('seo')).get('keywords')
+    tags = {}
+    for name in (keywords.split(',') if isinstance(keywords, str) else []):
+        name = name.strip()[:50]
+        slug = slugify(name)[:64]
+        if slug and slug not in tags:
+            tags[slug] = name
+    if len(tags) > MAX_TAGS:
+        errors['tags'] = f'Use at most {MAX_TAGS} keywords.'
+
+    access = _dict(data.get('access'))
+    capacity = _id(access.get('cap'))
+    if access.get('cap') not in (None, '') and (capacity is None or capacity < 0):
+        errors['capacity'] = 'The enrollment cap must be a whole number (0 = unlimited).'
+
+    try:
+        schedule = parse_schedule(_dict(data.get('schedule')))
+    except ValueError as exc:
+        errors['schedule'] = str(exc)
+
+    if errors:
+        raise ValidationError(errors)
+    return {
+        'title': title,
+        'description': _text(basic.get('long_description')) or _text(basic.get('short_description')),
+        'department_id': department_id,
+        'specialization_id': specialization_id,
+        'subspecialization_id': subspecialization_id,
+        'modules': modules,
+        'tags': tags,
+        'capacity': capacity or None,
+        'waitlist': access.get('waitlist') is True,
+        'schedule': schedule,
+    }
+
+
+def unique_course_slug(title):
+    """Slug for `title`, suffixed -2, -3, ... when already taken."""
+    base = slugify(title)[:40] or 'course'
+    taken = set(Course.objects.filter(slug__startswith=base).values_list('slug', flat=True))
+    slug, n = base, 2
+    while slug in taken:
+        slug, n = f'{base}-{n}', n + 1
+    return slug
+
+
+def _match_tags(tags):
+    by_slug, by_name = {}, {}
+    for pk, slug, name in Tag.objects.filter(Q(slug__in=tags) | Q(name__in=tags.values())).values_list('pk', 'slug', 'name'):
+        by_slug[slug] = pk
+        by_name[name] = pk
+    matched = {}
+    for slug, name in tags.items():
+        pk = by_slug.get(slug, by_name.get(name))
+        if pk is not None:
+            matched[slug] = pk
+    return matched
+
+
+def resolve_tags(tags):
+    """{slug: tag pk} for {slug: name}, creating the missing tags in one insert.
+
+    Names are unique too, so a name already used under another slug resolves
+    to that tag. Slugs missing from the result could not be created.
+    """
+    if not tags:
+        return {}
+    matched = _match_tags(tags)
+    missing = {slug: name for slug, name in tags.items() if slug not in matched}
+    if missing:
+        Tag.objects.bulk_create([Tag(name=name, slug=slug) for slug, name in missing.items()], ignore_conflicts=True)
+        # Rows skipped by the insert (taken names, concurrent creators) are matched now
+        matched.update(_match_tags(missing))
+    return matched
+
+
+def _tags(tags):
+    resolved = resolve_tags(tags)
+    if len(resolved) < len(tags):
+        raise ValidationError({'tags': 'Some keywords could not be saved: ' + ', '.join(tags[slug] for slug in tags if slug not in resolved)})
+    return set(resolved.values())
+
+
+def publish_draft(draft_id, user):
+    """Create the course for `draft_id` (owned by `user`); returns the Course.
+
+    Raises CourseDraft.DoesNotExist or ValidationError. A draft can be
+    published once; its ``slug`` then points at the course.
+    """
+    from .drafts import flush_draft
+    from .outline import rebuild_outline_snapshot
+
+    flush_draft(draft_id)
+    now = timezone.now()
+    with transaction.atomic():
+        draft = CourseDraft.objects.select_for_update().get(pk=draft_id, owner=user)
+        if draft.status == 'published':
+            raise ValidationError('This draft has already been published.')
+        plan = validate_draft_data(draft.data or {})
+        schedule = plan['schedule']
+        publish_at = schedule['starts_at'] if schedule['starts_at'] and schedule['starts_at'] > now else None
+
+        course = Course.objects.create(
+            title=plan['title'],
+            slug=unique_course_slug(plan['title']),
+            description=plan['description'],
+            published=publish_at is None,
+            instructor=user,
+            department_id=plan['department_id'],
+            specialization_id=plan['specialization_id'],
+            subspecialization_id=plan['subspecialization_id'],
+        )
+        CourseInstructor.objects.create(course=course, instructor=user, is_lead=True)
+
+        modules = Module.objects.bulk_create(
+            [Module(course=course, title=m['title'], order=m['order']) for m in plan['modules']],
+            batch_size=BATCH_SIZE,
+        )
+        if modules and modules[0].pk is None:
+            # Backends without RETURNING: read the ids back in creation order
+            modules = list(Module.objects.filter(course=course).order_by('order'))
+        lessons = Lesson.objects.bulk_create(
+            [Lesson(module=module, title=l['title'], order=l['order'])
+             for module, m in zip(modules, plan['modules']) for l in m['lessons']],
+            batch_size=BATCH_SIZE,
+        )
+        if lessons and lessons[0].pk is None:
+            lessons = list(Lesson.objects.filter(module__course=course).order_by('module__order', 'order'))
+        prompts = [l['prompt'] for m in plan['modules'] for l in m['lessons']]
+        CodingAssignment.objects.bulk_create(
+            [CodingAssignment(lesson=lesson, prompt=prompt) for lesson, prompt in zip(lessons, prompts) if prompt is not None],
+            batch_size=BATCH_SIZE,
+        )
+        Course.tags.through.objects.bulk_create(
+            [Course.tags.through(course_id=course.pk, tag_id=tag_id) for tag_id in _tags(plan['tags'])],
+        )
+        if plan['capacity'] is not None:
+            CourseCapacity.objects.create(course=course, limit=plan['capacity'], waitlist_enabled=plan['waitlist'])
+        if schedule['mode'] != CourseSchedule.IMMEDIATE or schedule['starts_at']:
+            CourseSchedule.objects.create(course=course, publish_at=publish_at, **schedule)
+        rebuild_outline_snapshot(course.pk)
+
+        CourseDraft.objects.filter(pk=draft.pk).update(status='published', slug=course.slug)
+    return course
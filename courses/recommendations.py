@@ -0,0 +1,360 @@
+"""Precomputed "Recommended for you" course lists.
+
+Courses and students are sparse feature vectors keyed by
+'d:<department>', 's:<specialization>', 'ss:<subspecialization>' and
+'t:<tag>'. A student's vector comes from their declared interests (the
+student_* M2Ms) plus the taxonomy and tags of the courses they take. Scoring
+multiplies that vector against an inverted index (feature -> postings of
+(course, weight)), so only courses sharing a feature are ever touched.
+
+Co-enrollment adds item-to-item cosine similarity over enrollments
+(|A∩B| / sqrt(|A|·|B|)) with the student's courses. A small popularity
+prior ranks cold-start students.
+
+The top-N per student is stored in CourseRecommendation and cached. The
+dashboard reads it with a single cache get (see the course_recommendations
+template tag). Lists are written by Celery workers and read by web processes,
+and a deleted course drops the features from the web process. Both only work
+with the shared default cache (Redis in ``settings.CACHES``; see
+``eduvanta.cache``). The table stays the source of truth: a cache miss reads
+it back.
+- ``precompute_recommendations`` rebuilds lists in batch, nightly from Celery beat.
+- Interest and enrollment changes refresh just that student on commit.
+"""
+import math
+from collections import Counter, defaultdict
+from itertools import combinations
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Count
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from django.utils import timezone
+
+TOP_N = 12
+# Feature weights for the student vector
+W_DEPARTMENT = 1.0
+W_SPECIALIZATION = 2.0
+W_SUBSPECIALIZATION = 3.0
+W_TAG = 1.5
+# Share of an enrolled course's taxonomy folded into the student vector
+W_ENROLLED_TAXONOMY = 0.5
+W_CO_ENROLLMENT = 4.0
+W_POPULARITY = 0.25
+# Courses per student considered for co-enrollment pairs
+MAX_BASKET = 50
+BATCH_SIZE = 500
+
+FEATURES_KEY = 'courses:recs:features'
+FEATURES_TTL = 60 * 10
+STUDENT_KEY = 'courses:recs:student:{student_id}'
+STUDENT_TTL = 60 * 60 * 24
+
+
+class CourseRecommendation(models.Model):
+    """One entry of a student's precomputed top-N list."""
+    REASON_CHOICES = [
+        ('interests', 'Matches your interests'),
+        ('tags', 'Similar topics'),
+        ('co_enrolled', 'Students like you took this'),
+        ('popular', 'Popular'),
+    ]
+
+    student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='course_recommendations')
+    course = models.ForeignKey('courses.Course', on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    reason = models.CharField(max_length=16, choices=REASON_CHOICES, default='popular')
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('student', 'course')
+        ordering = ['student', 'rank']
+        indexes = [models.Index(fields=['student', 'rank'], name='courses_rec_student_rank_idx')]
+
+    def __str__(self):
+        return f"{self.student_id} -> {self.course_id} (#{self.rank})"
+
+
+def _course_vector(department_id, specialization_id, subspecialization_id, tag_ids):
+    vector = {f'd:{department_id}': 1.0, f's:{specialization_id}': 1.0}
+    if subspecialization_id:
+        vector[f'ss:{subspecialization_id}'] = 1.0
+    if tag_ids:
+        # The tag block has unit length (L2), so heavily tagged courses don't dominate
+        share = 1.0 / math.sqrt(len(tag_ids))
+        for tag_id in tag_ids:
+            vector[f't:{tag_id}'] = share
+    return vector
+
+
+def load_features():
+    """Recommendable courses: vectors, inverted index, popularity and card data (cached)."""
+    features = cache.get(FEATURES_KEY)
+    if features is not None:
+        return features
+    from .models import Course, Enrollment
+    visible = Course.objects.filter(published=True, approval_status='approved')
+    tags = defaultdict(list)
+    for course_id, tag_id in Course.tags.through.objects.filter(course__in=visible).values_list('course_id', 'tag_id'):
+        tags[course_id].append(tag_id)
+    popularity = dict(
+        Enrollment.objects.exclude(status='dropped').values_list('course_id').annotate(n=Count('id')).order_by()
+    )
+    vectors, cards, postings = {}, {}, defaultdict(list)
+    rows = visible.values_list(
+        'pk', 'title', 'slug', 'department_id', 'department__code', 'specialization_id', 'specialization__name', 'subspecialization_id',
+    )
+    for pk, title, slug, department_id, department_code, specialization_id, specialization_name, subspecialization_id in rows:
+        vector = _course_vector(department_id, specialization_id, subspecialization_id, tags.get(pk))
+        vectors[pk] = vector
+        for feature, weight in vector.items():
+            postings[feature].append((pk, weight))
+        cards[pk] = {'id': pk, 'title': title, 'slug': slug, 'department': department_code, 'specialization': specialization_name}
+    features = {
+        'vectors': vectors,
+        'postings': dict(postings),
+        'popularity': {pk: popularity.get(pk, 0) for pk in vectors},
+        'all_popularity': popularity,
+        'max_popularity': max(popularity.values(), default=0),
+        'cards': cards,
+    }
+    cache.set(FEATURES_KEY, features, FEATURES_TTL)
+    return features
+
+
+def _student_vector(interests, enrolled, features):
+    vector = defaultdict(float)
+    for kind, weight in (('d', W_DEPARTMENT), ('s', W_SPECIALIZATION), ('ss', W_SUBSPECIALIZATION)):
+        for node_id in interests.get(kind, ()):
+            vector[f'{kind}:{node_id}'] += weight
+    if enrolled:
+        scale = 1.0 / len(enrolled)
+        for course_id in enrolled:
+            for feature, weight in features['vectors'].get(course_id, {}).items():
+                w = W_TAG if feature.startswith('t:') else W_ENROLLED_TAXONOMY
+                vector[feature] += w * weight * scale
+    return vector
+
+
+def score_student(interests, enrolled, co_counts, features, top_n=TOP_N):
+    """Top-N [(course_id, score, reason)] for one student.
+
+    `interests` maps 'd'/'s'/'ss' to id sets, `enrolled` is the student's course
+    ids and `co_counts` maps course id -> summed co-enrollment cosine with them.
+    """
+    parts = defaultdict(lambda: [0.0, 0.0, 0.0])  # interests, tags, co-enrollment
+    for feature, weight in _student_vector(interests, enrolled, features).items():
+        slot = 1 if feature.startswith('t:') else 0
+        for course_id, course_weight in features['postings'].get(feature, ()):
+            parts[course_id][slot] += weight * course_weight
+    for course_id, similarity in co_counts.items():
+        if course_id in features['vectors']:
+            parts[course_id][2] += W_CO_ENROLLMENT * similarity
+
+    max_pop = features['max_popularity']
+    scored = []
+    candidates = set(parts) | (set(features['vectors']) if len(parts) < top_n else set())
+    for course_id in candidates - set(enrolled):
+        interest, tag, co = parts.get(course_id, (0.0, 0.0, 0.0))
+        prior = W_POPULARITY * math.log1p(features['popularity'].get(course_id, 0)) / math.log1p(max_pop) if max_pop else 0.0
+        total = interest + tag + co + prior
+        reason = max((interest, 'interests'), (tag, 'tags'), (co, 'co_enrolled'), (prior, 'popular'))[1]
+        scored.append((course_id, round(total, 6), reason))
+    scored.sort(key=lambda item: (-item[1], -features['popularity'].get(item[0], 0), item[0]))
+    return scored[:top_n]
+
+
+def _cosine(pair_count, pop_a, pop_b):
+    return pair_count / math.sqrt(pop_a * pop_b) if pop_a and pop_b else 0.0
+
+
+def _load_interests(student_ids):
+    from django.contrib.auth import get_user_model
+    User = get_user_model()
+    interests = defaultdict(lambda: defaultdict(set))
+    for kind, field in (('d', 'student_departments'), ('s', 'student_specializations'), ('ss', 'student_subspecializations')):
+        m2m = getattr(User, field).field
+        source, target = m2m.m2m_field_name(), m2m.m2m_reverse_field_name()
+        rows = m2m.remote_field.through.objects.filter(**{f'{source}_id__in': student_ids}).values_list(f'{source}_id', f'{target}_id')
+        for user_id, node_id in rows:
+            interests[user_id][kind].add(node_id)
+    return interests
+
+
+def _store(results, features):
+    """Replace the stored lists of the students in `results` and refresh their cache entries.
+
+    Features cached before a course was deleted can still rank it, so entries
+    for courses that no longer exist are dropped here.
+    """
+    from .models import Course
+    now = timezone.now()
+    with transaction.atomic():
+        course_ids = {course_id for ranked in results.values() for course_id, _, _ in ranked}
+        live = set(Course.objects.filter(pk__in=course_ids).values_list('pk', flat=True))
+        if live != course_ids:
+            results = {
+                student_id: [entry for entry in ranked if entry[0] in live]
+                for student_id, ranked in results.items()
+            }
+        CourseRecommendation.objects.filter(student_id__in=list(results)).delete()
+        CourseRecommendation.objects.bulk_create([
+            CourseRecommendation(student_id=student_id, course_id=course_id, rank=rank, score=score, reason=reason, computed_at=now)
+            for student_id, ranked in results.items()
+            for rank, (course_id, score, reason) in enumerate(ranked, start=1)
+        ], batch_size=1000)
+    cache.set_many({
+        STUDENT_KEY.format(student_id=student_id): _cards(ranked, features)
+        for student_id, ranked in results.items()
+    }, STUDENT_TTL)
+
+
+def _cards(ranked, features):
+    return [dict(features['cards'][course_id], score=score, reason=reason) for course_id, score, reason in ranked]
+
+
+def precompute_recommendations(student_ids=None, top_n=TOP_N, batch_size=BATCH_SIZE):
+    """Recompute lists for `student_ids` (default: every student); returns students processed.
+
+    Enrollments are read once to build the course co-occurrence table; each
+    batch of students then costs three interest queries plus the write.
+    """
+    from django.contrib.auth import get_user_model
+    from .models import Enrollment
+    cache.delete(FEATURES_KEY)
+    features = load_features()
+    popularity = features['all_popularity']
+
+    baskets = defaultdict(list)
+    for student_id, course_id in Enrollment.objects.exclude(status='dropped').order_by('student_id', '-created_at').values_list('student_id', 'course_id').iterator(chunk_size=5000):
+        if len(baskets[student_id]) < MAX_BASKET:
+            baskets[student_id].append(course_id)
+    pairs = defaultdict(Counter)
+    for basket in baskets.values():
+        for a, b in combinations(sorted(set(basket)), 2):
+            pairs[a][b] += 1
+            pairs[b][a] += 1
+
+    if student_ids is None:
+        student_ids = get_user_model().objects.filter(role='student').order_by('pk').values_list('pk', flat=True)
+    student_ids = list(student_ids)
+    for start in range(0, len(student_ids), batch_size):
+        batch = student_ids[start:start + batch_size]
+        interests = _load_interests(batch)
+        results = {}
+        for student_id in batch:
+            enrolled = baskets.get(student_id, [])
+            co = defaultdict(float)
+            for a in enrolled:
+                for b, n in pairs.get(a, {}).items():
+                    co[b] += _cosine(n, popularity.get(a, 0), popularity.get(b, 0))
+            results[student_id] = score_student(interests.get(student_id, {}), enrolled, co, features, top_n)
+        _store(results, features)
+    return len(student_ids)
+
+
+def refresh_student_recommendations(student_id, top_n=TOP_N):
+    """Recompute one student's list with targeted queries (no full co-occurrence pass)."""
+    from .models import Enrollment
+    features = load_features()
+    popularity = features['all_popularity']
+    active = Enrollment.objects.exclude(status='dropped')
+    enrolled = list(active.filter(student_id=student_id).order_by('-created_at').values_list('course_id', flat=True)[:MAX_BASKET])
+    co = defaultdict(float)
+    if enrolled:
+        # Per (seed course, other course): how many students took both
+        peers = active.filter(course_id__in=enrolled).exclude(student_id=student_id).values('student_id')
+        rows = (
+            active.filter(student_id__in=peers).exclude(course_id__in=enrolled)
+            .values_list('course_id')
+            .annotate(n=Count('student_id', distinct=True))
+            .order_by()
+        )
+        # Pair counts are pooled across seeds; normalise by the seeds' combined popularity
+        seed_pop = sum(popularity.get(a, 0) for a in enrolled)
+        for course_id, n in rows:
+            co[course_id] = _cosine(n, seed_pop, popularity.get(course_id, 0))
+    results = {student_id: score_student(_load_interests([student_id]).get(student_id, {}), enrolled, co, features, top_n)}
+    _store(results, features)
+    return results[student_id]
+
+
+def recommended_courses(student_id, limit=TOP_N):
+    """Card dicts for the dashboard: one cache get, one query on a cold cache."""
+    key = STUDENT_KEY.format(student_id=student_id)
+    cards = cache.get(key)
+    if cards is None:
+        rows = (
+            CourseRecommendation.objects.filter(student_id=student_id)
+            .select_related('course__department', 'course__specialization')
+            .order_by('rank')
+        )
+        cards = [
+            {
+                'id': r.course_id, 'title': r.course.title, 'slug': r.course.slug,
+                'department': r.course.department.code, 'specialization': r.course.specialization.name,
+                'score': r.score, 'reason': r.reason,
+            }
+            for r in rows
+        ]
+        cache.set(key, cards, STUDENT_TTL)
+    return cards[:limit]
+
+
+def schedule_refresh(student_id):
+    """Refresh one student's list after commit, in Celery when a broker is reachable."""
+    def run():
+        from .tasks import refresh_student_recommendations_task
+        try:
+            refresh_student_recommendations_task.delay(student_id)
+        except Exception:
+            refresh_student_recommendations(student_id)
+    transaction.on_commit(run)
+
+
+def _interests_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        schedule_refresh(instance.pk)
+    else:
+        for student_id in pk_set or ():
+            schedule_refresh(student_id)
+
+
+def _remember_status(sender, instance, **kwargs):
+    instance._recs_status = instance.__dict__.get('status')
+
+
+def _enrollment_saved(sender, instance, raw=False, created=False, **kwargs):
+    # Progress/XP saves don't change what a student is enrolled in
+    if raw or not (created or instance.status != getattr(instance, '_recs_status', None)):
+        return
+    instance._recs_status = instance.status
+    schedule_refresh(instance.student_id)
+
+
+def _enrollment_deleted(sender, instance, **kwargs):
+    schedule_refresh(instance.student_id)
+
+
+def _course_deleted(sender, instance, **kwargs):
+    # Right away, not on commit: refreshes queued by the cascaded enrollment
+    # deletes run first on commit and must not score the deleted course.
+    # Workers only see this through the shared cache; _store() covers a
+    # worker that reloaded the features in between.
+    cache.delete(FEATURES_KEY)
+
+
+def connect_signals():
+    from django.contrib.auth import get_user_model
+    from .models import Course, Enrollment
+    User = get_user_model()
+    for field in ('student_departments', 'student_specializations', 'student_subspecializations'):
+        m2m_changed.connect(_interests_changed, sender=getattr(User, field).through, dispatch_uid=f'courses.recs.{field}')
+    post_init.connect(_remember_status, sender=Enrollment, dispatch_uid='courses.recs.enrollment_init')
+    post_save.connect(_enrollment_saved, sender=Enrollment, dispatch_uid='courses.recs.enrollment_saved')
+    post_delete.connect(_enrollment_deleted, sender=Enrollment, dispatch_uid='courses.recs.enrollment_deleted')
+    post_delete.connect(_course_deleted, sender=Course, dispatch_uid='courses.recs.course_deleted')
@@ -0,0 +1,321 @@
+"""Drip release of lessons and scheduled course publishing.
+
+A course's ``CourseSchedule`` comes from the wizard's schedule step:
+
+* ``immediate``: everything is open on enrollment.
+* ``drip``: module *n* (0-based, in course order) opens ``n * drip_interval``
+  after the student enrolls, or after the start date if that is later.
+* ``cohort``: the same, but counted from the start date for everyone.
+
+A start date in the future also sets ``publish_at``. The course stays
+unpublished until then.
+
+Unlock times are not worked out on page views. They are precomputed into one
+``LessonUnlock`` row per (enrollment, lesson) when a student enrolls, and
+recomputed in bulk when the course structure or its schedule changes (see
+``outline_rebuilt``). A request-time check is then a single lookup on the
+(enrollment, lesson) unique index: ``lesson_unlock_time`` for one lesson,
+``locked_lessons`` for a whole outline.
+
+``release_due`` runs from Celery beat (``CELERY_BEAT_SCHEDULE``). It
+publishes the courses whose ``publish_at`` has passed and flips due unlock
+rows to ``unlocked`` in batches, with one notification per enrollment. The
+due rows are found through a partial index that only covers rows that are
+still locked.
+"""
+import re
+import threading
+from collections import Counter
+from datetime import timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Enrollment, Lesson, Module
+from .outline import outline_rebuilt
+
+SWEEP_BATCH = getattr(settings, 'COURSE_RELEASE_SWEEP_BATCH', 5000)
+BATCH_SIZE = 1000
+INTERVAL_RE = re.compile(r'^(?:(\d+)w)?(?:(\d+)d)?(?:(\d+)h)?(?:(\d+)m)?$')
+
+_refreshes = threading.local()
+
+
+class CourseSchedule(models.Model):
+    IMMEDIATE = 'immediate'
+    DRIP = 'drip'
+    COHORT = 'cohort'
+    MODE_CHOICES = (
+        (IMMEDIATE, 'Immediate'),
+        (DRIP, 'Drip'),
+        (COHORT, 'Cohort'),
+    )
+    DRIP_MODES = (DRIP, COHORT)
+
+    course = models.OneToOneField('courses.Course', on_delete=models.CASCADE, primary_key=True, related_name='schedule')
+    mode = models.CharField(max_length=16, choices=MODE_CHOICES, default=IMMEDIATE)
+    starts_at = models.DateTimeField(null=True, blank=True)
+    timezone = models.CharField(max_length=64, default='UTC')
+    drip_interval = models.DurationField(null=True, blank=True)
+    # Cleared once the beat job has published the course
+    publish_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Course {self.course_id}: {self.mode}"
+
+    def unlock_at(self, enrolled_at, module_index):
+        if self.mode == self.COHORT and self.starts_at:
+            base = self.starts_at
+        else:
+            base = max(enrolled_at, self.starts_at or enrolled_at)
+        return base + (self.drip_interval or timedelta(0)) * module_index
+
+
+class LessonUnlock(models.Model):
+    enrollment = models.ForeignKey(Enrollment, on_delete=models.CASCADE, related_name='lesson_unlocks')
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='unlocks')
+    unlock_at = models.DateTimeField()
+    unlocked = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('enrollment', 'lesson')
+        indexes = [
+            models.Index(fields=['unlock_at'], condition=Q(unlocked=False), name='courses_unlock_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"Lesson {self.lesson_id} for enrollment {self.enrollment_id} at {self.unlock_at:%Y-%m-%d %H:%M}"
+
+
+def parse_interval(value):
+    """timedelta for '7d', '1w2d', '12h', '30m' (combinable, in that order); None if invalid."""
+    match = INTERVAL_RE.match((value or '').strip().lower())
+    if not match or not any(match.groups()):
+        return None
+    weeks, days, hours, minutes = (int(part or 0) for part in match.groups())
+    return timedelta(weeks=weeks, days=days, hours=hours, minutes=minutes) or None
+
+
+def format_interval(interval):
+    """Inverse of parse_interval, for pre-filling the wizard."""
+    if not interval:
+        return ''
+    minutes = int(interval.total_seconds() // 60)
+    parts = []
+    for unit, size in (('w', 7 * 24 * 60), ('d', 24 * 60), ('h', 60), ('m', 1)):
+        if minutes >= size:
+            parts.append(f'{minutes // size}{unit}')
+            minutes %= size
+    return ''.join(parts)
+
+
+def parse_schedule(data):
+    """Model fields for the wizard's schedule step ({mode, start, timezone, drip}); raises ValueError."""
+    mode = data.get('mode') or CourseSchedule.IMMEDIATE
+    if mode not in dict(CourseSchedule.MODE_CHOICES):
+        raise ValueError('Choose a release mode.')
+    tz_name = (data.get('timezone') or '').strip() or 'UTC'
+    try:
+        tz = ZoneInfo(tz_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f'Unknown timezone "{tz_name}".')
+    starts_at = None
+    if (data.get('start') or '').strip():
+        try:
+            starts_at = parse_datetime(data['start'].strip())
+        except ValueError:
+            starts_at = None
+        if starts_at is None:
+            raise ValueError('Use an ISO date/time for the start, like 2025-10-01T09:00.')
+        if timezone.is_naive(starts_at):
+            starts_at = timezone.make_aware(starts_at, tz)
+    drip_interval = None
+    if mode in CourseSchedule.DRIP_MODES:
+        drip_interval = parse_interval(data.get('drip'))
+        if drip_interval is None:
+            raise ValueError('Give a drip interval such as 7d or 1w2d.')
+        if mode == CourseSchedule.COHORT and starts_at is None:
+            raise ValueError('Cohort courses need a start date.')
+    return {'mode': mode, 'starts_at': starts_at, 'timezone': tz_name, 'drip_interval': drip_interval}
+
+
+def precompute_unlocks(course_id, student_ids=None):
+    """Write unlock times for the course's enrollments (or just `student_ids`'); returns rows written.
+
+    Existing rows get their new time but stay unlocked once released. Under
+    an immediate schedule the course's rows are removed instead.
+    """
+    schedule = CourseSchedule.objects.filter(course_id=course_id).first()
+    if schedule is None:
+        return 0
+    enrollments = Enrollment.objects.filter(course_id=course_id).exclude(status='dropped')
+    if student_ids is not None:
+        enrollments = enrollments.filter(student_id__in=student_ids)
+    if schedule.mode not in CourseSchedule.DRIP_MODES:
+        LessonUnlock.objects.filter(enrollment__in=enrollments.values('id')).delete()
+        return 0
+    rank = {pk: n for n, pk in enumerate(Module.objects.filter(course_id=course_id).order_by('order', 'pk').values_list('id', flat=True))}
+    lessons = list(Lesson.objects.filter(module__course_id=course_id).values_list('id', 'module_id'))
+    now = timezone.now()
+    written = 0
+    rows = []
+    for enrollment_id, enrolled_at in enrollments.values_list('id', 'created_at').iterator(chunk_size=BATCH_SIZE):
+        for lesson_id, module_id in lessons:
+            unlock_at = schedule.unlock_at(enrolled_at, rank[module_id])
+            rows.append(LessonUnlock(enrollment_id=enrollment_id, lesson_id=lesson_id, unlock_at=unlock_at, unlocked=unlock_at <= now))
+        if len(rows) >= BATCH_SIZE:
+            written += _upsert(rows)
+            rows = []
+    return written + _upsert(rows)
+
+
+def _upsert(rows):
+    LessonUnlock.objects.bulk_create(
+        rows, batch_size=BATCH_SIZE,
+        update_conflicts=True, unique_fields=['enrollment', 'lesson'], update_fields=['unlock_at'],
+    )
+    return len(rows)
+
+
+def schedule_unlock_refresh(course_id):
+    """Run `precompute_unlocks` for the whole course after commit, in Celery when a broker is reachable.
+
+    Repeated calls in one transaction (a structure rebuild per edit) queue one refresh.
+    """
+    pending = _refreshes.__dict__.setdefault('pending', {})
+    # Left behind by a rolled-back transaction, the token is simply reused
+    token = pending.setdefault(course_id, object())
+
+    def run():
+        if pending.get(course_id) is not token:
+            return
+        del pending[course_id]
+        from .tasks import refresh_unlocks_task
+        try:
+            refresh_unlocks_task.delay(course_id)
+        except Exception:
+            precompute_unlocks(course_id)
+    transaction.on_commit(run)
+
+
+def schedule_enrollment_unlocks(course_id, student_ids):
+    """Write new enrollments' unlock rows after commit.
+
+    Enrolling runs under the course's capacity row lock; the rows are not
+    needed before the enrollment is visible anyway.
+    """
+    def run():
+        if CourseSchedule.objects.filter(course_id=course_id, mode__in=CourseSchedule.DRIP_MODES).exists():
+            precompute_unlocks(course_id, student_ids)
+    transaction.on_commit(run)
+
+
+def lesson_unlock_time(enrollment_id, lesson_id, now=None):
+    """None if the lesson is open to the enrollment, else when it opens."""
+    row = LessonUnlock.objects.filter(enrollment_id=enrollment_id, lesson_id=lesson_id).values_list('unlocked', 'unlock_at').first()
+    if row is None or row[0] or row[1] <= (now or timezone.now()):
+        return None
+    return row[1]
+
+
+def locked_lessons(enrollment_id, now=None):
+    """{lesson id: unlock time} for the enrollment's lessons that are still locked."""
+    return dict(
+        LessonUnlock.objects.filter(enrollment_id=enrollment_id, unlocked=False, unlock_at__gt=now or timezone.now())
+        .values_list('lesson_id', 'unlock_at')
+    )
+
+
+def publish_due_courses(now=None):
+    """Publish courses whose `publish_at` has passed; returns their ids."""
+    from .models import Course
+    now = now or timezone.now()
+    with transaction.atomic():
+        ids = list(
+            CourseSchedule.objects.select_for_update(skip_locked=True)
+            .filter(publish_at__lte=now).values_list('course_id', flat=True)
+        )
+        if not ids:
+            return []
+        Course.objects.filter(pk__in=ids, published=False).update(published=True)
+        CourseSchedule.objects.filter(course_id__in=ids).update(publish_at=None)
+        transaction.on_commit(lambda: _after_publish(ids))
+    return ids
+
+
+def _after_publish(course_ids):
+    from eduvanta.conditional import touch
+
+    from .facets import invalidate_facets
+    from .recommendations import FEATURES_KEY
+    from .search import reindex_courses
+    # update() sends no post_save
+    reindex_courses(course_ids)
+    invalidate_facets()
+    cache.delete(FEATURES_KEY)
+    touch('courses')
+
+
+def release_due_unlocks(now=None):
+    """Mark due unlock rows released, SWEEP_BATCH at a time; returns how many."""
+    from accounts.models import Notification
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            # skip_locked: an overlapping sweep takes the next rows instead of waiting
+            batch = list(
+                LessonUnlock.objects.select_for_update(skip_locked=True).filter(unlocked=False, unlock_at__lte=now)
+                .order_by('unlock_at').values_list('id', 'enrollment_id')[:SWEEP_BATCH]
+            )
+            if not batch:
+                break
+            LessonUnlock.objects.filter(id__in=[pk for pk, _ in batch]).update(unlocked=True)
+            counts = Counter(enrollment_id for _, enrollment_id in batch)
+            Notification.objects.bulk_create([
+                Notification(
+                    user_id=student_id, category='course', severity='info',
+                    title='New lessons unlocked',
+                    body=f'{counts[pk]} new lesson{"s" if counts[pk] != 1 else ""} opened in "{title}".',
+                )
+                for pk, student_id, title in
+                Enrollment.objects.filter(pk__in=counts, status='active').values_list('pk', 'student_id', 'course__title')
+            ])
+        released += len(batch)
+        if len(batch) < SWEEP_BATCH:
+            break
+    return released
+
+
+def release_due(now=None):
+    """The periodic beat job: scheduled publishes, then drip unlocks."""
+    now = now or timezone.now()
+    return {'published': len(publish_due_courses(now)), 'unlocked': release_due_unlocks(now)}
+
+
+def _enrollment_created(sender, instance, raw=False, created=False, **kwargs):
+    if not raw and created:
+        schedule_enrollment_unlocks(instance.course_id, [instance.student_id])
+
+
+def _schedule_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_unlock_refresh(instance.course_id)
+
+
+def _structure_rebuilt(sender, course_ids, **kwargs):
+    for course_id in CourseSchedule.objects.filter(course_id__in=course_ids, mode__in=CourseSchedule.DRIP_MODES).values_list('course_id', flat=True):
+        schedule_unlock_refresh(course_id)
+
+
+def connect_signals():
+    post_save.connect(_enrollment_created, sender=Enrollment, dispatch_uid='courses.schedule.enrollment_created')
+    post_save.connect(_schedule_saved, sender=CourseSchedule, dispatch_uid='courses.schedule.schedule_saved')
+    outline_rebuilt.connect(_structure_rebuilt, dispatch_uid='courses.schedule.structure_rebuilt')
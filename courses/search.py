@@ -0,0 +1,242 @@
+"""Full-text course catalog search.
+
+Each course has one document made of its title, description, tag names and
+department/specialization/subspecialization names. The document lives in:
+
+- SQLite: the FTS5 table ``courses_course_fts`` (rowid = course id), ranked
+  with bm25() and highlighted with highlight()/snippet().
+- Postgres: ``courses_course_search`` with a weighted ``tsvector`` column under
+  a GIN index, ranked with ts_rank_cd() and highlighted with ts_headline().
+
+Other backends (or a database that has not run the migration) fall back to
+substring filtering. Documents are refreshed incrementally from signals when
+courses, tags or taxonomy rows change; see ``connect_signals``.
+"""
+import re
+
+from django.db import connection, transaction
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+SQLITE_TABLE = 'courses_course_fts'
+POSTGRES_TABLE = 'courses_course_search'
+TS_CONFIG = 'english'
+# Maximum number of query terms taken from user input
+MAX_TERMS = 8
+REINDEX_BATCH_SIZE = 500
+
+# Private-use markers survive escaping and are swapped for <mark> afterwards
+_HL_START = '\ue000'
+_HL_END = '\ue001'
+
+# Column expressions shared by the backfill and incremental reindex
+_DOCUMENT_SELECT = """
+    SELECT c.id,
+           c.title,
+           c.description,
+           COALESCE((SELECT {tag_agg} FROM courses_course_tags ct
+                     JOIN courses_tag t ON t.id = ct.tag_id
+                     WHERE ct.course_id = c.id), '') AS tags,
+           d.name || ' ' || d.code || ' ' || s.name || ' ' || COALESCE(ss.name, '') AS taxonomy
+    FROM courses_course c
+    JOIN courses_department d ON d.id = c.department_id
+    JOIN courses_specialization s ON s.id = c.specialization_id
+    LEFT JOIN courses_subspecialization ss ON ss.id = c.subspecialization_id
+"""
+
+_backend_cache = {}
+
+
+def search_backend():
+    """'sqlite', 'postgresql' or None when no search index table is available."""
+    key = connection.alias
+    if key not in _backend_cache:
+        table = {'sqlite': SQLITE_TABLE, 'postgresql': POSTGRES_TABLE}.get(connection.vendor)
+        try:
+            available = bool(table) and table in connection.introspection.table_names()
+        except Exception:
+            available = False
+        _backend_cache[key] = connection.vendor if available else None
+    return _backend_cache[key]
+
+
+def _terms(text):
+    return re.findall(r'\w+', (text or '').lower())[:MAX_TERMS]
+
+
+def _sqlite_match(terms):
+    # Every term must match; the last one as a prefix for search-as-you-type
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _postgres_tsquery(terms):
+    return ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+
+
+def search_courses(queryset, text):
+    """Filter a Course queryset to documents matching `text`, best match first.
+
+    The result stays a lazy queryset (further filters, pagination and
+    select_related all compose) annotated with ``search_rank``.
+    """
+    terms = _terms(text)
+    if not terms:
+        return queryset
+    backend = search_backend()
+    if backend == 'sqlite':
+        match = _sqlite_match(terms)
+        queryset = queryset.filter(
+            pk__in=RawSQL(f"SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s", [match])
+        ).annotate(search_rank=RawSQL(
+            # bm25() is lower-is-better; weights favour title, then tags, taxonomy, description
+            f"SELECT -bm25({SQLITE_TABLE}, 10.0, 1.0, 4.0, 2.0) FROM {SQLITE_TABLE} "
+            f"WHERE {SQLITE_TABLE} MATCH %s AND rowid = courses_course.id",
+            [match], output_field=FloatField(),
+        ))
+        return queryset.order_by('-search_rank', '-pk')
+    if backend == 'postgresql':
+        tsquery = _postgres_tsquery(terms)
+        queryset = queryset.filter(
+            pk__in=RawSQL(
+                f"SELECT course_id FROM {POSTGRES_TABLE} WHERE document @@ to_tsquery(%s, %s)",
+                [TS_CONFIG, tsquery],
+            )
+        ).annotate(search_rank=RawSQL(
+            f"SELECT ts_rank_cd(document, to_tsquery(%s, %s)) FROM {POSTGRES_TABLE} "
+            f"WHERE course_id = courses_course.id",
+            [TS_CONFIG, tsquery], output_field=FloatField(),
+        ))
+        return queryset.order_by('-search_rank', '-pk')
+    condition = Q()
+    for term in terms:
+        condition &= Q(title__icontains=term) | Q(description__icontains=term) | Q(tags__name__icontains=term)
+    return queryset.filter(condition).distinct()
+
+
+def _marked(text):
+    html = escape(text or '')
+    return mark_safe(html.replace(_HL_START, '<mark>').replace(_HL_END, '</mark>'))
+
+
+def highlight_courses(courses, text):
+    """Set ``title_highlight`` and ``description_snippet`` on a page of courses.
+
+    One query for the whole page; values are safe HTML with matches in <mark>.
+    """
+    courses = list(courses)
+    terms = _terms(text)
+    backend = search_backend()
+    if not courses or not terms or backend is None:
+        return courses
+    ids = [c.pk for c in courses]
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        if backend == 'sqlite':
+            cursor.execute(
+                f"SELECT rowid, highlight({SQLITE_TABLE}, 0, %s, %s), "
+                f"snippet({SQLITE_TABLE}, 1, %s, %s, '…', 24) "
+                f"FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s AND rowid IN ({placeholders})",
+                [_HL_START, _HL_END, _HL_START, _HL_END, _sqlite_match(terms)] + ids,
+            )
+        else:
+            options = f'StartSel={_HL_START}, StopSel={_HL_END}, MaxWords=30, MinWords=10'
+            cursor.execute(
+                f"SELECT course_id, ts_headline(%s, title, q, 'HighlightAll=true, StartSel={_HL_START}, StopSel={_HL_END}'), "
+                f"ts_headline(%s, description, q, %s) "
+                f"FROM {POSTGRES_TABLE}, to_tsquery(%s, %s) q WHERE course_id IN ({placeholders})",
+                [TS_CONFIG, TS_CONFIG, options, TS_CONFIG, _postgres_tsquery(terms)] + ids,
+            )
+        rows = {row[0]: row[1:] for row in cursor.fetchall()}
+    for course in courses:
+        if course.pk in rows:
+            title, snippet = rows[course.pk]
+            course.title_highlight = _marked(title)
+            course.description_snippet = _marked(snippet)
+    return courses
+
+
+def reindex_courses(course_ids):
+    """Rewrite the search documents for `course_ids` (deleted courses are dropped)."""
+    backend = search_backend()
+    course_ids = sorted(set(course_ids))
+    if backend is None or not course_ids:
+        return
+    for start in range(0, len(course_ids), REINDEX_BATCH_SIZE):
+        batch = course_ids[start:start + REINDEX_BATCH_SIZE]
+        placeholders = ', '.join(['%s'] * len(batch))
+        with transaction.atomic(), connection.cursor() as cursor:
+            if backend == 'sqlite':
+                cursor.execute(f"DELETE FROM {SQLITE_TABLE} WHERE rowid IN ({placeholders})", batch)
+                cursor.execute(
+                    f"INSERT INTO {SQLITE_TABLE} (rowid, title, description, tags, taxonomy) "
+                    + _DOCUMENT_SELECT.format(tag_agg="group_concat(t.name, ' ')")
+                    + f" WHERE c.id IN ({placeholders})",
+                    batch,
+                )
+            else:
+                cursor.execute(f"DELETE FROM {POSTGRES_TABLE} WHERE course_id IN ({placeholders})", batch)
+                cursor.execute(
+                    f"INSERT INTO {POSTGRES_TABLE} (course_id, title, description, tags, taxonomy, document) "
+                    f"SELECT id, title, description, tags, taxonomy, "
+                    f"setweight(to_tsvector(%s, title), 'A') || setweight(to_tsvector(%s, tags), 'B') || "
+                    f"setweight(to_tsvector(%s, taxonomy), 'C') || setweight(to_tsvector(%s, description), 'D') "
+                    "FROM (" + _DOCUMENT_SELECT.format(tag_agg="string_agg(t.name, ' ')")
+                    + f" WHERE c.id IN ({placeholders})) docs",
+                    [TS_CONFIG] * 4 + batch,
+                )
+
+
+def rebuild_index():
+    """Reindex every course; returns the number of courses processed."""
+    from .models import Course
+    ids = list(Course.objects.order_by('pk').values_list('pk', flat=True))
+    reindex_courses(ids)
+    return len(ids)
+
+
+def _reindex_on_commit(course_ids):
+    course_ids = list(course_ids)
+    if course_ids:
+        transaction.on_commit(lambda: reindex_courses(course_ids))
+
+
+def _course_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _reindex_on_commit([instance.pk])
+
+
+def _course_tags_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        _reindex_on_commit([instance.pk])
+    elif action == 'post_clear':
+        # Course ids are gone by now; a tag.courses.clear() is rare enough to rebuild
+        transaction.on_commit(rebuild_index)
+    else:
+        _reindex_on_commit(pk_set or [])
+
+
+def _taxonomy_saved(field):
+    def handler(sender, instance, raw=False, **kwargs):
+        if raw:
+            return
+        from .models import Course
+        _reindex_on_commit(Course.objects.filter(**{field: instance}).values_list('pk', flat=True))
+    return handler
+
+
+def connect_signals():
+    from .models import Course, Department, Specialization, SubSpecialization, Tag
+    post_save.connect(_course_saved, sender=Course, dispatch_uid='courses.search.course_saved')
+    post_delete.connect(_course_saved, sender=Course, dispatch_uid='courses.search.course_deleted')
+    m2m_changed.connect(_course_tags_changed, sender=Course.tags.through, dispatch_uid='courses.search.course_tags')
+    post_save.connect(_taxonomy_saved('tags'), sender=Tag, dispatch_uid='courses.search.tag_saved', weak=False)
+    post_save.connect(_taxonomy_saved('department'), sender=Department, dispatch_uid='courses.search.department_saved', weak=False)
+    post_save.connect(_taxonomy_saved('specialization'), sender=Specialization, dispatch_uid='courses.search.specialization_saved', weak=False)
+    post_save.connect(_taxonomy_saved('subspecialization'), sender=SubSpecialization, dispatch_uid='courses.search.subspecialization_saved', weak=False)
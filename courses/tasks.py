@@ -0,0 +1,64 @@
+from celery import shared_task
+
+from eduvanta.images import generate_derivatives
+
+from .cloning import clone_and_notify
+from .drafts import flush_draft
+from .enrollment import promote_waitlist
+from .moderation import notify_course_moderation
+from .recommendations import precompute_recommendations, refresh_student_recommendations
+from .schedule import precompute_unlocks, release_due
+
+
+@shared_task
+def refresh_student_recommendations_task(student_id):
+    """Recompute one student's recommendations after an interest/enrollment change."""
+    return len(refresh_student_recommendations(student_id))
+
+
+@shared_task
+def precompute_recommendations_task():
+    """Nightly batch rebuild of every student's recommendations."""
+    return precompute_recommendations()
+
+
+@shared_task
+def generate_image_derivatives_task(source_name, kind):
+    """Resize/WebP-encode an uploaded image (course thumbnail, avatar) into its derivatives."""
+    return generate_derivatives(source_name, kind).get('digest')
+
+
+@shared_task
+def notify_course_moderation_task(course_ids, action, reason=''):
+    """Notification + email fan-out to instructors after a bulk approve/reject."""
+    return notify_course_moderation(course_ids, action, reason)
+
+
+@shared_task
+def flush_course_draft_task(draft_id):
+    """Write a draft's coalesced autosave buffer to the database."""
+    return flush_draft(draft_id)
+
+
+@shared_task
+def clone_course_task(course_id, user_id, title=None, target='course'):
+    """Deep-clone a large course (or copy it into a draft) and notify the user."""
+    return clone_and_notify(course_id, user_id, title, target)
+
+
+@shared_task
+def promote_waitlist_task(course_id):
+    """Fill a course's free seats from its waitlist."""
+    return len(promote_waitlist(course_id))
+
+
+@shared_task
+def refresh_unlocks_task(course_id):
+    """Recompute a drip course's unlock times after its structure or schedule changed."""
+    return precompute_unlocks(course_id)
+
+
+@shared_task
+def release_due_task():
+    """Beat job: publish scheduled courses and release due drip lessons."""
+    return release_due()
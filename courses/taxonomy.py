@@ -0,0 +1,291 @@
+"""Process-wide, read-only taxonomy tree.
+
+Departments, programs, specializations and subspecializations are small, seeded
+by ``seed_learning_areas`` and rarely edited, yet profile setup, the course
+wizard and the catalog keep re-reading them. ``get_taxonomy()`` returns an
+immutable tree with id/code/slug indexes and parent/child links, so lookups and
+cascading-select JSON cost no queries.
+
+The tree is rebuilt (four queries) only when the version stamp in the cache
+differs from the one it was built under; saves and deletes on any taxonomy
+model bump the stamp on commit. The stamp is only shared between processes
+when the default cache is (Redis in ``settings.CACHES``; see
+``eduvanta.cache``). With a per-process cache, other workers keep serving
+their old tree.
+"""
+import json
+import threading
+from dataclasses import dataclass, field
+from types import MappingProxyType
+
+from django import forms
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.forms.models import ModelChoiceIterator, ModelChoiceIteratorValue
+
+VERSION_KEY = 'courses:taxonomy:version'
+
+
+@dataclass(frozen=True)
+class SubSpecializationNode:
+    id: int
+    name: str
+    code: str
+    description: str
+    order: int
+    specialization_id: int
+
+    def __str__(self):
+        return self.name
+
+
+@dataclass(frozen=True)
+class SpecializationNode:
+    id: int
+    name: str
+    slug: str
+    description: str
+    level: str
+    department_id: int
+    sub_specializations: tuple = field(default=(), repr=False)
+
+    def __str__(self):
+        return self.name
+
+
+@dataclass(frozen=True)
+class ProgramNode:
+    id: int
+    name: str
+    code: str
+    level: str
+    duration: str
+    order: int
+    department_id: int
+
+    def __str__(self):
+        return self.name
+
+
+@dataclass(frozen=True)
+class DepartmentNode:
+    id: int
+    name: str
+    code: str
+    description: str
+    order: int
+    programs: tuple = field(default=(), repr=False)
+    specializations: tuple = field(default=(), repr=False)
+
+    def __str__(self):
+        return self.name
+
+
+class Taxonomy:
+    """Immutable snapshot of the taxonomy tables; build with ``Taxonomy.load()``."""
+
+    def __init__(self, departments, version=None):
+        self.version = version
+        self.departments = tuple(departments)
+        self.programs = tuple(p for d in self.departments for p in d.programs)
+        self.specializations = tuple(s for d in self.departments for s in d.specializations)
+        self.sub_specializations = tuple(ss for s in self.specializations for ss in s.sub_specializations)
+        self._by_id = MappingProxyType({
+            'department': MappingProxyType({d.id: d for d in self.departments}),
+            'program': MappingProxyType({p.id: p for p in self.programs}),
+            'specialization': MappingProxyType({s.id: s for s in self.specializations}),
+            'subspecialization': MappingProxyType({ss.id: ss for ss in self.sub_specializations}),
+        })
+        self._department_by_code = MappingProxyType({d.code: d for d in self.departments})
+        self._specialization_by_slug = MappingProxyType({s.slug: s for s in self.specializations})
+        self._json = None
+
+    @classmethod
+    def load(cls, version=None):
+        from .models import Department, Program, Specialization, SubSpecialization
+
+        subs = {}
+        for row in SubSpecialization.objects.order_by('order', 'name').values_list(
+            'id', 'name', 'code', 'description', 'order', 'specialization_id'
+        ):
+            subs.setdefault(row[5], []).append(SubSpecializationNode(*row[:2], row[2] or '', *row[3:]))
+        specs = {}
+        for row in Specialization.objects.order_by('pk').values_list(
+            'id', 'name', 'slug', 'description', 'level', 'department_id'
+        ):
+            specs.setdefault(row[5], []).append(SpecializationNode(*row, sub_specializations=tuple(subs.get(row[0], ()))))
+        programs = {}
+        for row in Program.objects.order_by('order', 'name').values_list(
+            'id', 'name', 'code', 'level', 'duration', 'order', 'department_id'
+        ):
+            programs.setdefault(row[6], []).append(ProgramNode(row[0], row[1], row[2] or '', row[3] or '', row[4] or '', *row[5:]))
+        departments = [
+            DepartmentNode(*row, programs=tuple(programs.get(row[0], ())), specializations=tuple(specs.get(row[0], ())))
+            for row in Department.objects.order_by('order', 'name').values_list('id', 'name', 'code', 'description', 'order')
+        ]
+        return cls(departments, version=version)
+
+    def all(self, kind):
+        """All nodes of `kind` ('department', 'program', 'specialization', 'subspecialization')."""
+        return tuple(self._by_id[kind].values())
+
+    def get(self, kind, node_id):
+        try:
+            return self._by_id[kind].get(int(node_id))
+        except (TypeError, ValueError):
+            return None
+
+    def department(self, node_id):
+        return self.get('department', node_id)
+
+    def specialization(self, node_id):
+        return self.get('specialization', node_id)
+
+    def subspecialization(self, node_id):
+        return self.get('subspecialization', node_id)
+
+    def program(self, node_id):
+        return self.get('program', node_id)
+
+    def department_by_code(self, code):
+        return self._department_by_code.get(code)
+
+    def specialization_by_slug(self, slug):
+        return self._specialization_by_slug.get(slug)
+
+    def parent(self, node):
+        """Department of a program/specialization, specialization of a subspecialization."""
+        if isinstance(node, SubSpecializationNode):
+            return self.specialization(node.specialization_id)
+        if isinstance(node, (SpecializationNode, ProgramNode)):
+            return self.department(node.department_id)
+        return None
+
+    def path(self, node):
+        """Root-first chain of nodes ending at `node`."""
+        chain = []
+        while node is not None:
+            chain.append(node)
+            node = self.parent(node)
+        return chain[::-1]
+
+    def as_dict(self):
+        return {
+            'version': self.version,
+            'departments': [
+                {
+                    'id': d.id, 'name': d.name, 'code': d.code,
+                    'programs': [{'id': p.id, 'name': p.name, 'code': p.code, 'level': p.level} for p in d.programs],
+                    'specializations': [
+                        {
+                            'id': s.id, 'name': s.name, 'slug': s.slug, 'level': s.level,
+                            'sub_specializations': [{'id': ss.id, 'name': ss.name, 'code': ss.code} for ss in s.sub_specializations],
+                        }
+                        for s in d.specializations
+                    ],
+                }
+                for d in self.departments
+            ],
+        }
+
+    def to_json(self):
+        """Serialized tree for the cascading selects; computed once per snapshot."""
+        if self._json is None:
+            self._json = json.dumps(self.as_dict(), separators=(',', ':'))
+        return self._json
+
+
+_lock = threading.Lock()
+_current = None
+
+
+def _version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(VERSION_KEY, version, None)
+    return version
+
+
+def get_taxonomy():
+    """The current taxonomy tree; rebuilt only after the version stamp moves."""
+    global _current
+    version = _version()
+    tree = _current
+    if tree is not None and tree.version == version:
+        return tree
+    with _lock:
+        if _current is None or _current.version != version:
+            _current = Taxonomy.load(version=version)
+        return _current
+
+
+def invalidate_taxonomy():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+
+
+def _taxonomy_changed(sender, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(invalidate_taxonomy)
+
+
+def connect_signals():
+    from .models import Department, Program, Specialization, SubSpecialization
+    for model in (Department, Program, Specialization, SubSpecialization):
+        label = model._meta.model_name
+        post_save.connect(_taxonomy_changed, sender=model, dispatch_uid=f'courses.taxonomy.{label}_saved')
+        post_delete.connect(_taxonomy_changed, sender=model, dispatch_uid=f'courses.taxonomy.{label}_deleted')
+
+
+class TaxonomyChoiceIterator(ModelChoiceIterator):
+    """Renders choices from the in-memory tree instead of querying the table."""
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for node in self.field.taxonomy_nodes():
+            yield self.choice(node)
+
+    def __len__(self):
+        return len(self.field.taxonomy_nodes()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.taxonomy_nodes())
+
+    def choice(self, node):
+        return (ModelChoiceIteratorValue(node.id, node), self.field.label_from_instance(node))
+
+
+class TaxonomyChoiceField(forms.ModelChoiceField):
+    """ModelChoiceField whose options come from ``get_taxonomy()``.
+
+    Rendering an unfiltered field costs no queries. A narrowed queryset (say,
+    one department's specializations) costs one id query, and only its nodes
+    are offered. The submitted id is still validated (and cleaned to a model
+    instance) against the queryset.
+    """
+    iterator = TaxonomyChoiceIterator
+
+    def __init__(self, kind, queryset, **kwargs):
+        self.kind = kind
+        self._allowed = (None, None)
+        super().__init__(queryset=queryset, **kwargs)
+
+    def _allowed_ids(self):
+        queryset = self.queryset
+        if queryset is None or not (queryset.query.where or queryset.query.is_sliced):
+            return None
+        if self._allowed[0] is not queryset:
+            self._allowed = (queryset, frozenset(queryset.values_list('pk', flat=True)))
+        return self._allowed[1]
+
+    def taxonomy_nodes(self):
+        nodes = get_taxonomy().all(self.kind)
+        allowed = self._allowed_ids()
+        if allowed is None:
+            return nodes
+        return [node for node in nodes if node.id in allowed]
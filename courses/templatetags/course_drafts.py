@@ -0,0 +1,11 @@
+from django import template
+
+from courses.drafts import draft_state as _draft_state
+
+register = template.Library()
+
+
+@register.simple_tag
+def draft_state(draft):
+    """{% draft_state draft as state %}: {revision, data} including edits not yet flushed."""
+    return _draft_state(draft.pk)
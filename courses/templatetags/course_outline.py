@@ -0,0 +1,25 @@
+from django import template
+
+from courses.outline import get_outline_snapshot, outline_snapshots, render_course_outline
+
+register = template.Library()
+
+
+@register.simple_tag
+def course_outline(course):
+    """{% course_outline course %}: the cached curriculum HTML, rendered from the outline snapshot."""
+    return render_course_outline(course.pk)
+
+
+@register.simple_tag
+def course_outline_snapshot(course):
+    """{% course_outline_snapshot course as outline %}: counts and modules without touching structure tables."""
+    return get_outline_snapshot(course.pk)
+
+
+@register.simple_tag
+def enrollment_outlines(enrollments):
+    """{% enrollment_outlines enrollments as rows %}: (enrollment, snapshot) pairs from one query."""
+    enrollments = list(enrollments)
+    snapshots = outline_snapshots(e.course_id for e in enrollments)
+    return [(e, snapshots.get(e.course_id)) for e in enrollments]
@@ -0,0 +1,13 @@
+from django import template
+
+from courses.recommendations import recommended_courses as _recommended_courses
+
+register = template.Library()
+
+
+@register.simple_tag
+def recommended_courses(user, limit=6):
+    """{% recommended_courses request.user as recs %}: the user's cached top courses."""
+    if not getattr(user, 'is_authenticated', False):
+        return []
+    return _recommended_courses(user.pk, limit=limit)
@@ -0,0 +1,12 @@
+from django import template
+
+from eduvanta.images import derivative_url as _derivative_url
+
+register = template.Library()
+
+
+@register.filter
+def derivative_url(field_file, spec='md'):
+    """{{ course.thumbnail|derivative_url:'md' }} or 'md.webp'; falls back to the original."""
+    size, _, fmt = (spec or 'md').partition('.')
+    return _derivative_url(field_file, size=size, fmt=fmt or None)
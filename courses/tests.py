@@ -0,0 +1,103 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from courses.draft_history import CourseDraftRevision, revision_data, undo_draft
+from courses.drafts import BUFFER_KEY, StaleRevision, apply_draft_patch, draft_state, flush_draft
+from courses.models import CourseDraft
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class DraftTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        owner = get_user_model().objects.create_user('teacher', 'teacher@example.com', 'pw', role='teacher')
+        self.draft = CourseDraft.objects.create(owner=owner, data={'basic': {'title': 'Intro'}})
+
+    def patch(self, base_revision, title, step=None):
+        return apply_draft_patch(self.draft.pk, base_revision, [{'op': 'replace', 'path': '/basic/title', 'value': title}], step)
+
+    def stored(self):
+        self.draft.refresh_from_db()
+        return self.draft.data['basic']['title'], self.draft.head.revision
+
+
+class WriteThroughDraftTests(DraftTestCase):
+    """DraftTestCase uses a per-process cache, so every delta is written through."""
+
+    def test_each_delta_is_stored(self):
+        self.assertEqual(self.patch(0, 'Python'), 1)
+        self.assertEqual(self.stored(), ('Python', 1))
+        self.assertEqual(self.patch(1, 'Python 101', step='structure'), 2)
+        self.assertEqual(self.stored(), ('Python 101', 2))
+        self.assertEqual(self.draft.last_step, 'structure')
+        self.assertEqual(revision_data(self.draft.pk, 1)['basic']['title'], 'Python')
+
+    def test_stale_revision_is_rejected(self):
+        self.patch(0, 'Python')
+        with self.assertRaises(StaleRevision) as raised:
+            self.patch(0, 'Other')
+        self.assertEqual(raised.exception.state, {'revision': 1, 'data': {'basic': {'title': 'Python'}}})
+        self.assertEqual(self.stored(), ('Python', 1))
+
+    def test_undo(self):
+        self.patch(0, 'Python')
+        self.patch(1, 'Python 101')
+        state = undo_draft(self.draft.pk)
+        self.assertEqual((state['revision'], state['restored_from']), (3, 1))
+        self.assertEqual(self.stored(), ('Python', 3))
+
+
+@mock.patch('courses.drafts.cache_is_shared', return_value=True)
+@mock.patch('courses.drafts._schedule_flush', return_value=True)
+class WriteBackDraftTests(DraftTestCase):
+    def test_first_delta_writes_through_then_buffers(self, schedule_flush, shared):
+        self.patch(0, 'Python')
+        self.assertEqual(self.stored(), ('Python', 1))
+        self.patch(1, 'Python 101')
+        self.patch(2, 'Python 102')
+        schedule_flush.assert_called_once_with(self.draft.pk)
+        self.assertEqual(self.stored(), ('Python', 1))
+        self.assertEqual(draft_state(self.draft.pk)['revision'], 3)
+
+        self.assertEqual(flush_draft(self.draft.pk), 3)
+        self.assertEqual(self.stored(), ('Python 102', 3))
+        self.assertEqual(
+            list(CourseDraftRevision.objects.filter(draft=self.draft).order_by('revision').values_list('revision', flat=True)),
+            [0, 1, 3],
+        )
+        self.assertEqual(revision_data(self.draft.pk, 3)['basic']['title'], 'Python 102')
+
+    def test_stale_revision_sees_buffered_edits(self, schedule_flush, shared):
+        self.patch(0, 'Python')
+        self.patch(1, 'Python 101')
+        with self.assertRaises(StaleRevision) as raised:
+            self.patch(1, 'Other')
+        self.assertEqual(raised.exception.state['revision'], 2)
+        self.assertEqual(raised.exception.state['data']['basic']['title'], 'Python 101')
+
+    def test_flush_of_a_stale_buffer_keeps_the_stored_revision(self, schedule_flush, shared):
+        self.patch(0, 'Python')
+        self.patch(1, 'Python 101')
+        buffered = cache.get(BUFFER_KEY.format(draft_id=self.draft.pk))
+        # Another writer (its lock expired) stores revision 2 first
+        cache.delete(BUFFER_KEY.format(draft_id=self.draft.pk))
+        self.patch(1, 'Other')
+        cache.set(BUFFER_KEY.format(draft_id=self.draft.pk), buffered)
+
+        self.assertEqual(flush_draft(self.draft.pk), 2)
+        self.assertEqual(self.stored(), ('Other', 2))
+        self.assertEqual(revision_data(self.draft.pk, 2)['basic']['title'], 'Other')
+        with self.assertRaises(StaleRevision):
+            self.patch(1, 'Python 102')
+        self.assertEqual(self.patch(2, 'Python 102'), 3)
+
+    def test_flush_without_buffer_returns_stored_revision(self, schedule_flush, shared):
+        self.patch(0, 'Python')
+        cache.clear()
+        self.assertEqual(flush_draft(self.draft.pk), 1)
+        # A reloaded buffer starts from the stored revision and writes the next delta through
+        self.patch(1, 'Python 101')
+        self.assertEqual(self.stored(), ('Python 101', 2))
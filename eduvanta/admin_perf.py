@@ -0,0 +1,147 @@
+"""Admin changelist helpers for very large tables.
+
+- EstimatedCountPaginator: uses planner statistics instead of COUNT(*) for
+  unfiltered changelists on big tables, and a capped count when filtered.
+- SeekPaginator: for pk-ordered changelists, locates the first key of a deep
+  page with an index-only scan and then seeks with ``pk <= key`` rather than
+  materialising OFFSET rows.
+- LargeTableAdminMixin: wires both in, disables the extra full-result count and
+  replaces LIKE '%term%' scans with index-friendly prefix searches.
+"""
+from django.conf import settings
+from django.contrib import messages
+from django.core.paginator import Paginator
+from django.db import connections, router
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.text import smart_split, unescape_string_literal
+
+# Tables estimated above this many rows switch to estimated/capped counts
+LARGE_TABLE_THRESHOLD = getattr(settings, 'ADMIN_LARGE_TABLE_THRESHOLD', 100000)
+# Filtered changelists on large tables count at most this many rows
+CAPPED_COUNT_LIMIT = getattr(settings, 'ADMIN_CAPPED_COUNT_LIMIT', 10000)
+# Related-object ids resolved per prefix search term
+RELATED_SEARCH_LIMIT = 1000
+
+
+def estimated_table_count(model):
+    """Cheap row estimate for the model's table, or None if unavailable."""
+    connection = connections[router.db_for_read(model)]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            elif connection.vendor == 'mysql':
+                cursor.execute(
+                    "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+                    [table],
+                )
+            elif connection.vendor == 'sqlite':
+                # Max rowid is an index lookup; it over-counts only after deletes
+                cursor.execute(f"SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}")
+            else:
+                return None
+            row = cursor.fetchone()
+    except Exception:
+        return None
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        estimate = estimated_table_count(qs.model)
+        if estimate is None or estimate < LARGE_TABLE_THRESHOLD:
+            return super().count
+        if not qs.query.where:
+            return estimate
+        # Keep the cap above one page so the changelist still paginates
+        limit = max(CAPPED_COUNT_LIMIT, self.per_page + 1)
+        return qs.order_by().values('pk')[:limit].count()
+
+
+class SeekPaginator(EstimatedCountPaginator):
+    # Pages shallower than this many rows just use LIMIT/OFFSET
+    seek_threshold = 1000
+
+    def _pk_direction(self):
+        order_by = list(self.object_list.query.order_by)
+        if len(order_by) != 1:
+            return None
+        pk_name = self.object_list.model._meta.pk.name
+        if order_by[0] in ('pk', pk_name):
+            return 'asc'
+        if order_by[0] in ('-pk', f'-{pk_name}'):
+            return 'desc'
+        return None
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        direction = self._pk_direction()
+        if bottom < self.seek_threshold or direction is None:
+            return super().page(number)
+        qs = self.object_list
+        anchor = list(qs.values_list('pk', flat=True)[bottom:bottom + 1])
+        if not anchor:
+            return self._get_page(qs.none(), number, self)
+        lookup = 'pk__lte' if direction == 'desc' else 'pk__gte'
+        return self._get_page(qs.filter(**{lookup: anchor[0]})[:self.per_page], number, self)
+
+
+class LargeTableAdminMixin:
+    """ModelAdmin mixin for changelists over multi-million-row tables.
+
+    ``prefix_search_fields`` are local columns matched with istartswith (served
+    by the UPPER(...) pattern indexes on Postgres). ``related_prefix_search``
+    maps a foreign key, or a chain of them such as ``invite__parent``, to fields
+    on its target; matching target ids are resolved first and the changelist is
+    filtered by the indexed FK column. As with ``search_fields``, the term is
+    split into words (quotes keep phrases together) and every word must match
+    one of the fields.
+    """
+    paginator = SeekPaginator
+    show_full_result_count = False
+    prefix_search_fields = ()
+    related_prefix_search = {}
+
+    def _related_model(self, path):
+        model = self.model
+        for name in path.split('__'):
+            model = model._meta.get_field(name).related_model
+        return model
+
+    def get_search_results(self, request, queryset, search_term):
+        term = (search_term or '').strip()
+        if not term or not (self.prefix_search_fields or self.related_prefix_search):
+            return super().get_search_results(request, queryset, search_term)
+        for word in smart_split(term):
+            if word.startswith(('"', "'")) and word[0] == word[-1]:
+                word = unescape_string_literal(word)
+            condition = Q()
+            for field in self.prefix_search_fields:
+                condition |= Q(**{f'{field}__istartswith': word})
+            for path, fields in self.related_prefix_search.items():
+                related = self._related_model(path)
+                match = Q()
+                for field in fields:
+                    match |= Q(**{f'{field}__istartswith': word})
+                ids = list(related._default_manager.filter(match).values_list('pk', flat=True)[:RELATED_SEARCH_LIMIT + 1])
+                if len(ids) > RELATED_SEARCH_LIMIT:
+                    ids = ids[:RELATED_SEARCH_LIMIT]
+                    messages.warning(request, (
+                        f'"{word}" matches more than {RELATED_SEARCH_LIMIT} '
+                        f'{related._meta.verbose_name_plural}; only the first {RELATED_SEARCH_LIMIT} were searched. '
+                        f'Use a longer search term.'
+                    ))
+                if ids:
+                    condition |= Q(**{f'{path}__in': ids})
+            if not condition:
+                return queryset.none(), False
+            queryset = queryset.filter(condition)
+        return queryset, False
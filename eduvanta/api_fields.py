@@ -0,0 +1,206 @@
+"""Sparse fieldsets (?fields=), relation expansion (?expand=) and a fast list path.
+
+``?fields=id,title`` limits both the JSON and the SQL: detail/write paths load
+with ``only()``, list paths read ``values()`` rows. ``?expand=category``
+replaces a foreign-key id with a small nested object from ``expandable_fields``,
+fetched in the same query through a join.
+
+With ``fast_list = True``, list endpoints skip serializer instances entirely.
+Rows from ``values()`` are converted by per-field functions that produce the
+same output as DRF's ModelSerializer for plain model fields. Use it only on
+viewsets whose serializer is a plain ModelSerializer with no custom or
+method fields.
+"""
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import UUID
+
+from django.db import models
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+
+def _iso_datetime(value):
+    if value is None:
+        return None
+    text = value.isoformat()
+    return text[:-6] + 'Z' if text.endswith('+00:00') else text
+
+
+def _plain(value):
+    return value
+
+
+def _to_str(value):
+    return None if value is None else str(value)
+
+
+def _iso(value):
+    return None if value is None else value.isoformat()
+
+
+def field_converter(field):
+    """Python value -> JSON value, matching DRF's default field for `field`."""
+    if isinstance(field, models.DateTimeField):
+        return _iso_datetime
+    if isinstance(field, (models.DateField, models.TimeField)):
+        return _iso
+    if isinstance(field, (models.DecimalField, models.UUIDField)):
+        return _to_str
+    return _plain
+
+
+def convert(value):
+    """Best-effort conversion for values of unknown fields (expanded relations)."""
+    if isinstance(value, datetime):
+        return _iso_datetime(value)
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    return value
+
+
+def parse_list_param(request, name):
+    raw = request.query_params.get(name, '') if request is not None else ''
+    return [part.strip() for part in raw.split(',') if part.strip()]
+
+
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """ModelSerializer that accepts ``fields=[...]`` and ``expand={name: (fields...)}``."""
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        self.expand = kwargs.pop('expand', None) or {}
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        for name, subfields in self.expand.items():
+            if name in data:
+                related = getattr(instance, name)
+                data[name] = None if related is None else {f: convert(getattr(related, f)) for f in subfields}
+        return data
+
+
+class SparseFieldsMixin:
+    """ViewSet mixin adding ?fields= / ?expand= and an optional values() list path.
+
+    ``expandable_fields`` maps a foreign key to the related fields exposed when
+    it is expanded; ``fast_list`` enables the serializer-free list path.
+    """
+    expandable_fields = {}
+    fast_list = False
+
+    def _serializer_field_names(self):
+        serializer_class = self.get_serializer_class()
+        return list(serializer_class(context=self.get_serializer_context()).fields)
+
+    def requested_fields(self):
+        if not hasattr(self, '_requested_fields'):
+            available = self._serializer_field_names()
+            requested = parse_list_param(self.request, 'fields')
+            unknown = sorted(set(requested) - set(available))
+            if unknown:
+                raise ValidationError({'fields': f"Unknown field(s): {', '.join(unknown)}"})
+            self._requested_fields = [name for name in available if not requested or name in requested]
+        return self._requested_fields
+
+    def requested_expand(self):
+        if not hasattr(self, '_requested_expand'):
+            requested = parse_list_param(self.request, 'expand')
+            unknown = sorted(set(requested) - set(self.expandable_fields))
+            if unknown:
+                raise ValidationError({'expand': f"Cannot expand: {', '.join(unknown)}"})
+            fields = self.requested_fields()
+            self._requested_expand = {name: self.expandable_fields[name] for name in requested if name in fields}
+        return self._requested_expand
+
+    def _sparse_request(self):
+        return self.request is not None and self.request.method == 'GET'
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not self._sparse_request():
+            return queryset
+        model = queryset.model
+        concrete = {f.name: f for f in model._meta.concrete_fields}
+        expand = self.requested_expand()
+        load = {model._meta.pk.name}
+        load.update(f.lstrip('-') for f in queryset.query.order_by if f.lstrip('-') in concrete)
+        for name in self.requested_fields():
+            if name in concrete:
+                load.add(name)
+        related = []
+        for name, subfields in expand.items():
+            related.append(name)
+            load.update(f'{name}__{f}' for f in subfields)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*load)
+
+    def get_serializer(self, *args, **kwargs):
+        if self._sparse_request():
+            kwargs.setdefault('fields', self.requested_fields())
+            kwargs.setdefault('expand', self.requested_expand())
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        if not self.fast_list:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = FastRowSerializer(queryset.model, self.requested_fields(), self.requested_expand())
+        values = rows.values(queryset)
+        page = self.paginate_queryset(values)
+        if page is not None:
+            return self.get_paginated_response(rows.serialize(page))
+        return Response(rows.serialize(values))
+
+
+class FastRowSerializer:
+    """Read-only serializer over ``values()`` rows; no Field instances per row.
+
+    Local fields use their column (``category_id`` is emitted as ``category``,
+    like ModelSerializer); expanded relations become nested dicts. Output keys
+    keep the serializer's field order.
+    """
+
+    def __init__(self, model, fields, expand=None):
+        expand = expand or {}
+        concrete = {f.name: f for f in model._meta.concrete_fields}
+        # (output name, values() key, converter, nested [(subfield, values() key)] or None)
+        self.entries = []
+        for name in fields:
+            field = concrete.get(name)
+            if field is None:
+                continue
+            if name in expand:
+                self.entries.append((name, field.attname, None, [(f, f'{name}__{f}') for f in expand[name]]))
+            else:
+                self.entries.append((name, field.attname, field_converter(field), None))
+
+    def values(self, queryset):
+        keys = set()
+        for _, key, _, subs in self.entries:
+            keys.add(key)
+            keys.update(sub_key for _, sub_key in subs or ())
+        # Cursor pagination reads its position from the ordering columns
+        keys.update(f.lstrip('-') for f in queryset.query.order_by if f.lstrip('-') != 'pk')
+        return queryset.values(*sorted(keys))
+
+    def serialize(self, rows):
+        entries = self.entries
+        out = []
+        for row in rows:
+            item = {}
+            for name, key, conv, subs in entries:
+                if subs is None:
+                    item[name] = conv(row[key])
+                else:
+                    item[name] = None if row[key] is None else {f: convert(row[sub_key]) for f, sub_key in subs}
+            out.append(item)
+        return out
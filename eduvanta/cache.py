@@ -0,0 +1,34 @@
+"""Checks that the default cache is shared between processes.
+
+Change stamps (``eduvanta.conditional``), facet, taxonomy and outline
+versions, recommendations, image manifests and the course draft autosave
+buffer are written by one process and read by others: a web worker saves,
+a Celery worker rebuilds, and every worker serves. With a per-process cache
+(LocMemCache, the Django default) those writes are never seen elsewhere.
+Stale ETags would then get 304s indefinitely, and drafts would lose edits.
+``settings.CACHES`` must point at a shared backend such as Redis.
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_is_shared(alias='default'):
+    """True unless `alias` is a per-process (or dummy) cache."""
+    return settings.CACHES.get(alias, {}).get('BACKEND') not in PROCESS_LOCAL_BACKENDS
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if cache_is_shared():
+        return []
+    return [Warning(
+        'The default cache is local to each process.',
+        hint='Set CACHE_URL to a Redis URL. Otherwise ETags, facet counts and outlines go stale '
+             'across workers, and course drafts are written through on every autosave.',
+        id='eduvanta.W001',
+    )]
@@ -0,0 +1,116 @@
+"""Conditional GET (ETag / Last-Modified) from change stamps, not response bodies.
+
+Each content group ('courses', 'announcements', ...) has a stamp in the cache.
+The stamp is the time of the last committed save/delete on any model tracked
+for that group. Validators come from the stamps plus the request path/query
+string, so a matching If-None-Match / If-Modified-Since is answered with 304
+before any query or serializer runs.
+
+Stamps are bumped by whichever process commits the change and read by every
+web worker. They therefore need the shared default cache (Redis in
+``settings.CACHES``; see ``eduvanta.cache``). With a per-process cache, other
+workers keep their old stamp and answer 304 for content that has changed.
+
+Writes that bypass signals (``update()``, ``bulk_create``) should call
+``touch(group)``.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+STAMP_KEY = 'conditional:stamp:{group}'
+
+
+def group_stamp(group):
+    """Nanosecond time of the group's last change (initialised to now on first use)."""
+    key = STAMP_KEY.format(group=group)
+    stamp = cache.get(key)
+    if stamp is None:
+        cache.add(key, time.time_ns(), None)
+        stamp = cache.get(key)
+    return stamp
+
+
+def touch(*groups):
+    now = time.time_ns()
+    cache.set_many({STAMP_KEY.format(group=group): now for group in groups}, None)
+
+
+def track(group, *senders):
+    """Bump `group`'s stamp after commit on save/delete/m2m changes of `senders`."""
+    def changed(sender, raw=False, action=None, **kwargs):
+        if raw or (action is not None and not action.startswith('post_')):
+            return
+        transaction.on_commit(lambda: touch(group))
+
+    for sender in senders:
+        label = sender._meta.label_lower
+        uid = f'conditional.{group}.{label}'
+        post_save.connect(changed, sender=sender, weak=False, dispatch_uid=f'{uid}.saved')
+        post_delete.connect(changed, sender=sender, weak=False, dispatch_uid=f'{uid}.deleted')
+        m2m_changed.connect(changed, sender=sender, weak=False, dispatch_uid=f'{uid}.m2m')
+
+
+def validators(request, groups, extra=''):
+    """(etag, last_modified epoch seconds) for `request` under `groups`."""
+    stamps = [group_stamp(group) for group in groups]
+    raw = f"{','.join(groups)}:{','.join(map(str, stamps))}:{request.get_full_path()}:{extra}"
+    etag = f'W/"{hashlib.sha1(raw.encode()).hexdigest()[:24]}"'
+    return etag, max(stamps) // 1_000_000_000
+
+
+def not_modified(request, etag, last_modified):
+    """A 304 (or 412) response if the client's validators still match, else None."""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def set_validators(response, etag, last_modified):
+    if response.status_code == 200:
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # Revalidate every time; a match costs only the stamp lookup
+        response.setdefault('Cache-Control', 'private, no-cache')
+    return response
+
+
+def conditional_on(*groups, extra=None):
+    """Decorator for GET views whose output depends only on `groups` and the URL.
+
+    `extra(request)` can add per-request state (e.g. user role) to the ETag.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            etag, last_modified = validators(request, groups, extra(request) if extra else '')
+            response = not_modified(request, etag, last_modified)
+            if response is None:
+                response = set_validators(view(request, *args, **kwargs), etag, last_modified)
+            return response
+        return wrapped
+    return decorator
+
+
+class ConditionalGetMixin:
+    """ViewSet mixin: ETag/Last-Modified on list/retrieve from ``conditional_groups``."""
+    conditional_groups = ()
+
+    def _conditional(self, handler, request, *args, **kwargs):
+        etag, last_modified = validators(request, self.conditional_groups)
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+        return set_validators(handler(request, *args, **kwargs), etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(super().retrieve, request, *args, **kwargs)
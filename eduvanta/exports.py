@@ -0,0 +1,70 @@
+"""Streaming CSV exports for admin views and actions.
+
+Rows are pulled with ``values_list(...).iterator()`` (a server-side cursor on
+Postgres, chunked fetches elsewhere) and written straight into a
+StreamingHttpResponse, so memory stays flat no matter how many rows are exported.
+"""
+import csv
+from datetime import date, datetime
+
+from django.http import StreamingHttpResponse
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """File-like object whose write() just hands the encoded line back to csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, str):
+        return value.replace('\n', ' ').replace('\r', ' ')
+    return value
+
+
+def iter_rows(queryset, fields, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield plain tuples for `fields` without instantiating model objects."""
+    return queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+
+
+def iter_csv_lines(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([_cell(v) for v in row])
+
+
+def streaming_csv_response(filename, header, rows):
+    response = StreamingHttpResponse(iter_csv_lines(header, rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def export_queryset_csv(queryset, fields, filename, header=None):
+    """Stream `queryset` as CSV with one column per field path in `fields`."""
+    return streaming_csv_response(filename, header or list(fields), iter_rows(queryset, fields))
+
+
+class CsvExportAdminMixin:
+    """Adds an ``export_csv`` admin action driven by ``csv_export_fields``.
+
+    Add "export_csv" to the admin's ``actions`` to expose it; the action streams
+    the selected (or select-across filtered) rows.
+    """
+    csv_export_fields = ()
+    csv_export_filename = None
+
+    def export_csv(self, request, queryset):
+        fields = self.csv_export_fields or ('pk',)
+        filename = self.csv_export_filename or f"{self.model._meta.model_name}_export.csv"
+        return export_queryset_csv(queryset.order_by('pk'), fields, filename)
+    export_csv.short_description = "Export selected as CSV"
@@ -0,0 +1,161 @@
+"""Resized/WebP derivatives for uploaded images (course thumbnails, avatars).
+
+After an upload commits, a Celery task reads the original once and writes
+fixed-size crops in the original family (JPEG, or PNG when there is
+transparency) plus WebP. Files are stored content-addressed under
+``derivatives/<digest[:2]>/<digest>/<size>.<ext>``. Re-uploads of the same
+bytes reuse existing files, and URLs change whenever the content does, so
+they can be cached forever.
+
+A small manifest per source file ({size: {format: path}}) is kept in the
+cache and mirrored to storage next to the derivatives. ``derivative_url``
+resolves a size with one cache read and falls back to the original until
+the derivatives exist. Storage is the source of truth. The worker's cache
+write only reaches web processes through a shared cache, so cached entries
+expire and get re-read from storage: misses after ``MANIFEST_MISS_TTL``,
+manifests after ``MANIFEST_TTL``.
+"""
+import hashlib
+import io
+import json
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import post_init, post_save
+
+# kind -> size name -> (width, height); images are cropped to fill the box
+DERIVATIVE_SPECS = {
+    'course_thumbnail': {'sm': (400, 225), 'md': (800, 450), 'lg': (1280, 720)},
+    'avatar': {'sm': (40, 40), 'md': (96, 96), 'lg': (256, 256)},
+}
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+DERIVATIVE_ROOT = 'derivatives'
+MANIFEST_KEY = 'images:manifest:{name_hash}'
+MANIFEST_TTL = 60 * 60
+# Short, so new derivatives show up soon after the worker finishes
+MANIFEST_MISS_TTL = 60
+
+
+def _name_hash(source_name):
+    return hashlib.sha1(source_name.encode()).hexdigest()
+
+
+def _manifest_path(source_name):
+    return f'{DERIVATIVE_ROOT}/manifests/{_name_hash(source_name)}.json'
+
+
+def get_manifest(source_name):
+    key = MANIFEST_KEY.format(name_hash=_name_hash(source_name))
+    manifest = cache.get(key)
+    if manifest is None:
+        path = _manifest_path(source_name)
+        manifest = {}
+        if default_storage.exists(path):
+            with default_storage.open(path) as fh:
+                manifest = json.loads(fh.read())
+        # Cache misses too, so pages don't stat storage for unprocessed images
+        cache.set(key, manifest, MANIFEST_TTL if manifest else MANIFEST_MISS_TTL)
+    return manifest
+
+
+def _save_manifest(source_name, manifest):
+    path = _manifest_path(source_name)
+    if default_storage.exists(path):
+        default_storage.delete(path)
+    default_storage.save(path, ContentFile(json.dumps(manifest).encode()))
+    cache.set(MANIFEST_KEY.format(name_hash=_name_hash(source_name)), manifest, MANIFEST_TTL)
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    if fmt == 'webp':
+        image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+    elif fmt == 'png':
+        image.save(buffer, 'PNG', optimize=True)
+    else:
+        image.convert('RGB').save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def generate_derivatives(source_name, kind):
+    """Create every size of `kind` for the stored file `source_name`; returns the manifest."""
+    from PIL import Image, ImageOps
+
+    with default_storage.open(source_name) as fh:
+        data = fh.read()
+    digest = hashlib.sha256(data).hexdigest()
+    manifest = get_manifest(source_name)
+    if manifest.get('digest') == digest:
+        return manifest
+
+    with Image.open(io.BytesIO(data)) as original:
+        original = ImageOps.exif_transpose(original)
+        has_alpha = original.mode in ('RGBA', 'LA') or (original.mode == 'P' and 'transparency' in original.info)
+        base = original.convert('RGBA' if has_alpha else 'RGB')
+    family = 'png' if has_alpha else 'jpg'
+
+    variants = {}
+    for size, box in DERIVATIVE_SPECS[kind].items():
+        resized = ImageOps.fit(base, box, method=Image.LANCZOS)
+        variants[size] = {}
+        for fmt in (family, 'webp'):
+            path = f'{DERIVATIVE_ROOT}/{digest[:2]}/{digest}/{size}.{fmt}'
+            if not default_storage.exists(path):
+                default_storage.save(path, ContentFile(_encode(resized, fmt)))
+            variants[size][fmt] = path
+    manifest = {'digest': digest, 'kind': kind, 'variants': variants}
+    _save_manifest(source_name, manifest)
+    return manifest
+
+
+def derivative_url(field_file, size='md', fmt=None):
+    """URL of a derivative of an ImageField file, or the original until one exists.
+
+    `fmt` is 'webp', or None for the JPEG/PNG variant.
+    """
+    if not field_file:
+        return ''
+    variants = get_manifest(field_file.name).get('variants', {}).get(size)
+    if variants:
+        if fmt == 'webp':
+            path = variants.get('webp')
+        else:
+            path = variants.get('jpg') or variants.get('png')
+        if path:
+            return default_storage.url(path)
+    return '' if fmt == 'webp' else field_file.url
+
+
+def schedule_derivatives(source_name, kind):
+    """Generate derivatives after commit: in Celery, or inline without a broker."""
+    def run():
+        from courses.tasks import generate_image_derivatives_task
+        try:
+            generate_image_derivatives_task.delay(source_name, kind)
+        except Exception:
+            generate_derivatives(source_name, kind)
+    transaction.on_commit(run)
+
+
+def connect_image_field(model, field_name, kind):
+    """Queue derivatives whenever `model.<field_name>` gets a new file."""
+    attr = f'_derivative_source_{field_name}'
+
+    def remember(sender, instance, **kwargs):
+        value = instance.__dict__.get(field_name)
+        setattr(instance, attr, getattr(value, 'name', value))
+
+    def saved(sender, instance, raw=False, created=False, **kwargs):
+        name = getattr(instance, field_name).name
+        if raw or not name or (not created and name == getattr(instance, attr, None)):
+            return
+        setattr(instance, attr, name)
+        schedule_derivatives(name, kind)
+
+    uid = f'images.{model._meta.label_lower}.{field_name}'
+    post_init.connect(remember, sender=model, weak=False, dispatch_uid=f'{uid}.init')
+    post_save.connect(saved, sender=model, weak=False, dispatch_uid=f'{uid}.saved')
+
@@ -0,0 +1,143 @@
+"""Minimal JSON Patch (RFC 6902) for dict/list documents.
+
+``apply_patch`` supports add, remove, replace, move, copy and test. It returns
+a new document and leaves the input untouched.
+"""
+import copy
+
+
+class JsonPatchError(ValueError):
+    pass
+
+
+def parse_pointer(pointer):
+    """'/a/0/b~1c' -> ['a', '0', 'b/c'] (RFC 6901)."""
+    if pointer == '':
+        return []
+    if not isinstance(pointer, str) or not pointer.startswith('/'):
+        raise JsonPatchError(f'Invalid JSON pointer: {pointer!r}')
+    return [part.replace('~1', '/').replace('~0', '~') for part in pointer[1:].split('/')]
+
+
+def make_pointer(parts):
+    return ''.join('/' + str(part).replace('~', '~0').replace('/', '~1') for part in parts)
+
+
+def _index(container, token, allow_end=False):
+    if token == '-' and allow_end:
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token[0] == '0'):
+        raise JsonPatchError(f'Invalid array index: {token!r}')
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JsonPatchError(f'Array index out of range: {token}')
+    return index
+
+
+def _resolve(doc, parts):
+    node = doc
+    for token in parts:
+        if isinstance(node, dict):
+            if token not in node:
+                raise JsonPatchError(f'Path not found: {make_pointer(parts)}')
+            node = node[token]
+        elif isinstance(node, list):
+            node = node[_index(node, token)]
+        else:
+            raise JsonPatchError(f'Path not found: {make_pointer(parts)}')
+    return node
+
+
+def _add(doc, parts, value):
+    if not parts:
+        return value
+    parent = _resolve(doc, parts[:-1])
+    token = parts[-1]
+    if isinstance(parent, dict):
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent.insert(_index(parent, token, allow_end=True), value)
+    else:
+        raise JsonPatchError(f'Cannot add to {make_pointer(parts[:-1])}')
+    return doc
+
+
+def _remove(doc, parts):
+    if not parts:
+        raise JsonPatchError('Cannot remove the document root')
+    parent = _resolve(doc, parts[:-1])
+    token = parts[-1]
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f'Path not found: {make_pointer(parts)}')
+        return parent.pop(token)
+    if isinstance(parent, list):
+        return parent.pop(_index(parent, token))
+    raise JsonPatchError(f'Path not found: {make_pointer(parts)}')
+
+
+def apply_patch(doc, operations):
+    """Apply RFC 6902 `operations` to a copy of `doc`; raises JsonPatchError."""
+    if not isinstance(operations, list):
+        raise JsonPatchError('A patch must be a list of operations')
+    doc = copy.deepcopy(doc)
+    for operation in operations:
+        if not isinstance(operation, dict) or 'op' not in operation or 'path' not in operation:
+            raise JsonPatchError('Each operation needs "op" and "path"')
+        op = operation['op']
+        parts = parse_pointer(operation['path'])
+        if op in ('add', 'replace', 'test') and 'value' not in operation:
+            raise JsonPatchError(f'"{op}" needs a "value"')
+        if op == 'add':
+            doc = _add(doc, parts, copy.deepcopy(operation['value']))
+        elif op == 'remove':
+            _remove(doc, parts)
+        elif op == 'replace':
+            if parts:
+                _resolve(doc, parts)
+                _remove(doc, parts)
+            doc = _add(doc, parts, copy.deepcopy(operation['value']))
+        elif op in ('move', 'copy'):
+            source = parse_pointer(operation.get('from', ''))
+            if op == 'move':
+                if parts[:len(source)] == source and parts != source:
+                    raise JsonPatchError('Cannot move a value into itself')
+                value = _remove(doc, source) if source else doc
+            else:
+                value = copy.deepcopy(_resolve(doc, source))
+            doc = _add(doc, parts, value)
+        elif op == 'test':
+            if _resolve(doc, parts) != operation['value']:
+                raise JsonPatchError(f'Test failed at {operation["path"]}')
+        else:
+            raise JsonPatchError(f'Unknown operation: {op!r}')
+    return doc
+
+
+def make_patch(source, target):
+    """Operations turning `source` into `target`.
+
+    Objects are diffed key by key and equal-length lists element by element;
+    anything else that differs is replaced whole.
+    """
+    operations = []
+    _diff(source, target, [], operations)
+    return operations
+
+
+def _diff(source, target, parts, operations):
+    # Containers are always walked: {'a': 1} == {'a': True} in Python, but not in JSON
+    if isinstance(source, dict) and isinstance(target, dict):
+        for key in source:
+            if key not in target:
+                operations.append({'op': 'remove', 'path': make_pointer(parts + [key])})
+        for key, value in target.items():
+            if key not in source:
+                operations.append({'op': 'add', 'path': make_pointer(parts + [key]), 'value': value})
+            else:
+                _diff(source[key], value, parts + [key], operations)
+    elif isinstance(source, list) and isinstance(target, list) and len(source) == len(target):
+        for index, (old, new) in enumerate(zip(source, target)):
+            _diff(old, new, parts + [index], operations)
+    elif source != target or type(source) is not type(target):
+        operations.append({'op': 'replace', 'path': make_pointer(parts), 'value': target})
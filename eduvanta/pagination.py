@@ -0,0 +1,40 @@
+"""Default REST API pagination.
+
+Cursor (keyset) pagination: each page is a ``WHERE created_at < <cursor>``
+seek instead of an OFFSET, so rows inserted between requests never shift or
+duplicate results. Page 1000 only costs the same as page 1 when the ordering
+is indexed. Announcement.created_at has ``db_index``, and courses_course has
+(created_at, id) from courses migration 0017. Models added to the API need
+the same.
+"""
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.pagination import CursorPagination
+
+API_PAGE_SIZE = getattr(settings, 'API_PAGE_SIZE', 50)
+API_MAX_PAGE_SIZE = getattr(settings, 'API_MAX_PAGE_SIZE', 200)
+
+
+class KeysetCursorPagination(CursorPagination):
+    """Newest-first cursor pagination on (created_at, pk).
+
+    Views can set ``cursor_ordering`` to seek on another stable ordering
+    (which should also be indexed); models without ``created_at`` fall back to ``-pk``. Clients pick
+    a page size with ``?page_size=`` up to API_MAX_PAGE_SIZE.
+    """
+    page_size = API_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = API_MAX_PAGE_SIZE
+    ordering = ('-created_at', '-pk')
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', None)
+        if ordering is None:
+            try:
+                queryset.model._meta.get_field('created_at')
+                ordering = self.ordering
+            except FieldDoesNotExist:
+                ordering = ('-pk',)
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        return tuple(ordering)
@@ -14,6 +14,7 @@ from pathlib import Path
 from datetime import timedelta
 import os
 import dj_database_url
+from celery.schedules import crontab
 try:
     # Load variables from the project .env into process environment
     from dotenv import load_dotenv  # type: ignore
@@ -227,8 +228,13 @@ REST_FRAMEWORK = {
         'anon': '200/day',
         'otp': '5/hour',
     },
+    'DEFAULT_PAGINATION_CLASS': 'eduvanta.pagination.KeysetCursorPagination',
 }
 
+# REST API page sizes (cursor pagination; clients may pass ?page_size=)
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', '50'))
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', '200'))
+
 # SimpleJWT token lifetimes
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),
@@ -249,9 +255,32 @@ CHANNEL_LAYERS = {
     }
 }
 
+# Shared cache. Catalog ETag stamps, facet/taxonomy/outline versions,
+# recommendations, image manifests and the course draft autosave buffer are
+# written by one process (web worker or Celery) and read by the others, so
+# every process must use the same cache. CACHE_URL=locmem:// gives a
+# per-process cache for single-process development and tests only.
+CACHE_URL = os.getenv('CACHE_URL', 'redis://127.0.0.1:6379/1')
+if CACHE_URL.startswith('locmem://'):
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_URL}}
+
 # Celery (dev defaults)
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://127.0.0.1:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', CELERY_BROKER_URL)
+CELERY_BEAT_SCHEDULE = {
+    # Scheduled course publishes and drip lesson unlocks (courses.schedule)
+    'course-release-sweep': {
+        'task': 'courses.tasks.release_due_task',
+        'schedule': float(os.getenv('COURSE_RELEASE_SWEEP_SECONDS', '60')),
+    },
+    # Full rebuild of "Recommended for you" (courses.recommendations)
+    'course-recommendations-nightly': {
+        'task': 'courses.tasks.precompute_recommendations_task',
+        'schedule': crontab(hour=int(os.getenv('COURSE_RECOMMENDATIONS_HOUR', '3')), minute=0),
+    },
+}
 
 # Social Auth provider credentials (use environment variables in development/production)
 SOCIAL_AUTH_GOOGLE_OAUTH2_KEY = os.getenv('SOCIAL_AUTH_GOOGLE_OAUTH2_KEY')
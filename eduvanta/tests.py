@@ -0,0 +1,70 @@
+from django.test import SimpleTestCase
+
+from eduvanta.jsonpatch import JsonPatchError, apply_patch, make_patch, make_pointer, parse_pointer
+
+
+class JsonPointerTests(SimpleTestCase):
+    def test_round_trip_escapes(self):
+        parts = ['a', 'b/c', 'd~e', '0']
+        self.assertEqual(make_pointer(parts), '/a/b~1c/d~0e/0')
+        self.assertEqual(parse_pointer('/a/b~1c/d~0e/0'), parts)
+
+    def test_root_and_invalid(self):
+        self.assertEqual(parse_pointer(''), [])
+        with self.assertRaises(JsonPatchError):
+            parse_pointer('a/b')
+
+
+class ApplyPatchTests(SimpleTestCase):
+    def setUp(self):
+        self.doc = {'basic': {'title': 'Intro'}, 'modules': [{'title': 'M1'}, {'title': 'M2'}]}
+
+    def test_operations(self):
+        result = apply_patch(self.doc, [
+            {'op': 'replace', 'path': '/basic/title', 'value': 'Python'},
+            {'op': 'add', 'path': '/modules/-', 'value': {'title': 'M3'}},
+            {'op': 'add', 'path': '/modules/0', 'value': {'title': 'M0'}},
+            {'op': 'remove', 'path': '/modules/1'},
+            {'op': 'move', 'from': '/modules/2', 'path': '/modules/0'},
+            {'op': 'copy', 'from': '/basic', 'path': '/copy'},
+            {'op': 'test', 'path': '/copy/title', 'value': 'Python'},
+        ])
+        self.assertEqual(result, {
+            'basic': {'title': 'Python'},
+            'modules': [{'title': 'M3'}, {'title': 'M0'}, {'title': 'M2'}],
+            'copy': {'title': 'Python'},
+        })
+
+    def test_input_is_not_modified(self):
+        apply_patch(self.doc, [{'op': 'add', 'path': '/modules/0/lessons', 'value': []}])
+        self.assertEqual(self.doc['modules'][0], {'title': 'M1'})
+
+    def test_errors(self):
+        bad = [
+            {'op': 'remove', 'path': '/missing'},
+            {'op': 'replace', 'path': '/modules/5', 'value': 1},
+            {'op': 'add', 'path': '/modules/01', 'value': 1},
+            {'op': 'add', 'path': '/basic'},
+            {'op': 'move', 'from': '/basic', 'path': '/basic/inner'},
+            {'op': 'test', 'path': '/basic/title', 'value': 'Other'},
+            {'op': 'rename', 'path': '/basic'},
+            {'path': '/basic'},
+        ]
+        for operation in bad:
+            with self.subTest(operation=operation), self.assertRaises(JsonPatchError):
+                apply_patch(self.doc, [operation])
+        with self.assertRaises(JsonPatchError):
+            apply_patch(self.doc, {'op': 'remove', 'path': '/basic'})
+
+
+class MakePatchTests(SimpleTestCase):
+    def test_patch_rebuilds_target(self):
+        source = {'a': 1, 'b': {'c': [1, 2]}, 'gone': True, 'list': [1]}
+        target = {'a': 2, 'b': {'c': [1, 3]}, 'new': None, 'list': [1, 2]}
+        self.assertEqual(apply_patch(source, make_patch(source, target)), target)
+
+    def test_equal_documents(self):
+        self.assertEqual(make_patch({'a': [1]}, {'a': [1]}), [])
+
+    def test_bool_is_not_int(self):
+        self.assertEqual(make_patch({'a': [1]}, {'a': [True]}), [{'op': 'replace', 'path': '/a/0', 'value': True}])
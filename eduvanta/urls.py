@@ -24,13 +24,16 @@ from rest_framework_simplejwt.views import (
 )
 from accounts.views import send_otp, verify_otp, register_user, profile_setup
 from announcements.views import AnnouncementViewSet
+from gamification.api import challenge_list as challenge_list_api
 from courses.views import CourseViewSet
+from courses.api import CourseModerationViewSet, course_capacity, course_clone, course_enroll, course_facets, course_leave, course_outline, course_reorder, course_search, course_unlocks, draft_autosave, draft_publish, draft_restore, draft_revisions, module_reorder, taxonomy_tree
 from . import views
 from django.views.generic import TemplateView, RedirectView
 
 router = DefaultRouter()
 router.register(r'announcements', AnnouncementViewSet, basename='announcement')
 router.register(r'courses', CourseViewSet, basename='course')
+router.register(r'course-moderation', CourseModerationViewSet, basename='course-moderation')
 
 urlpatterns = [
     path('', views.home, name='home'),
@@ -65,5 +68,23 @@ urlpatterns = [
     path('api/verify-otp/', verify_otp, name='verify_otp'),
     path('api/register/', register_user, name='register_user'),
     path('api/profile-setup/', profile_setup, name='profile_setup'),
+    path('api/courses/search/', course_search, name='course_search_api'),
+    path('api/courses/facets/', course_facets, name='course_facets_api'),
+    path('api/courses/<int:course_id>/outline/', course_outline, name='course_outline_api'),
+    path('api/courses/<int:course_id>/clone/', course_clone, name='course_clone_api'),
+    path('api/courses/<int:course_id>/enroll/', course_enroll, name='course_enroll_api'),
+    path('api/courses/<int:course_id>/leave/', course_leave, name='course_leave_api'),
+    path('api/courses/<int:course_id>/capacity/', course_capacity, name='course_capacity_api'),
+    path('api/courses/<int:course_id>/unlocks/', course_unlocks, name='course_unlocks_api'),
+    path('api/courses/<int:course_id>/reorder/', course_reorder, name='course_reorder_api'),
+    path('api/modules/<int:module_id>/reorder/', module_reorder, name='module_reorder_api'),
+    path('api/taxonomy/', taxonomy_tree, name='taxonomy_tree_api'),
+    path('api/course-drafts/<int:draft_id>/autosave/', draft_autosave, name='course_draft_autosave'),
+    path('api/course-drafts/<int:draft_id>/history/', draft_revisions, name='course_draft_history'),
+    path('api/course-drafts/<int:draft_id>/history/<int:revision>/', draft_revisions, name='course_draft_revision'),
+    path('api/course-drafts/<int:draft_id>/history/<int:revision>/restore/', draft_restore, name='course_draft_restore'),
+    path('api/course-drafts/<int:draft_id>/undo/', draft_restore, name='course_draft_undo'),
+    path('api/course-drafts/<int:draft_id>/publish/', draft_publish, name='course_draft_publish'),
+    path('api/challenges/', challenge_list_api, name='challenge_list_api'),
     path('api/', include(router.urls)),  # Include the router for announcements API
 ]
@@ -0,0 +1,52 @@
+from bisect import bisect_right
+
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from eduvanta.conditional import conditional_on, group_stamp
+
+from .models import Challenge
+
+BOUNDARIES_KEY = 'challenges:boundaries:{stamp}'
+
+
+def _visible():
+    return Challenge.objects.filter(is_active=True, is_deleted=False, is_approved=True)
+
+
+def _window_boundaries():
+    """Sorted start/end times of visible challenges, cached until the next change."""
+    key = BOUNDARIES_KEY.format(stamp=group_stamp('challenges'))
+    boundaries = cache.get(key)
+    if boundaries is None:
+        times = set()
+        for start_at, end_at in _visible().values_list('start_at', 'end_at'):
+            times.update(t.timestamp() for t in (start_at, end_at) if t)
+        boundaries = sorted(times)
+        cache.set(key, boundaries, 60 * 60 * 24)
+    return boundaries
+
+
+def _challenge_etag_extra(request):
+    # The open set also changes when a window starts or ends, without any save
+    passed = bisect_right(_window_boundaries(), timezone.now().timestamp())
+    return f"{getattr(request.user, 'role', '')}:{passed}"
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional_on('challenges', extra=_challenge_etag_extra)
+def challenge_list(request):
+    """Currently open, approved challenges (students only, like the challenges page)."""
+    if getattr(request.user, 'role', None) != 'student':
+        return Response({'results': [], 'not_student': True})
+    now = timezone.now()
+    rows = (_visible()
+            .exclude(start_at__gt=now)
+            .exclude(end_at__lt=now)
+            .order_by('-start_at')
+            .values('id', 'slug', 'title', 'description', 'xp_reward', 'start_at', 'end_at'))
+    return Response({'results': list(rows), 'not_student': False})
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class GamificationConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'gamification'
+
+    def ready(self):
+        # Change stamp behind the challenge API's ETag/Last-Modified
+        from eduvanta.conditional import track
+        from .models import Challenge
+        track('challenges', Challenge)